@@ -1,131 +1,374 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 import sqlite3
-from datetime import datetime
-import hashlib
+from datetime import date, datetime
+import hmac
 import secrets
 import os
+import threading
+import time
+import base64
+import io
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (DB_CONFIG, SHARD_CONFIG, SECURITY_CONFIG, NOTIFY_CONFIG, TRACE_CONFIG, PROFILE_CONFIG,
+                    RESTOCK_CONFIG, RESPONSE_CACHE_CONFIG, SINGLEFLIGHT_CONFIG, CHECKOUT_CONFIG, BARCODE_CONFIG,
+                    SEARCH_CONFIG)
+from bulk_io import BULK_TABLES, FORMATS, export_columns, export_lines, import_rows
+from expiry_scheduler import ExpiryScheduler
+from labels import DEFAULT_GROCERY_CATEGORY, decode_sql, encode_fields, ensure_label_schema, label_id
+from units import base_fields, to_base
+from barcode_catalog import BarcodeCatalog, parse_barcode
+from fuzzy_search import match_query, normalize, similarity
+from login_guard import HashPool, HashPoolBusy, LoginAdmission, pbkdf2_hex
+from response_cache import ResponseCache, read_epoch
+from singleflight import SingleFlight
+from wire_format import WireJSONProvider, request_format
 
 app = Flask(__name__)
-CORS(app)
+# JSON by default, MessagePack/CBOR and ?layout=columns on request (wire_format.py)
+app.json = WireJSONProvider(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Total-Count', 'X-Cache', 'X-Coalesced'])
 
 # Performance optimizations
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.config['JSON_SORT_KEYS'] = False
 
-DB_PATH = 'pantrybot.db'
+# Profiling middleware, only installed when something can switch it on
+request_profiler = None
+if PROFILE_CONFIG['token'] or PROFILE_CONFIG['continuous'] or os.environ.get('PANTRYBOT_PROFILE'):
+    from request_profiler import RequestProfiler
+    request_profiler = RequestProfiler(app.wsgi_app, PROFILE_CONFIG, env_mode=os.environ.get('PANTRYBOT_PROFILE'))
+    app.wsgi_app = request_profiler
+
+# Record traffic for replay_trace.py when switched on in config.py
+if TRACE_CONFIG['enabled']:
+    from request_trace import TraceRecorder
+    app.wsgi_app = TraceRecorder(app.wsgi_app, app, TRACE_CONFIG['path'],
+                                 max_body_bytes=TRACE_CONFIG['max_body_bytes'])
+
+# Catalog database. PANTRYBOT_DB points the API at another file or at a
+# file: URI, such as the in-memory copies the tests run on
+DB_PATH = os.environ.get('PANTRYBOT_DB', DB_CONFIG['path'])
 
 # App version configuration
 APP_VERSION = "1.5.0"
 
-def hash_password(password):
-    """Hash a password for storing."""
+# Largest page a list endpoint returns for ?limit=
+MAX_PAGE_SIZE = 500
+
+# Rounds of hashes stored as salt$hash, before the count was stored with them
+LEGACY_PASSWORD_ROUNDS = 100000
+
+login_admission = LoginAdmission(
+    SECURITY_CONFIG['login_ip_per_minute'], SECURITY_CONFIG['login_ip_burst'],
+    SECURITY_CONFIG['login_user_per_minute'], SECURITY_CONFIG['login_user_burst'])
+hash_pool = HashPool(SECURITY_CONFIG['hash_workers'], SECURITY_CONFIG['hash_queue_size'])
+response_cache = ResponseCache(RESPONSE_CACHE_CONFIG['max_bytes'], RESPONSE_CACHE_CONFIG['max_entry_bytes'])
+request_flight = SingleFlight(SINGLEFLIGHT_CONFIG['window_ms'] / 1000.0, SINGLEFLIGHT_CONFIG['max_wait_seconds'])
+
+def hash_password(password, pbkdf2=pbkdf2_hex):
+    """Hash a password for storing, as rounds$salt$hash."""
+    rounds = SECURITY_CONFIG['password_salt_rounds']
     salt = secrets.token_hex(16)
-    # Use 100k iterations for better security
-    pwdhash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-    return f"{salt}${pwdhash.hex()}"
+    return f"{rounds}${salt}${pbkdf2(password, salt, rounds)}"
 
-def verify_password(stored_password, provided_password):
-    """Verify a stored password against one provided by user"""
-    print(f"DEBUG: stored_password = '{stored_password}'")
-    salt, key = stored_password.split('$')
-    # Match the 100k iterations
-    pwdhash = hashlib.pbkdf2_hmac('sha256', provided_password.encode(), salt.encode(), 100000)
-    return pwdhash.hex() == key
+def split_password_hash(stored_password):
+    parts = stored_password.split('$')
+    if len(parts) == 2:
+        return LEGACY_PASSWORD_ROUNDS, parts[0], parts[1]
+    return int(parts[0]), parts[1], parts[2]
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA journal_mode=WAL')
-    conn.execute('PRAGMA synchronous=NORMAL')
+def verify_password(stored_password, provided_password, pbkdf2=pbkdf2_hex):
+    """Verify a stored password against one provided by user"""
+    rounds, salt, key = split_password_hash(stored_password)
+    return hmac.compare_digest(pbkdf2(provided_password, salt, rounds), key)
+
+def password_needs_rehash(stored_password):
+    return split_password_hash(stored_password)[0] != SECURITY_CONFIG['password_salt_rounds']
+
+def too_many_requests(message, retry_after):
+    response = jsonify({'success': False, 'message': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+# Columns a kiosk may replicate, and how /sync/push settles a field that was
+# also changed on the server:
+#   lww      - last writer wins, by updated_at
+#   server   - the server keeps its value once the row exists
+#   earliest - last writer wins, but a stale kiosk edit still wins if its date
+#              is earlier (warn about expiry too early rather than too late)
+SYNC_FIELD_RULES = {
+    'items': {
+        'name': 'lww',
+        'type': 'lww',
+        'quantity': 'lww',
+        'entry_date': 'server',
+        'expiry_date': 'earliest',
+        'metric': 'lww',
+        'amount_per_item': 'lww',
+    },
+    'grocery_items': {
+        'name': 'lww',
+        'quantity': 'lww',
+        'category': 'lww',
+        'checked': 'lww',
+        'priority': 'lww',
+        'created_at': 'server',
+        'metric': 'lww',
+        'amount_per_item': 'lww',
+    },
+}
+
+SYNC_TIMESTAMP_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+def init_sync_schema(conn):
+    """updated_at stamps plus a change log that kiosks pull by revision."""
+    for table in SYNC_FIELD_RULES:
+        try:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN updated_at TEXT DEFAULT NULL')
+        except sqlite3.OperationalError:
+            pass
     
-    # Create users table
+    # One entry per row: the revision of its latest change (or its deletion)
     conn.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        is_admin BOOLEAN DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    CREATE TABLE IF NOT EXISTS sync_log (
+        rev INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL
     )
     ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_log_row ON sync_log (table_name, row_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sync_log_user_rev ON sync_log (user_id, rev)')
     
-    # Create grocery_items table
+    # Which server row a kiosk's local row became, so a retried insert is not duplicated
     conn.execute('''
-    CREATE TABLE IF NOT EXISTS grocery_items (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        quantity INTEGER DEFAULT 1,
-        category TEXT DEFAULT 'Vegetables',
-        checked INTEGER DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        user_id INTEGER,
-        priority INTEGER DEFAULT 0,
-        metric TEXT DEFAULT NULL,
-        amount_per_item TEXT DEFAULT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
+    CREATE TABLE IF NOT EXISTS sync_origins (
+        client_id TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        local_id INTEGER NOT NULL,
+        row_id INTEGER NOT NULL,
+        PRIMARY KEY (client_id, table_name, local_id)
     )
     ''')
     
-    # Create items table (pantry items)
+    for table in SYNC_FIELD_RULES:
+        conn.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_insert AFTER INSERT ON {table} BEGIN
+            UPDATE {table} SET updated_at = {SYNC_TIMESTAMP_SQL}
+            WHERE id = new.id AND new.updated_at IS NULL;
+            INSERT OR REPLACE INTO sync_log (user_id, table_name, row_id, op)
+            VALUES (new.user_id, '{table}', new.id, 'upsert');
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_update AFTER UPDATE ON {table} BEGIN
+            UPDATE {table} SET updated_at = {SYNC_TIMESTAMP_SQL}
+            WHERE id = new.id AND new.updated_at IS old.updated_at;
+            INSERT OR REPLACE INTO sync_log (user_id, table_name, row_id, op)
+            VALUES (new.user_id, '{table}', new.id, 'upsert');
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_delete AFTER DELETE ON {table} BEGIN
+            INSERT OR REPLACE INTO sync_log (user_id, table_name, row_id, op)
+            VALUES (old.user_id, '{table}', old.id, 'delete');
+        END;
+        ''')
+
+# Tables whose metric/amount_per_item also get base_amount/base_unit (see units.py)
+UNIT_TABLES = ('grocery_items', 'items', 'item_history')
+
+def init_unit_schema(conn):
+    """Numeric amounts in base units, filled in once for rows written before."""
+    for table in UNIT_TABLES:
+        try:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN base_amount REAL DEFAULT NULL')
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN base_unit TEXT DEFAULT NULL')
+        except sqlite3.OperationalError:
+            continue
+        
+        # Not a user edit: keep the backfill out of updated_at and the sync log
+        # (init_sync_schema puts the trigger back)
+        conn.execute(f'DROP TRIGGER IF EXISTS {table}_sync_update')
+        pairs = conn.execute(f'''
+            SELECT DISTINCT metric_id, {decode_sql('metric')} as metric, amount_per_item FROM {table}
+        ''').fetchall()
+        conn.executemany(f'''
+            UPDATE {table} SET base_amount = ?, base_unit = ?
+            WHERE metric_id IS ? AND amount_per_item IS ?
+        ''', [(*to_base(metric, amount), metric_id, amount) for metric_id, metric, amount in pairs])
+        if pairs:
+            print(f"Filled base amounts of {table} for {len(pairs)} metric/amount pairs")
+    
+    # Per-item totals are read from these without touching the tables
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_items_user_base
+                    ON items (user_id, name, base_unit, quantity, base_amount)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_grocery_items_user_base
+                    ON grocery_items (user_id, checked, name, base_unit, quantity, base_amount)''')
+
+# Pantry analytics
+#
+# Triggers on items append to pantry_events (add, consume, discard, expire)
+# and each event is added to the user's day, month and year rows in
+# pantry_rollups, so /analytics reads a handful of rollup rows whatever the
+# history length. A delete is logged as items.removed_as when the handler set
+# it, otherwise as expire if the item was past its date and consume if not.
+
+PANTRY_EVENTS = ('add', 'consume', 'discard', 'expire')
+ROLLUP_PERIODS = {'day': "date({at})", 'month': "date({at}, 'start of month')", 'year': "date({at}, 'start of year')"}
+
+def init_analytics_schema(conn):
+    try:
+        conn.execute('ALTER TABLE items ADD COLUMN removed_as TEXT DEFAULT NULL')
+    except sqlite3.OperationalError:
+        pass
+    
     conn.execute('''
-    CREATE TABLE IF NOT EXISTS items (
+    CREATE TABLE IF NOT EXISTS pantry_events (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        type TEXT NOT NULL,
-        quantity INTEGER NOT NULL,
-        entry_date TEXT NOT NULL,
-        expiry_date TEXT NOT NULL,
         user_id INTEGER,
-        metric TEXT DEFAULT NULL,
-        amount_per_item TEXT DEFAULT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
+        item_id INTEGER,
+        name TEXT,
+        type_id INTEGER REFERENCES labels (id),
+        event TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        base_amount REAL,
+        base_unit TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS pantry_rollups (
+        user_id INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        start TEXT NOT NULL,
+        type_id INTEGER REFERENCES labels (id),
+        event TEXT NOT NULL,
+        base_unit TEXT NOT NULL,
+        events INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (user_id, period, start, type_id, event, base_unit)
     )
     ''')
     
-    # Add metric column to existing tables if it doesn't exist
-    try:
-        conn.execute('ALTER TABLE grocery_items ADD COLUMN metric TEXT DEFAULT NULL')
-    except sqlite3.OperationalError:
-        pass
-    try:
-        conn.execute('ALTER TABLE items ADD COLUMN metric TEXT DEFAULT NULL')
-    except sqlite3.OperationalError:
-        pass
+    def log_event(event, quantity, row):
+        return f'''
+            INSERT INTO pantry_events (user_id, item_id, name, type_id, event, quantity, base_amount, base_unit)
+            VALUES ({row}.user_id, {row}.id, {row}.name, {row}.type_id, {event}, {quantity},
+                    {row}.base_amount, {row}.base_unit);'''
     
-    # Add amount_per_item column to existing tables if it doesn't exist
-    try:
-        conn.execute('ALTER TABLE grocery_items ADD COLUMN amount_per_item TEXT DEFAULT NULL')
-    except sqlite3.OperationalError:
-        pass
+    rollups = ''.join(f'''
+        INSERT INTO pantry_rollups (user_id, period, start, type_id, event, base_unit, events, quantity, amount)
+        VALUES (new.user_id, '{period}', {start.format(at='new.created_at')}, new.type_id, new.event,
+                COALESCE(new.base_unit, ''), 1, new.quantity, COALESCE(new.quantity * new.base_amount, 0))
+        ON CONFLICT (user_id, period, start, type_id, event, base_unit) DO UPDATE SET
+            events = events + 1, quantity = quantity + excluded.quantity, amount = amount + excluded.amount;'''
+        for period, start in ROLLUP_PERIODS.items())
+    
+    conn.executescript(f'''
+    CREATE TRIGGER IF NOT EXISTS items_event_insert AFTER INSERT ON items BEGIN
+        {log_event("'add'", 'new.quantity', 'new')}
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_event_quantity AFTER UPDATE OF quantity ON items
+    WHEN new.quantity IS NOT old.quantity BEGIN
+        {log_event("CASE WHEN new.quantity > old.quantity THEN 'add' ELSE 'consume' END",
+                   'ABS(new.quantity - old.quantity)', 'new')}
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_event_delete AFTER DELETE ON items BEGIN
+        {log_event("COALESCE(old.removed_as, CASE WHEN old.expiry_date < date('now') THEN 'expire' ELSE 'consume' END)",
+                   'old.quantity', 'old')}
+    END;
+    CREATE TRIGGER IF NOT EXISTS pantry_events_rollup AFTER INSERT ON pantry_events BEGIN
+        {rollups}
+    END;
+    CREATE TRIGGER IF NOT EXISTS pantry_events_append_only BEFORE UPDATE ON pantry_events BEGIN
+        SELECT RAISE(ABORT, 'pantry_events is append-only');
+    END;
+    ''')
+
+# Search
+#
+# One FTS5 trigram index over the names and category/type of pantry items,
+# grocery items and item history, kept in step by triggers. An entry's rowid
+# is the row id times SEARCH_ROWID_STRIDE plus the number of its source, so
+# a trigger reaches its entry by rowid and /search tells the sources apart
+# without a lookup. Matching and scoring are in fuzzy_search.py.
+
+SEARCH_SOURCES = {
+    'pantry': (1, 'items', 'type', 'id, name, type, quantity, entry_date, expiry_date, metric, amount_per_item'),
+    'grocery': (2, 'grocery_items', 'category', 'id, name, quantity, category, checked, priority, created_at, '
+                                                'metric, amount_per_item'),
+    'history': (3, 'item_history', 'category', 'id, name, category, frequency, last_used, metric, amount_per_item'),
+}
+SEARCH_ROWID_STRIDE = 4
+
+def init_search_schema(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'").fetchone()
     try:
-        conn.execute('ALTER TABLE items ADD COLUMN amount_per_item TEXT DEFAULT NULL')
-    except sqlite3.OperationalError:
-        pass
+        conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            name, label, user_id UNINDEXED, tokenize='trigram'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Search index unavailable, /search is disabled: {e}")
+        return
     
-    # Add item_history table
+    for number, table, label, _ in SEARCH_SOURCES.values():
+        entry = f'''
+            INSERT OR REPLACE INTO search_index (rowid, name, label, user_id)
+            VALUES (new.id * {SEARCH_ROWID_STRIDE} + {number}, new.name,
+                    (SELECT value FROM labels WHERE id = new.{label}_id), new.user_id);'''
+        conn.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN
+            {entry}
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF name, {label}_id, user_id ON {table} BEGIN
+            {entry}
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM search_index WHERE rowid = old.id * {SEARCH_ROWID_STRIDE} + {number};
+        END;
+        ''')
+        # Index the rows written before the index existed
+        if not exists:
+            conn.execute(f'''
+                INSERT INTO search_index (rowid, name, label, user_id)
+                SELECT id * {SEARCH_ROWID_STRIDE} + {number}, name, {decode_sql(label)}, user_id FROM {table}
+            ''')
+
+def connect_db(path):
+    conn = sqlite3.connect(path, uri=path.startswith('file:'))
+    conn.row_factory = sqlite3.Row
+    # Only takes effect on a new file; retention.py converts existing ones
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def init_catalog_schema(conn):
+    """Tables that live in the catalog database: users and the shard map."""
+    # Create users table
     conn.execute('''
-    CREATE TABLE IF NOT EXISTS item_history (
+    CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        category TEXT NOT NULL,
-        last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        frequency INTEGER DEFAULT 0,
-        user_id INTEGER,
-        metric TEXT DEFAULT NULL,
-        amount_per_item TEXT DEFAULT NULL,
-        UNIQUE(name, category, user_id)
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        is_admin BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
     
-    try:
-        conn.execute('ALTER TABLE item_history ADD COLUMN metric TEXT DEFAULT NULL')
-    except sqlite3.OperationalError:
-        pass
-    try:
-        conn.execute('ALTER TABLE item_history ADD COLUMN amount_per_item TEXT DEFAULT NULL')
-    except sqlite3.OperationalError:
-        pass
+    # Which household database each user's data lives in (sharded mode)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS shard_map (
+        user_id INTEGER PRIMARY KEY,
+        household TEXT NOT NULL
+    )
+    ''')
     
     # Insert default admin user if not exists
     cursor = conn.cursor()
@@ -140,9 +383,343 @@ def get_db():
             ('whitehouse', hash_password('Adnoc2003'))
         )
         conn.commit()
+
+def init_data_schema(conn):
+    """Per-user data tables. Without sharding they share the catalog file."""
+    # grocery_items, items and item_history store category/type/metric as
+    # label ids; older text-column tables are rewritten on first start
+    ensure_label_schema(conn)
+    init_unit_schema(conn)
     
+    # Expiry notifications waiting for the app to fetch them; the unique key
+    # keeps a threshold from being announced twice
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS push_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        name TEXT,
+        type TEXT,
+        expiry_date TEXT,
+        threshold INTEGER,
+        days_until_expiry INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, item_id, expiry_date, threshold)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_push_outbox_user ON push_outbox (user_id, id)')
+    
+    # Every time something goes on the grocery list; grocery_items rows are
+    # deleted once bought, this keeps the dates for restock_job.py. The first
+    # start seeds it from the items still on the lists.
+    seed_events = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'grocery_events'").fetchone()
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS grocery_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        name TEXT NOT NULL,
+        category_id INTEGER REFERENCES labels (id),
+        added_at TEXT NOT NULL,
+        UNIQUE(user_id, name COLLATE NOCASE, added_at)
+    )
+    ''')
+    conn.executescript('''
+    CREATE TRIGGER IF NOT EXISTS grocery_items_add_event AFTER INSERT ON grocery_items BEGIN
+        INSERT OR IGNORE INTO grocery_events (user_id, name, category_id, added_at)
+        VALUES (new.user_id, new.name, new.category_id, COALESCE(new.created_at, CURRENT_TIMESTAMP));
+    END;
+    ''')
+    if seed_events:
+        conn.execute('''
+            INSERT OR IGNORE INTO grocery_events (user_id, name, category_id, added_at)
+            SELECT user_id, name, category_id, COALESCE(created_at, CURRENT_TIMESTAMP) FROM grocery_items
+        ''')
+    
+    # Written nightly by restock_job.py, read by /grocery/predicted
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS restock_predictions (
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        category_id INTEGER REFERENCES labels (id),
+        last_added TEXT NOT NULL,
+        interval_days REAL NOT NULL,
+        next_date TEXT NOT NULL,
+        intervals INTEGER NOT NULL,
+        PRIMARY KEY (user_id, name)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_restock_predictions_user_next ON restock_predictions (user_id, next_date)')
+    
+    # Range seeks for the paginated list endpoints, one per sort order
+    # (sorting by type goes through items_view and sorts the decoded text)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grocery_items_user_created ON grocery_items (user_id, created_at)')
+    for column in ('name', 'expiry_date', 'entry_date', 'quantity'):
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_items_user_{column} ON items (user_id, {column})')
+    
+    init_sync_schema(conn)
+    init_analytics_schema(conn)
+    init_search_schema(conn)
+
+# Database files whose schema has already been checked by this process
+_schema_checked = set()
+_schema_lock = threading.Lock()
+
+def get_db():
+    """Connection to the catalog database (users). Without sharding this is
+    also where every user's data lives."""
+    conn = connect_db(DB_PATH)
+    if DB_PATH not in _schema_checked:
+        with _schema_lock:
+            init_catalog_schema(conn)
+            if not SHARD_CONFIG['enabled']:
+                init_data_schema(conn)
+            conn.commit()
+            _schema_checked.add(DB_PATH)
+    return conn
+
+# Household shards
+
+_shard_paths = {}
+
+def shard_path(household):
+    return os.path.join(SHARD_CONFIG['shard_dir'], f'household_{household}.db')
+
+def get_shard_path(user_id):
+    """Database file holding user_id's data. Users without a household get their own."""
+    user_id = int(user_id)
+    path = _shard_paths.get(user_id)
+    if path:
+        return path
+    conn = get_db()
+    try:
+        conn.execute('INSERT OR IGNORE INTO shard_map (user_id, household) VALUES (?, ?)', (user_id, str(user_id)))
+        conn.commit()
+        household = conn.execute('SELECT household FROM shard_map WHERE user_id = ?', (user_id,)).fetchone()[0]
+    finally:
+        conn.close()
+    path = shard_path(household)
+    _shard_paths[user_id] = path
+    return path
+
+def open_shard(path):
+    if path not in _schema_checked:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = connect_db(path)
+    if path not in _schema_checked:
+        with _schema_lock:
+            init_data_schema(conn)
+            conn.commit()
+            _schema_checked.add(path)
     return conn
 
+def get_user_db(user_id):
+    """Connection to the database holding user_id's data."""
+    if not SHARD_CONFIG['enabled']:
+        return get_db()
+    return open_shard(get_shard_path(user_id))
+
+def request_user_id():
+    """user_id from the query string or the JSON body of the current request."""
+    user_id = request.args.get('user_id')
+    if not user_id and request.is_json:
+        user_id = (request.get_json(silent=True) or {}).get('user_id')
+    return user_id
+
+def get_request_db():
+    """Database for routes that address a row by id. With sharding the caller
+    must say whose row it is; without it the single database is used."""
+    if not SHARD_CONFIG['enabled']:
+        return get_db()
+    user_id = request_user_id()
+    if not user_id:
+        return None
+    return get_user_db(user_id)
+
+def all_shard_paths():
+    conn = get_db()
+    households = conn.execute('SELECT DISTINCT household FROM shard_map').fetchall()
+    conn.close()
+    return [shard_path(row['household']) for row in households if os.path.exists(shard_path(row['household']))]
+
+_fan_out_pool = None
+
+def fan_out(query):
+    """Run query(conn) against every shard in parallel and return the results.
+    Without sharding this is just query() on the single database."""
+    global _fan_out_pool
+    if not SHARD_CONFIG['enabled']:
+        conn = get_db()
+        try:
+            return [query(conn)]
+        finally:
+            conn.close()
+    
+    def run(path):
+        conn = open_shard(path)
+        try:
+            return query(conn)
+        finally:
+            conn.close()
+    
+    if _fan_out_pool is None:
+        _fan_out_pool = ThreadPoolExecutor(max_workers=SHARD_CONFIG['fan_out_workers'],
+                                           thread_name_prefix='shard-fan-out')
+    return list(_fan_out_pool.map(run, all_shard_paths()))
+
+# Keyset pagination
+#
+# List endpoints take ?limit=N&after=CURSOR. The cursor is the sort key of the
+# last row of the previous page, so the next page is an index range seek
+# (WHERE (col, id) > (?, ?)) instead of an OFFSET scan, and rows added or
+# removed meanwhile don't shift pages. Without limit the whole list is
+# returned as before. Pages carry X-Next-Cursor while more rows follow, and
+# the first page carries X-Total-Count.
+
+def encode_cursor(kind, values):
+    payload = json.dumps([kind, list(values)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(kind, cursor):
+    """Sort key stored in cursor. Raises ValueError if it isn't one of ours
+    or belongs to a different list or sort order."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_kind, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if cursor_kind != kind or not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+def page_args(kind):
+    """(limit, after) of the current request; limit is None when not paging."""
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError('limit must be a positive integer')
+        limit = min(int(limit), MAX_PAGE_SIZE)
+    if after:
+        after = decode_cursor(kind, after)
+        if limit is None:
+            limit = MAX_PAGE_SIZE
+    else:
+        after = None
+    return limit, after
+
+def keyset_page(conn, kind, select, where, params, order, descending=False, count_sql=None):
+    """Run one page of select ... WHERE where ORDER BY order.
+
+    order lists the sort columns, ending with a unique one (the id). Returns
+    (rows, next_cursor, total); total is only counted for the first page.
+    """
+    limit, after = page_args(kind)
+    if after is not None and len(after) != len(order):
+        raise ValueError('Invalid cursor')
+    where_params = list(params)
+    params = list(params)
+    sql = f'{select} WHERE {where}'
+    if after is not None:
+        sql += f" AND ({', '.join(order)}) {'<' if descending else '>'} ({', '.join('?' * len(order))})"
+        params += after
+    direction = 'DESC' if descending else 'ASC'
+    sql += ' ORDER BY ' + ', '.join(f'{column} {direction}' for column in order)
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(kind, [rows[-1][column] for column in order])
+
+    total = None
+    if after is None:
+        if next_cursor is None:
+            total = len(rows)  # the first page is the whole list
+        elif count_sql:
+            total = conn.execute(count_sql, where_params).fetchone()[0]
+    return rows, next_cursor, total
+
+def page_response(items, next_cursor=None, total=None):
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    return response
+
+# Headers of a list response that belong to its body
+CACHED_HEADERS = ('Content-Type', 'Vary', 'X-Next-Cursor', 'X-Total-Count')
+
+def response_key(user_id):
+    """Route, user, query string and negotiated wire format of the current GET."""
+    fmt, _ = request_format()
+    return response_cache.key(f'{request.path}:{fmt}', user_id, request.args.items(multi=True))
+
+_seen_cache_epoch = None
+
+def check_cache_epoch():
+    """Drop every cached response once an outside job (retention.py) has
+    touched the epoch file since the last look: one stat per cached GET."""
+    global _seen_cache_epoch
+    epoch = read_epoch(RESPONSE_CACHE_CONFIG['epoch_path'])
+    if epoch != _seen_cache_epoch:
+        _seen_cache_epoch = epoch
+        response_cache.bump_all()
+
+def cached_response(view):
+    """Serve a per-user GET from response_cache until the user's data changes.
+    Requests without a user_id (admin views) are not cached."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = request.args.get('user_id')
+        if not RESPONSE_CACHE_CONFIG['enabled'] or not user_id or request.args.get('admin'):
+            return view(*args, **kwargs)
+        
+        check_cache_epoch()
+        key = response_key(user_id)
+        cached = response_cache.get(key)
+        if cached is not None:
+            status, headers, body = cached
+            response = app.response_class(body, status=status, headers=headers)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+        
+        generation = response_cache.generation(user_id)
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+            response_cache.put(key, generation, response.status_code, headers, response.get_data())
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+def coalesced_response(view):
+    """Identical concurrent GETs of one user share a single run of the view.
+    The user's write generation is part of the key, so a request made after a
+    write never gets the result of a run that started before it."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = request.args.get('user_id')
+        if not SINGLEFLIGHT_CONFIG['enabled'] or not user_id or request.args.get('admin'):
+            return view(*args, **kwargs)
+        
+        def run():
+            response = app.make_response(view(*args, **kwargs))
+            headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+            return response.status_code, headers, response.get_data()
+        
+        check_cache_epoch()
+        key = response_key(user_id)
+        (status, headers, body), shared = request_flight.do(key + (response_cache.generation(user_id),), run)
+        response = app.response_class(body, status=status, headers=headers)
+        if shared:
+            response.headers['X-Coalesced'] = '1'
+        return response
+    return wrapper
+
 # User management endpoints
 @app.route('/auth/login', methods=['POST'])
 def login():
@@ -150,6 +727,10 @@ def login():
         data = request.json
         if not data or not data.get('username') or not data.get('password'):
             return jsonify({'success': False, 'message': 'Missing credentials'}), 400
+        
+        wait = login_admission.admit(request.remote_addr, data['username'])
+        if wait:
+            return too_many_requests('Too many login attempts, try again later', wait)
             
         conn = get_db()
         cursor = conn.cursor()
@@ -158,9 +739,17 @@ def login():
         cursor.execute('SELECT id, username, password_hash, is_admin FROM users WHERE username = ? LIMIT 1', 
                       (data['username'],))
         user = cursor.fetchone()
-        conn.close()
         
-        if user and verify_password(user['password_hash'], data['password']):
+        if user and verify_password(user['password_hash'], data['password'], pbkdf2=hash_pool.pbkdf2):
+            # Upgrade the stored hash when the configured rounds have changed
+            if password_needs_rehash(user['password_hash']):
+                try:
+                    new_hash = hash_password(data['password'], pbkdf2=hash_pool.pbkdf2)
+                    conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user['id']))
+                    conn.commit()
+                except HashPoolBusy:
+                    pass  # try again on a later login
+            conn.close()
             return jsonify({
                 'success': True,
                 'user_id': user['id'],
@@ -168,8 +757,12 @@ def login():
                 'is_admin': bool(user['is_admin'])
             })
         
+        conn.close()
         return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
         
+    except HashPoolBusy as e:
+        conn.close()
+        return too_many_requests('Server busy, try again shortly', e.retry_after)
     except Exception as e:
         print(f"Login error: {e}")
         return jsonify({'success': False, 'message': 'Server error'}), 500
@@ -177,9 +770,15 @@ def login():
 @app.route('/users', methods=['GET'])
 def get_users():
     conn = get_db()
-    users = conn.execute('SELECT id, username, is_admin, created_at FROM users').fetchall()
-    conn.close()
-    return jsonify([dict(user) for user in users])
+    try:
+        users, next_cursor, total = keyset_page(
+            conn, 'users', 'SELECT id, username, is_admin, created_at FROM users', '1', (),
+            ['id'], count_sql='SELECT COUNT(*) FROM users')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    return page_response([dict(user) for user in users], next_cursor, total)
 
 @app.route('/users', methods=['POST'])
 def create_user():
@@ -187,13 +786,18 @@ def create_user():
     if not data.get('username') or not data.get('password'):
         return jsonify({'success': False, 'message': 'Missing required fields'}), 400
     
+    try:
+        password_hash = hash_password(data['password'], pbkdf2=hash_pool.pbkdf2)
+    except HashPoolBusy as e:
+        return too_many_requests('Server busy, try again shortly', e.retry_after)
+    
     conn = get_db()
     cursor = conn.cursor()
     
     try:
         cursor.execute(
             'INSERT INTO users (username, password_hash, is_admin) VALUES (?, ?, ?)',
-            (data['username'], hash_password(data['password']), data.get('is_admin', 0))
+            (data['username'], password_hash, data.get('is_admin', 0))
         )
         conn.commit()
         new_id = cursor.lastrowid
@@ -221,26 +825,44 @@ def delete_user(user_id):
             
         print(f"Found user: {user['username']} (ID: {user['id']})")  # Debug log
         
+        # With sharding the user's data lives in their household database
+        data_conn = get_user_db(user_id) if SHARD_CONFIG['enabled'] else conn
+        data_cursor = data_conn.cursor()
+        
         # Delete user's items first (foreign key constraints)
-        cursor.execute('DELETE FROM grocery_items WHERE user_id = ?', (user_id,))
-        deleted_grocery = cursor.rowcount
+        data_cursor.execute('DELETE FROM grocery_items WHERE user_id = ?', (user_id,))
+        deleted_grocery = data_cursor.rowcount
         print(f"Deleted {deleted_grocery} grocery items")  # Debug log
         
-        cursor.execute('DELETE FROM items WHERE user_id = ?', (user_id,))
-        deleted_pantry = cursor.rowcount
+        data_cursor.execute('DELETE FROM items WHERE user_id = ?', (user_id,))
+        deleted_pantry = data_cursor.rowcount
         print(f"Deleted {deleted_pantry} pantry items")  # Debug log
         
-        cursor.execute('DELETE FROM item_history WHERE user_id = ?', (user_id,))
-        deleted_history = cursor.rowcount
+        data_cursor.execute('DELETE FROM item_history WHERE user_id = ?', (user_id,))
+        deleted_history = data_cursor.rowcount
         print(f"Deleted {deleted_history} history items")  # Debug log
         
+        data_cursor.execute('DELETE FROM push_outbox WHERE user_id = ?', (user_id,))
+        data_cursor.execute('DELETE FROM grocery_events WHERE user_id = ?', (user_id,))
+        data_cursor.execute('DELETE FROM restock_predictions WHERE user_id = ?', (user_id,))
+        data_cursor.execute('DELETE FROM pantry_events WHERE user_id = ?', (user_id,))
+        data_cursor.execute('DELETE FROM pantry_rollups WHERE user_id = ?', (user_id,))
+        expiry_scheduler.remove_user(user_id)
+        
+        if data_conn is not conn:
+            data_conn.commit()
+            data_conn.close()
+        
         # Delete the user
         cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
         deleted_user = cursor.rowcount
         print(f"Deleted user: {deleted_user} row(s)")  # Debug log
+        cursor.execute('DELETE FROM shard_map WHERE user_id = ?', (user_id,))
+        _shard_paths.pop(user_id, None)
             
         conn.commit()
         conn.close()
+        response_cache.bump(user_id)
         print(f"Successfully deleted user {user['username']}")  # Debug log
         return jsonify({'success': True, 'message': 'User deleted successfully'})
         
@@ -252,18 +874,24 @@ def delete_user(user_id):
 
 # Update existing endpoints to be user-specific
 @app.route('/grocery/items', methods=['GET'])
+@cached_response
+@coalesced_response
 def get_items():
     user_id = request.args.get('user_id')
     if not user_id:
         return jsonify({'error': 'user_id is required'}), 400
         
-    conn = get_db()
-    items = conn.execute(
-        'SELECT * FROM grocery_items WHERE user_id = ? ORDER BY created_at DESC', 
-        (user_id,)
-    ).fetchall()
-    conn.close()
-    return jsonify([dict(item) for item in items])
+    conn = get_user_db(user_id)
+    try:
+        items, next_cursor, total = keyset_page(
+            conn, 'grocery', 'SELECT * FROM grocery_items_view', 'user_id = ?', (user_id,),
+            ['created_at', 'id'], descending=True,
+            count_sql='SELECT COUNT(*) FROM grocery_items WHERE user_id = ?')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    return page_response([dict(item) for item in items], next_cursor, total)
 
 @app.route('/grocery/items', methods=['POST'])
 def add_item():
@@ -276,7 +904,7 @@ def add_item():
         
     name = data.get('name')
     quantity = data.get('quantity', 1)
-    category = data.get('category', '')
+    category = data.get('category', DEFAULT_GROCERY_CATEGORY)
     user_id = data.get('user_id')
     metric = data.get('metric')
     amount_per_item = data.get('amount_per_item')
@@ -287,38 +915,47 @@ def add_item():
 
     print(f"Adding item: {name} (qty: {quantity}) for user: {user_id}")  # Debug log
 
-    conn = get_db()
+    conn = get_user_db(user_id)
     cursor = conn.cursor()
     
     try:
+        category_id = label_id(conn, category)
+        metric_id = label_id(conn, metric)
+        base_amount, base_unit = to_base(metric, amount_per_item)
+        
         # First update or insert into item_history
         cursor.execute('''
-            INSERT INTO item_history (name, category, user_id, last_used, frequency, metric, amount_per_item)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP, 1, ?, ?)
-            ON CONFLICT(name, category, user_id) 
+            INSERT INTO item_history (name, category_id, user_id, last_used, frequency, metric_id, amount_per_item,
+                                      base_amount, base_unit)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP, 1, ?, ?, ?, ?)
+            ON CONFLICT(name, category_id, user_id) 
             DO UPDATE SET
                 last_used = CURRENT_TIMESTAMP,
                 frequency = COALESCE(frequency, 0) + 1,
-                metric = excluded.metric,
-                amount_per_item = excluded.amount_per_item
+                metric_id = excluded.metric_id,
+                amount_per_item = excluded.amount_per_item,
+                base_amount = excluded.base_amount,
+                base_unit = excluded.base_unit
             WHERE user_id = ?
-        ''', (name, category, user_id, metric, amount_per_item, user_id))
+        ''', (name, category_id, user_id, metric_id, amount_per_item, base_amount, base_unit, user_id))
         
         # Then insert the new grocery item
         cursor.execute('''
             INSERT INTO grocery_items 
-            (name, quantity, category, user_id, checked, created_at, metric, amount_per_item) 
-            VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP, ?, ?)
-        ''', (name, quantity, category, user_id, metric, amount_per_item))
+            (name, quantity, category_id, user_id, checked, created_at, metric_id, amount_per_item,
+             base_amount, base_unit) 
+            VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP, ?, ?, ?, ?)
+        ''', (name, quantity, category_id, user_id, metric_id, amount_per_item, base_amount, base_unit))
         
         new_id = cursor.lastrowid
         
         # Verify the item was added
-        cursor.execute('SELECT * FROM grocery_items WHERE id = ?', (new_id,))
+        cursor.execute('SELECT * FROM grocery_items_view WHERE id = ?', (new_id,))
         new_item = cursor.fetchone()
         print(f"Added item with ID {new_id}: {dict(new_item)}")  # Debug log
         
         conn.commit()
+        response_cache.bump(user_id)
         
         response_data = {
             'success': True,
@@ -338,30 +975,125 @@ def add_item():
 @app.route('/grocery/items/<int:item_id>', methods=['PUT'])
 def update_item(item_id):
     data = request.json
-    conn = get_db()
+    conn = get_request_db()
+    if conn is None:
+        return jsonify({'error': 'user_id is required'}), 400
+    owner = conn.execute('SELECT user_id FROM grocery_items WHERE id = ?', (item_id,)).fetchone()
     conn.execute(
-        'UPDATE grocery_items SET name = ?, quantity = ?, category = ?, checked = ? WHERE id = ?',
+        'UPDATE grocery_items SET name = ?, quantity = ?, category_id = ?, checked = ? WHERE id = ?',
         (
             data['name'],
             data.get('quantity', 1),
-            data.get('category', 'Vegetables'),
+            label_id(conn, data.get('category', DEFAULT_GROCERY_CATEGORY)),
             data.get('checked', 0),
             item_id
         )
     )
     conn.commit()
     conn.close()
+    if owner:
+        response_cache.bump(owner['user_id'])
     return jsonify({'success': True})
 
 @app.route('/grocery/items/<int:item_id>', methods=['DELETE'])
 def delete_item(item_id):
-    conn = get_db()
+    conn = get_request_db()
+    if conn is None:
+        return jsonify({'error': 'user_id is required'}), 400
+    owner = conn.execute('SELECT user_id FROM grocery_items WHERE id = ?', (item_id,)).fetchone()
     conn.execute('DELETE FROM grocery_items WHERE id = ?', (item_id,))
     conn.commit()
     conn.close()
+    if owner:
+        response_cache.bump(owner['user_id'])
     return jsonify({'success': True})
 
+@app.route('/grocery/checkout', methods=['POST'])
+def checkout_grocery_items():
+    """Move every checked grocery item of user_id into the pantry in one
+    transaction. Metric and amount carry over, the expiry date comes from the
+    type's shelf life in CHECKOUT_CONFIG, and the grocery rows are removed.
+    Returns the new pantry rows."""
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    
+    shelf_life = CHECKOUT_CONFIG['shelf_life_days']
+    entry_date = datetime.now().strftime('%Y-%m-%d')
+    conn = get_user_db(user_id)
+    try:
+        # The insert takes the write lock, so the delete sees the same checked rows
+        cursor = conn.execute(f'''
+            INSERT INTO items (name, type_id, quantity, entry_date, expiry_date, user_id, metric_id, amount_per_item,
+                               base_amount, base_unit)
+            SELECT g.name, COALESCE(g.category_id, ?), COALESCE(g.quantity, 1), ?,
+                   date(?, '+' || COALESCE(shelf_life.column2, ?) || ' days'), g.user_id, g.metric_id,
+                   g.amount_per_item, g.base_amount, g.base_unit
+            FROM grocery_items g
+            LEFT JOIN labels l ON l.id = g.category_id
+            LEFT JOIN (VALUES {', '.join(['(?, ?)'] * len(shelf_life)) or '(NULL, NULL)'}) shelf_life
+                ON shelf_life.column1 = l.value COLLATE NOCASE
+            WHERE g.user_id = ? AND g.checked = 1
+            ORDER BY g.id
+            RETURNING id
+        ''', [label_id(conn, 'Other'), entry_date, entry_date, CHECKOUT_CONFIG['default_shelf_life_days']] +
+            [value for pair in shelf_life.items() for value in pair] + [user_id])
+        new_ids = [row[0] for row in cursor.fetchall()]
+        moved = len(new_ids)
+        conn.execute('DELETE FROM grocery_items WHERE user_id = ? AND checked = 1', (user_id,))
+        items = conn.execute('''
+            SELECT id, name, type, quantity, entry_date, expiry_date, metric, amount_per_item FROM items_view
+            WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id
+        ''', (json.dumps(new_ids),)).fetchall() if moved else []
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        app.logger.exception("Checkout failed for user %s", user_id)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+    
+    if moved:
+        expiry_scheduler.user_changed(user_id)
+        response_cache.bump(user_id)
+    print(f"Checked out {moved} grocery items for user {user_id}")  # Debug log
+    return jsonify({'success': True, 'items': [dict(item) for item in items]})
+
+def suggestion_sort_key(suggestion):
+    return [suggestion['use_count'], suggestion['last_used'] or '', suggestion['name'],
+            suggestion['category'], suggestion['metric'] or '', suggestion['amount_per_item'] or '']
+
+def get_admin_suggestions(query):
+    """Suggestions across every user, merged from all shards, best first."""
+    def shard_suggestions(conn):
+        # Group on the label ids and decode once per group
+        return conn.execute(f'''
+            SELECT name, {decode_sql('category')} as category, use_count, {decode_sql('metric')} as metric,
+                   amount_per_item, last_used
+            FROM (SELECT name, category_id, MAX(COALESCE(frequency,0)) as use_count, metric_id, amount_per_item,
+                         MAX(last_used) as last_used
+                  FROM item_history 
+                  WHERE LOWER(name) LIKE ? 
+                  GROUP BY name, category_id, metric_id, amount_per_item)
+        ''', (f'%{query}%',)).fetchall()
+    
+    merged = {}
+    for rows in fan_out(shard_suggestions):
+        for row in rows:
+            key = (row['name'], row['category'], row['metric'], row['amount_per_item'])
+            seen = merged.get(key)
+            if seen is None:
+                merged[key] = dict(row)
+            else:
+                seen['use_count'] = max(seen['use_count'], row['use_count'])
+                seen['last_used'] = max(seen['last_used'] or '', row['last_used'] or '')
+    
+    return sorted(merged.values(), key=suggestion_sort_key, reverse=True)
+
 @app.route('/grocery/suggestions', methods=['GET'])
+@cached_response
+@coalesced_response
 def get_suggestions():
     query = request.args.get('query', '').lower()
     user_id = request.args.get('user_id')
@@ -369,25 +1101,37 @@ def get_suggestions():
     
     if not user_id and not is_admin:
         return jsonify({'error': 'user_id is required'}), 400
-        
-    conn = get_db()
+    
     if is_admin:
-        suggestions = conn.execute('''
-            SELECT DISTINCT name, category, MAX(COALESCE(frequency,0)) as use_count, metric, amount_per_item 
-            FROM item_history 
-            WHERE LOWER(name) LIKE ? 
-            GROUP BY name, category, metric, amount_per_item
-            ORDER BY use_count DESC, last_used DESC 
-            LIMIT 1000
-        ''', (f'%{query}%',)).fetchall()
-    else:
-        suggestions = conn.execute('''
-            SELECT name, category, COALESCE(frequency,0) as use_count, metric, amount_per_item
-            FROM item_history 
-            WHERE LOWER(name) LIKE ? AND user_id = ?
-            ORDER BY use_count DESC, last_used DESC 
-            LIMIT 5
-        ''', (f'%{query}%', user_id)).fetchall()
+        # A grouped and merged list has no index to seek, so the page is cut
+        # from the merged list by sort key rather than by offset
+        try:
+            limit, after = page_args('suggestions')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        suggestions = get_admin_suggestions(query)
+        total = len(suggestions) if after is None else None
+        if after is not None:
+            try:
+                suggestions = [s for s in suggestions if suggestion_sort_key(s) < after]
+            except TypeError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+        next_cursor = None
+        if limit is not None and len(suggestions) > limit:
+            suggestions = suggestions[:limit]
+            next_cursor = encode_cursor('suggestions', suggestion_sort_key(suggestions[-1]))
+        for suggestion in suggestions:
+            del suggestion['last_used']
+        return page_response(suggestions, next_cursor, total)
+    
+    conn = get_user_db(user_id)
+    suggestions = conn.execute('''
+        SELECT name, category, COALESCE(frequency,0) as use_count, metric, amount_per_item
+        FROM item_history_view 
+        WHERE LOWER(name) LIKE ? AND user_id = ?
+        ORDER BY use_count DESC, last_used DESC 
+        LIMIT 5
+    ''', (f'%{query}%', user_id)).fetchall()
     
     conn.close()
     return jsonify([dict(item) for item in suggestions])
@@ -395,13 +1139,13 @@ def get_suggestions():
 @app.route('/grocery/suggestions/<suggestion_name>/<suggestion_category>/<int:user_id>', methods=['DELETE'])
 def delete_suggestion(suggestion_name, suggestion_category, user_id):
     try:
-        conn = get_db()
+        conn = get_user_db(user_id)
         cursor = conn.cursor()
         
         # Delete the specific suggestion from item_history
         cursor.execute('''
             DELETE FROM item_history 
-            WHERE name = ? AND category = ? AND user_id = ?
+            WHERE name = ? AND category_id = (SELECT id FROM labels WHERE value = ?) AND user_id = ?
         ''', (suggestion_name, suggestion_category, user_id))
         
         if cursor.rowcount == 0:
@@ -410,6 +1154,7 @@ def delete_suggestion(suggestion_name, suggestion_category, user_id):
             
         conn.commit()
         conn.close()
+        response_cache.bump(user_id)
         
         return jsonify({'success': True, 'message': 'Suggestion deleted successfully'})
         
@@ -417,6 +1162,30 @@ def delete_suggestion(suggestion_name, suggestion_category, user_id):
         print(f"Delete suggestion error: {e}")
         return jsonify({'success': False, 'message': 'Server error'}), 500
 
+@app.route('/grocery/predicted', methods=['GET'])
+def get_predicted_items():
+    """Items the user usually buys again within ?days=, from restock_job.py's
+    last run, leaving out what is already on the list."""
+    user_id = request.args.get('user_id')
+    days = request.args.get('days', RESTOCK_CONFIG['horizon_days'], type=int)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    
+    conn = get_user_db(user_id)
+    predicted = conn.execute(f'''
+        SELECT name, {decode_sql('category')} as category, last_added, interval_days, next_date, intervals
+        FROM restock_predictions p
+        WHERE user_id = ? AND next_date <= date('now', ?)
+        AND NOT EXISTS (SELECT 1 FROM grocery_items g
+                        WHERE g.user_id = p.user_id AND g.checked = 0 AND g.name = p.name COLLATE NOCASE)
+        ORDER BY next_date, name
+        LIMIT ?
+    ''', (user_id, f'{days:+d} days', limit)).fetchall()
+    conn.close()
+    return jsonify([dict(item) for item in predicted])
+
 @app.route('/users/migrate', methods=['POST'])
 def migrate_user_data():
     data = request.json
@@ -426,33 +1195,148 @@ def migrate_user_data():
     if not source_user_id or not target_user_id:
         return jsonify({'error': 'Both source and target user IDs are required'}), 400
         
-    conn = get_db()
+    source = get_user_db(source_user_id)
+    conn = get_user_db(target_user_id)
     cursor = conn.cursor()
     
     try:
-        # Copy grocery items
-        cursor.execute('''
-            INSERT INTO grocery_items (user_id, name, quantity, category, checked, created_at, metric, amount_per_item)
-            SELECT ?, name, quantity, category, checked, created_at, metric, amount_per_item
-            FROM grocery_items WHERE user_id = ?
-        ''', (target_user_id, source_user_id))
+        # Users may live in different shards, so rows are read from the source
+        # and written to the target instead of INSERT ... SELECT
+        grocery_rows = source.execute('''
+            SELECT name, quantity, category, checked, created_at, metric, amount_per_item
+            FROM grocery_items_view WHERE user_id = ?
+        ''', (source_user_id,)).fetchall()
+        history_rows = source.execute('''
+            SELECT name, category, last_used, frequency, metric, amount_per_item
+            FROM item_history_view WHERE user_id = ?
+        ''', (source_user_id,)).fetchall()
+        
+        # Copy grocery items; label ids are per database, so labels go over as text
+        cursor.executemany('''
+            INSERT INTO grocery_items (user_id, name, quantity, category_id, checked, created_at, metric_id, amount_per_item,
+                                       base_amount, base_unit)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(target_user_id, row['name'], row['quantity'], label_id(conn, row['category']), row['checked'],
+               row['created_at'], label_id(conn, row['metric']), row['amount_per_item'],
+               *to_base(row['metric'], row['amount_per_item'])) for row in grocery_rows])
         
         # Copy item history
-        cursor.execute('''
-            INSERT INTO item_history (user_id, name, category, last_used, frequency, metric, amount_per_item)
-            SELECT ?, name, category, last_used, frequency, metric, amount_per_item
-            FROM item_history WHERE user_id = ?
-        ''', (target_user_id, source_user_id))
+        cursor.executemany('''
+            INSERT INTO item_history (user_id, name, category_id, last_used, frequency, metric_id, amount_per_item,
+                                      base_amount, base_unit)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(target_user_id, row['name'], label_id(conn, row['category']), row['last_used'], row['frequency'],
+               label_id(conn, row['metric']), row['amount_per_item'],
+               *to_base(row['metric'], row['amount_per_item'])) for row in history_rows])
         
         conn.commit()
+        response_cache.bump(target_user_id)
         return jsonify({'success': True})
     except Exception as e:
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
+        source.close()
         conn.close()
 
+# Admin overview
+#
+# One request for the admin screen instead of /users plus a /grocery/items
+# call per account. Counts and the newest items per user come from a few
+# grouped queries per shard. The result is cached until the write generation
+# changes: the user count and highest id in the catalog plus the sync_log
+# revision counter of every shard, which every item write already bumps.
+
+MAX_OVERVIEW_ITEMS = 50
+
+_overview_cache = {}
+_overview_lock = threading.Lock()
+
+def write_generation(conn):
+    """Changes whenever a user or an item is added, edited or deleted."""
+    users = conn.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM users').fetchone()
+    
+    def shard_rev(shard):
+        row = shard.execute("SELECT seq FROM sqlite_sequence WHERE name = 'sync_log'").fetchone()
+        return row[0] if row else 0
+    
+    revs = fan_out(shard_rev)
+    return f"{users[0]}.{users[1]}:{'.'.join(str(rev) for rev in revs)}"
+
+def build_admin_overview(items_per_user):
+    def shard_overview(conn):
+        grocery = conn.execute('''
+            SELECT user_id, COUNT(*) as grocery_count, COALESCE(SUM(checked), 0) as checked_count,
+                   MAX(created_at) as last_added
+            FROM grocery_items GROUP BY user_id
+        ''').fetchall()
+        pantry = conn.execute('''
+            SELECT user_id, COUNT(*) as pantry_count,
+                   SUM(julianday(expiry_date) - julianday('now') BETWEEN -1 AND 3) as expiring_count
+            FROM items GROUP BY user_id
+        ''').fetchall()
+        recent = []
+        if items_per_user:
+            recent = conn.execute('''
+                SELECT id, user_id, name, quantity, category, checked, created_at, metric, amount_per_item
+                FROM (SELECT *, ROW_NUMBER() OVER (
+                          PARTITION BY user_id ORDER BY created_at DESC, id DESC) as position
+                      FROM grocery_items_view)
+                WHERE position <= ?
+                ORDER BY user_id, position
+            ''', (items_per_user,)).fetchall()
+        return [dict(row) for row in grocery], [dict(row) for row in pantry], [dict(row) for row in recent]
+    
+    conn = get_db()
+    try:
+        users = [dict(user) for user in conn.execute(
+            'SELECT id, username, is_admin, created_at FROM users ORDER BY id').fetchall()]
+    finally:
+        conn.close()
+    
+    by_id = {}
+    for user in users:
+        user.update(grocery_count=0, checked_count=0, last_added=None, pantry_count=0, expiring_count=0)
+        if items_per_user:
+            user['items'] = []
+        by_id[user['id']] = user
+    
+    for grocery, pantry, recent in fan_out(shard_overview):
+        for row in grocery + pantry:
+            user = by_id.get(row.pop('user_id'))
+            if user is not None:
+                user.update(row)
+        for item in recent:
+            user = by_id.get(item['user_id'])
+            if user is not None:
+                user['items'].append(item)
+    return users
+
+@app.route('/admin/overview', methods=['GET'])
+def admin_overview():
+    items_per_user = request.args.get('items', 0, type=int)
+    items_per_user = max(0, min(items_per_user, MAX_OVERVIEW_ITEMS))
+    
+    conn = get_db()
+    try:
+        generation = write_generation(conn)
+    finally:
+        conn.close()
+    
+    with _overview_lock:
+        cached = _overview_cache.get(items_per_user)
+    if cached is None or cached[0] != generation:
+        cached = (generation, build_admin_overview(items_per_user))
+        with _overview_lock:
+            _overview_cache[items_per_user] = cached
+    
+    response = jsonify({'generation': generation, 'users': cached[1]})
+    response.set_etag(generation)
+    return response.make_conditional(request)
+
 @app.route('/pantry/items', methods=['GET'])
+@cached_response
+@coalesced_response
 def get_pantry_items():
     user_id = request.args.get('user_id')
     sort_by = request.args.get('sort', 'expiry_date')
@@ -460,22 +1344,25 @@ def get_pantry_items():
     if not user_id:
         return jsonify({'error': 'user_id is required'}), 400
     
-    conn = get_db()
+    conn = get_user_db(user_id)
     
     # Validate sort parameter
     valid_sorts = ['name', 'type', 'expiry_date', 'entry_date', 'quantity']
     if sort_by not in valid_sorts:
         sort_by = 'expiry_date'
     
-    items = conn.execute(f'''
-        SELECT id, name, type, quantity, entry_date, expiry_date, metric, amount_per_item
-        FROM items 
-        WHERE user_id = ?
-        ORDER BY {sort_by} ASC
-    ''', (user_id,)).fetchall()
-    
-    conn.close()
-    return jsonify([dict(item) for item in items])
+    # Each sort but type has its own (user_id, column) index; id breaks ties
+    try:
+        items, next_cursor, total = keyset_page(
+            conn, f'pantry:{sort_by}',
+            'SELECT id, name, type, quantity, entry_date, expiry_date, metric, amount_per_item FROM items_view',
+            'user_id = ?', (user_id,), [sort_by, 'id'],
+            count_sql='SELECT COUNT(*) FROM items WHERE user_id = ?')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    return page_response([dict(item) for item in items], next_cursor, total)
 
 @app.route('/pantry/items', methods=['POST'])
 def add_pantry_item():
@@ -485,7 +1372,7 @@ def add_pantry_item():
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    conn = get_db()
+    conn = get_user_db(data['user_id'])
     
     from datetime import datetime
     entry_date = datetime.now().strftime('%Y-%m-%d')
@@ -493,13 +1380,17 @@ def add_pantry_item():
     amount_per_item = data.get('amount_per_item')
     
     cursor = conn.execute('''
-        INSERT INTO items (name, type, quantity, entry_date, expiry_date, user_id, metric, amount_per_item)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (data['name'], data['type'], data['quantity'], entry_date, data['expiry_date'], data['user_id'], metric, amount_per_item))
+        INSERT INTO items (name, type_id, quantity, entry_date, expiry_date, user_id, metric_id, amount_per_item,
+                           base_amount, base_unit)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (data['name'], label_id(conn, data['type']), data['quantity'], entry_date, data['expiry_date'], data['user_id'],
+          label_id(conn, metric), amount_per_item, *to_base(metric, amount_per_item)))
     
     conn.commit()
     item_id = cursor.lastrowid
     conn.close()
+    expiry_scheduler.user_changed(data['user_id'])
+    response_cache.bump(data['user_id'])
     
     return jsonify({'id': item_id, 'message': 'Item added successfully'}), 201
 
@@ -511,32 +1402,90 @@ def update_pantry_item(item_id):
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    conn = get_db()
+    conn = get_request_db()
+    if conn is None:
+        return jsonify({'error': 'user_id is required'}), 400
     
     metric = data.get('metric')
     amount_per_item = data.get('amount_per_item')
     conn.execute('''
         UPDATE items 
-        SET name = ?, type = ?, quantity = ?, expiry_date = ?, metric = ?, amount_per_item = ?
+        SET name = ?, type_id = ?, quantity = ?, expiry_date = ?, metric_id = ?, amount_per_item = ?,
+            base_amount = ?, base_unit = ?
         WHERE id = ?
-    ''', (data['name'], data['type'], data['quantity'], data['expiry_date'], metric, amount_per_item, item_id))
+    ''', (data['name'], label_id(conn, data['type']), data['quantity'], data['expiry_date'],
+          label_id(conn, metric), amount_per_item, *to_base(metric, amount_per_item), item_id))
     
     conn.commit()
+    owner = conn.execute('SELECT user_id FROM items WHERE id = ?', (item_id,)).fetchone()
     conn.close()
+    if owner:
+        expiry_scheduler.user_changed(owner['user_id'])
+        response_cache.bump(owner['user_id'])
     
     return jsonify({'message': 'Item updated successfully'})
 
 @app.route('/pantry/items/<int:item_id>', methods=['DELETE'])
 def delete_pantry_item(item_id):
-    conn = get_db()
+    # Why the item left the pantry, for /analytics; guessed from expiry_date if not given
+    reason = request.args.get('reason')
+    if reason is not None and reason not in PANTRY_EVENTS[1:]:
+        return jsonify({'error': 'reason must be consume, discard or expire'}), 400
     
+    conn = get_request_db()
+    if conn is None:
+        return jsonify({'error': 'user_id is required'}), 400
+    
+    owner = conn.execute('SELECT user_id FROM items WHERE id = ?', (item_id,)).fetchone()
+    if reason:
+        conn.execute('UPDATE items SET removed_as = ? WHERE id = ?', (reason, item_id))
     conn.execute('DELETE FROM items WHERE id = ?', (item_id,))
     conn.commit()
     conn.close()
+    if owner:
+        expiry_scheduler.user_changed(owner['user_id'])
+        response_cache.bump(owner['user_id'])
     
     return jsonify({'message': 'Item deleted successfully'})
 
+# Barcode lookup against the offline catalog built by barcode_catalog.py.
+# The index is memory-mapped once and reopened when a rebuild replaces it.
+
+_barcode_catalog = None
+_barcode_lock = threading.Lock()
+
+def get_barcode_catalog():
+    """The open catalog, or None if no index has been built."""
+    global _barcode_catalog
+    path = BARCODE_CONFIG['catalog_path']
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _barcode_lock:
+        if _barcode_catalog is None or _barcode_catalog.mtime != mtime:
+            # The old map is left to the garbage collector; a request may still be reading it
+            _barcode_catalog = BarcodeCatalog(path)
+        return _barcode_catalog
+
+@app.route('/barcode/<code>', methods=['GET'])
+def lookup_barcode(code):
+    """Name, category, shelf life and a suggested expiry date for a barcode."""
+    if parse_barcode(code) is None:
+        return jsonify({'error': 'barcode must be up to 14 digits'}), 400
+    catalog = get_barcode_catalog()
+    if catalog is None:
+        return jsonify({'error': 'Barcode catalog not installed'}), 503
+    
+    product = catalog.lookup(code)
+    if product is None:
+        return jsonify({'error': 'Unknown barcode'}), 404
+    product['expiry_date'] = date.fromordinal(
+        date.today().toordinal() + product['shelf_life_days']).strftime('%Y-%m-%d')
+    return jsonify(product)
+
 @app.route('/pantry/expiring', methods=['GET'])
+@coalesced_response
 def get_expiring_pantry_items():
     user_id = request.args.get('user_id')
     days_ahead = request.args.get('days', 3, type=int)
@@ -544,13 +1493,13 @@ def get_expiring_pantry_items():
     if not user_id:
         return jsonify({'error': 'user_id is required'}), 400
     
-    conn = get_db()
+    conn = get_user_db(user_id)
     
     # Get items expiring within the specified days
     expiring_items = conn.execute('''
         SELECT name, type, expiry_date,
                CAST((julianday(expiry_date) - julianday('now')) AS INTEGER) as days_until_expiry
-        FROM items 
+        FROM items_view 
         WHERE user_id = ? 
         AND julianday(expiry_date) - julianday('now') BETWEEN -1 AND ?
         ORDER BY expiry_date ASC
@@ -560,6 +1509,566 @@ def get_expiring_pantry_items():
     conn.close()
     return jsonify([dict(item) for item in expiring_items])
 
+@app.route('/search', methods=['GET'])
+@cached_response
+@coalesced_response
+def search():
+    """Pantry, grocery and history entries of a user whose name (or
+    category/type) matches q, best first. ?sources=pantry,grocery narrows it."""
+    user_id = request.args.get('user_id', type=int)
+    query = normalize(request.args.get('q'))
+    sources = request.args.get('sources', ','.join(SEARCH_SOURCES)).split(',')
+    limit = min(request.args.get('limit', SEARCH_CONFIG['default_limit'], type=int), SEARCH_CONFIG['max_limit'])
+    
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    if limit < 1 or any(source not in SEARCH_SOURCES for source in sources):
+        return jsonify({'error': f"limit must be positive and sources one of {', '.join(SEARCH_SOURCES)}"}), 400
+    
+    numbers = {SEARCH_SOURCES[source][0]: source for source in sources}
+    in_sources = f"rowid % {SEARCH_ROWID_STRIDE} IN ({','.join(str(number) for number in numbers)})"
+    conn = get_user_db(user_id)
+    try:
+        if match_query(query):
+            # Any shared trigram makes a candidate; name hits outrank label hits
+            candidates = conn.execute(f'''
+                SELECT rowid, name, label FROM search_index
+                WHERE search_index MATCH ? AND user_id = ? AND {in_sources}
+                ORDER BY bm25(search_index, 10.0, 1.0) LIMIT ?
+            ''', (match_query(query), user_id, SEARCH_CONFIG['candidates'])).fetchall()
+        else:
+            # Shorter than a trigram: substring match without the index
+            pattern = f"%{query.replace('%', '').replace('_', '')}%"
+            candidates = conn.execute(f'''
+                SELECT rowid, name, label FROM search_index
+                WHERE user_id = ? AND (name LIKE ? OR label LIKE ?) AND {in_sources}
+                ORDER BY name LIMIT ?
+            ''', (user_id, pattern, pattern, SEARCH_CONFIG['candidates'])).fetchall()
+        
+        hits = []
+        for rank, (rowid, name, label) in enumerate(candidates):
+            score = max(similarity(query, name), similarity(query, label))
+            if score >= SEARCH_CONFIG['min_similarity']:
+                hits.append((-round(score, 3), rank, rowid))
+        hits = sorted(hits)[:limit]
+        
+        # The rows themselves, as the list endpoints return them
+        ids = {}
+        for _, _, rowid in hits:
+            ids.setdefault(numbers[rowid % SEARCH_ROWID_STRIDE], []).append(rowid // SEARCH_ROWID_STRIDE)
+        rows = {}
+        for source, source_ids in ids.items():
+            _, table, _, columns = SEARCH_SOURCES[source]
+            for row in conn.execute(f"SELECT {columns} FROM {table}_view WHERE id IN ({','.join('?' * len(source_ids))})",
+                                    source_ids):
+                rows[(source, row['id'])] = dict(row)
+    except sqlite3.OperationalError as e:
+        print(f"Search failed: {e}")  # Debug log
+        return jsonify({'error': 'Search index unavailable'}), 503
+    finally:
+        conn.close()
+    
+    results = []
+    for score, _, rowid in hits:
+        source = numbers[rowid % SEARCH_ROWID_STRIDE]
+        row = rows.get((source, rowid // SEARCH_ROWID_STRIDE))
+        if row is not None:
+            results.append({'source': source, 'score': -score, **row})
+    return jsonify(results)
+
+# Totals
+#
+# How much of something is in the pantry and still on the grocery list,
+# summed in SQL from quantity * base_amount (see units.py). Rows are summed
+# per base unit (g, ml, count); rows whose amount couldn't be read are counted
+# in a group with unit null. Checked-off grocery items are left out.
+
+def amount_totals(conn, user_id, by, name=None, label=None):
+    pantry_filter = grocery_filter = ''
+    params = []
+    if name:
+        pantry_filter = grocery_filter = ' AND name = ? COLLATE NOCASE'
+        params = [name]
+    if label:
+        pantry_filter += ' AND type_id = (SELECT id FROM labels WHERE value = ?)'
+        grocery_filter += ' AND category_id = (SELECT id FROM labels WHERE value = ?)'
+        params.append(label)
+    if by == 'type':
+        key, group = f"{decode_sql('label')} as type", 'label_id'
+    else:
+        key, group = 'MIN(name) as name', 'name COLLATE NOCASE'
+    
+    return conn.execute(f'''
+        WITH amounts AS (
+            SELECT name, type_id as label_id, base_unit, quantity * base_amount as amount, 1 as in_pantry
+            FROM items WHERE user_id = ?{pantry_filter}
+            UNION ALL
+            SELECT name, category_id, base_unit, quantity * base_amount, 0
+            FROM grocery_items WHERE user_id = ? AND checked = 0{grocery_filter}
+        )
+        SELECT {key}, base_unit as unit,
+               CASE WHEN base_unit IS NOT NULL THEN TOTAL(CASE WHEN in_pantry THEN amount END) END as pantry,
+               CASE WHEN base_unit IS NOT NULL THEN TOTAL(CASE WHEN NOT in_pantry THEN amount END) END as grocery,
+               SUM(in_pantry) as pantry_count, SUM(NOT in_pantry) as grocery_count
+        FROM amounts
+        GROUP BY {group}, base_unit
+        ORDER BY 1 COLLATE NOCASE, base_unit
+    ''', [user_id] + params + [user_id] + params).fetchall()
+
+@app.route('/totals/items', methods=['GET'])
+def get_item_totals():
+    """Totals per item name, e.g. /totals/items?user_id=2&name=flour"""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    
+    conn = get_user_db(user_id)
+    try:
+        totals = amount_totals(conn, user_id, 'item', name=request.args.get('name'),
+                               label=request.args.get('type'))
+    finally:
+        conn.close()
+    return jsonify([dict(row) for row in totals])
+
+@app.route('/totals/types', methods=['GET'])
+def get_type_totals():
+    """Totals per pantry type / grocery category."""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    
+    conn = get_user_db(user_id)
+    try:
+        totals = amount_totals(conn, user_id, 'type', label=request.args.get('type'))
+    finally:
+        conn.close()
+    return jsonify([dict(row) for row in totals])
+
+# Analytics
+#
+# Added, consumed, discarded and expired pantry amounts for a week (Monday to
+# Sunday), month or year, read from pantry_rollups: at most seven day rows per
+# type, event and unit for a week and one for a month or year.
+
+ANALYTICS_PERIODS = {
+    'week': ('day', "date(?, '-6 days', 'weekday 1')", "date(?, '-6 days', 'weekday 1', '+6 days')"),
+    'month': ('month', "date(?, 'start of month')", "date(?, 'start of month', '+1 month', '-1 day')"),
+    'year': ('year', "date(?, 'start of year')", "date(?, 'start of year', '+1 year', '-1 day')"),
+}
+
+@app.route('/analytics', methods=['GET'])
+def get_analytics():
+    """/analytics?user_id=2&period=week|month|year&date=2026-10-19 (default today)"""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    period = request.args.get('period', 'week')
+    if period not in ANALYTICS_PERIODS:
+        return jsonify({'error': 'period must be week, month or year'}), 400
+    day = request.args.get('date') or datetime.now().strftime('%Y-%m-%d')
+    try:
+        datetime.strptime(day, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    
+    rollup, start_sql, end_sql = ANALYTICS_PERIODS[period]
+    conn = get_user_db(user_id)
+    try:
+        start, end = conn.execute(f'SELECT {start_sql}, {end_sql}', (day, day)).fetchone()
+        rows = conn.execute(f'''
+            SELECT {decode_sql('type')} as type, event, NULLIF(base_unit, '') as unit,
+                   SUM(events) as events, SUM(quantity) as quantity, SUM(amount) as amount
+            FROM pantry_rollups
+            WHERE user_id = ? AND period = ? AND start BETWEEN ? AND ?
+            GROUP BY type_id, event, base_unit
+            ORDER BY 1 COLLATE NOCASE, event, base_unit
+        ''', (user_id, rollup, start, end)).fetchall()
+    finally:
+        conn.close()
+    
+    totals = {event: {'events': 0, 'quantity': 0, 'amounts': {}} for event in PANTRY_EVENTS}
+    for row in rows:
+        total = totals[row['event']]
+        total['events'] += row['events']
+        total['quantity'] += row['quantity']
+        if row['unit']:
+            total['amounts'][row['unit']] = total['amounts'].get(row['unit'], 0) + row['amount']
+    
+    return jsonify({
+        'period': period,
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'types': [dict(row) for row in rows],
+    })
+
+# Bulk import / export
+
+IMPORT_BATCH_SIZE = 500
+
+def bulk_format():
+    """csv or ndjson, from ?format= or the upload's Content-Type."""
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+    return fmt if fmt in FORMATS else None
+
+@app.route('/import', methods=['POST'])
+def bulk_import():
+    """Stream rows from the request body into one table of a user's data.
+    ?table=pantry|grocery|history&user_id=N, body in CSV (with a header row)
+    or NDJSON. Bad rows are reported by line and skipped."""
+    user_id = request.args.get('user_id')
+    table = request.args.get('table')
+    fmt = bulk_format()
+    
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    if table not in BULK_TABLES:
+        return jsonify({'error': f"table must be one of {', '.join(BULK_TABLES)}"}), 400
+    if fmt is None:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    conn = get_user_db(user_id)
+    try:
+        summary = import_rows(conn, table, fmt, stream, int(user_id), batch_size=IMPORT_BATCH_SIZE)
+    except (UnicodeDecodeError, sqlite3.Error) as e:
+        conn.rollback()
+        print(f"Import error: {e}")
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    
+    if summary['imported']:
+        response_cache.bump(user_id)
+    if table == 'pantry' and summary['imported']:
+        expiry_scheduler.user_changed(user_id)
+    summary['success'] = summary['error_count'] == 0
+    return jsonify(summary)
+
+@app.route('/export', methods=['GET'])
+def bulk_export():
+    """Stream one table of a user's data as CSV or NDJSON, straight from the cursor."""
+    user_id = request.args.get('user_id')
+    table = request.args.get('table')
+    fmt = request.args.get('format', 'csv')
+    
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    if table not in BULK_TABLES:
+        return jsonify({'error': f"table must be one of {', '.join(BULK_TABLES)}"}), 400
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    
+    columns = export_columns(table)
+    conn = get_user_db(user_id)
+    cursor = conn.execute(
+        f"SELECT {', '.join(columns)} FROM {BULK_TABLES[table][0]}_view WHERE user_id = ? ORDER BY id", (user_id,))
+    
+    def generate():
+        try:
+            yield from export_lines(cursor, columns, fmt)
+        finally:
+            conn.close()
+    
+    filename = f"pantrybot-{table}-{user_id}.{fmt}"
+    return Response(generate(), mimetype=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+# Expiry notifications
+#
+# Instead of every phone polling /pantry/expiring, the expiry scheduler fires
+# when an item actually crosses a threshold and stores the event in the
+# user's push_outbox. The app long-polls /notifications for new rows.
+
+_notification_ready = threading.Condition()
+_notification_deliveries = 0  # bumped under _notification_ready on every delivery
+
+def load_user_expiries(user_id):
+    conn = get_user_db(user_id)
+    try:
+        return [tuple(row) for row in conn.execute(
+            'SELECT id, name, type, expiry_date FROM items_view WHERE user_id = ?', (user_id,))]
+    finally:
+        conn.close()
+
+def load_all_expiries():
+    def shard_items(conn):
+        return conn.execute('SELECT user_id, id, name, type, expiry_date FROM items_view WHERE user_id IS NOT NULL').fetchall()
+    
+    items = {}
+    for rows in fan_out(shard_items):
+        for row in rows:
+            items.setdefault(row['user_id'], []).append(tuple(row)[1:])
+    return items
+
+def deliver_notifications(user_id, events):
+    conn = get_user_db(user_id)
+    try:
+        conn.executemany('''
+            INSERT OR IGNORE INTO push_outbox
+                (user_id, item_id, name, type, expiry_date, threshold, days_until_expiry)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(user_id, e['item_id'], e['name'], e['type'], e['expiry_date'], e['threshold'],
+               e['days_until_expiry']) for e in events])
+        conn.execute("DELETE FROM push_outbox WHERE user_id = ? AND created_at < datetime('now', ?)",
+                     (user_id, f"-{NOTIFY_CONFIG['keep_days']} days"))
+        conn.commit()
+    finally:
+        conn.close()
+    global _notification_deliveries
+    with _notification_ready:
+        _notification_deliveries += 1
+        _notification_ready.notify_all()
+
+expiry_scheduler = ExpiryScheduler(
+    load_user_expiries, load_all_expiries, deliver_notifications,
+    thresholds=NOTIFY_CONFIG['thresholds_days'], notify_hour=NOTIFY_CONFIG['notify_hour'])
+
+@app.before_request
+def start_expiry_scheduler():
+    # Under a WSGI server __main__ below never runs; the first request of any
+    # kind starts the scheduler, so pantry writes are tracked from then on
+    expiry_scheduler.start()
+
+@app.route('/notifications', methods=['GET'])
+def get_notifications():
+    """Notifications with id > after. With wait=N the request is held up to N
+    seconds until one arrives, so the app can subscribe with a loop."""
+    user_id = request.args.get('user_id')
+    after = request.args.get('after', 0, type=int)
+    wait = min(max(request.args.get('wait', 0, type=int), 0), NOTIFY_CONFIG['max_wait_seconds'])
+    
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    
+    deadline = time.monotonic() + wait
+    while True:
+        deliveries = _notification_deliveries
+        conn = get_user_db(user_id)
+        notifications = conn.execute('''
+            SELECT id, item_id, name, type, expiry_date, threshold, days_until_expiry, created_at
+            FROM push_outbox
+            WHERE user_id = ? AND id > ?
+            ORDER BY id
+            LIMIT 50
+        ''', (user_id, after)).fetchall()
+        conn.close()
+        
+        remaining = deadline - time.monotonic()
+        if notifications or remaining <= 0:
+            return jsonify([dict(n) for n in notifications])
+        with _notification_ready:
+            if deliveries == _notification_deliveries:
+                _notification_ready.wait(remaining)
+
+def resolve_sync_fields(table, current, fields, changed_at):
+    """Apply SYNC_FIELD_RULES; returns the fields where the kiosk's value wins."""
+    rules = SYNC_FIELD_RULES[table]
+    kiosk_is_newer = changed_at >= (current['updated_at'] or '')
+    winners = {}
+    for field, value in fields.items():
+        rule = rules[field]
+        if value == current[field] or rule == 'server':
+            continue
+        if kiosk_is_newer:
+            winners[field] = value
+        elif rule == 'earliest' and value is not None and (current[field] is None or value < current[field]):
+            winners[field] = value
+    return winners
+
+def apply_sync_change(cursor, user_id, client_id, change):
+    """Apply one pushed kiosk change. Returns (status, server row id)."""
+    table = change.get('table')
+    if table not in SYNC_FIELD_RULES:
+        raise ValueError(f"Unknown table: {table}")
+    rules = SYNC_FIELD_RULES[table]
+    op = change.get('op')
+    row_id = change.get('id')
+    local_id = change.get('local_id')
+    changed_at = change.get('updated_at') or ''
+    fields = {k: v for k, v in (change.get('fields') or {}).items() if k in rules}
+    
+    # A retried insert whose response got lost becomes an update of the same row
+    if not row_id and local_id is not None:
+        origin = cursor.execute(
+            'SELECT row_id FROM sync_origins WHERE client_id = ? AND table_name = ? AND local_id = ?',
+            (client_id, table, local_id)
+        ).fetchone()
+        if origin:
+            row_id = origin['row_id']
+    
+    if op == 'delete':
+        if row_id:
+            cursor.execute(f'DELETE FROM {table} WHERE id = ? AND user_id = ?', (row_id, user_id))
+        return 'deleted', row_id
+    
+    if row_id:
+        current = cursor.execute(
+            f'SELECT * FROM {table}_view WHERE id = ? AND user_id = ?', (row_id, user_id)
+        ).fetchone()
+        if current is None:
+            # Deleted on the server while the kiosk edited it: the delete wins
+            return 'deleted', row_id
+        
+        winners = resolve_sync_fields(table, current, fields, changed_at)
+        if winners:
+            encoded = encode_fields(cursor.connection, table, winners)
+            if 'metric' in winners or 'amount_per_item' in winners:
+                encoded.update(base_fields(winners.get('metric', current['metric']),
+                                           winners.get('amount_per_item', current['amount_per_item'])))
+            assignments = ', '.join(f'{field} = ?' for field in encoded)
+            cursor.execute(
+                f'UPDATE {table} SET {assignments}, updated_at = ? WHERE id = ?',
+                (*encoded.values(), max(changed_at, current['updated_at'] or ''), row_id)
+            )
+        lost = [field for field in fields if field not in winners and fields[field] != current[field]]
+        if not lost:
+            return 'applied', row_id
+        return ('merged' if winners else 'rejected'), row_id
+    
+    if table == 'grocery_items':
+        fields.setdefault('category', DEFAULT_GROCERY_CATEGORY)
+    base = base_fields(fields.get('metric'), fields.get('amount_per_item'))
+    fields = encode_fields(cursor.connection, table, fields)
+    fields.update(base)
+    columns = list(fields) + ['user_id', 'updated_at']
+    cursor.execute(
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+        (*fields.values(), user_id, changed_at or None)
+    )
+    row_id = cursor.lastrowid
+    if local_id is not None:
+        cursor.execute(
+            'INSERT OR REPLACE INTO sync_origins (client_id, table_name, local_id, row_id) VALUES (?, ?, ?, ?)',
+            (client_id, table, local_id, row_id)
+        )
+    return 'applied', row_id
+
+@app.route('/sync/push', methods=['POST'])
+def sync_push():
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id')
+    client_id = data.get('client_id')
+    changes = data.get('changes') or []
+    
+    if not user_id or not client_id:
+        return jsonify({'error': 'user_id and client_id are required'}), 400
+    
+    conn = get_user_db(user_id)
+    cursor = conn.cursor()
+    results = []
+    
+    try:
+        for change in changes:
+            try:
+                status, row_id = apply_sync_change(cursor, user_id, client_id, change)
+            except sqlite3.IntegrityError as e:
+                # Bad row (e.g. missing NOT NULL field): report it, keep the batch going
+                status, row_id = 'invalid', change.get('id')
+                print(f"Sync change rejected: {e}")
+            results.append({'op_id': change.get('op_id'), 'id': row_id, 'status': status})
+        conn.commit()
+        if changes:
+            response_cache.bump(user_id)
+        if any(change.get('table') == 'items' for change in changes):
+            expiry_scheduler.user_changed(user_id)
+        return jsonify({'success': True, 'results': results})
+    except ValueError as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Sync push error: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@app.route('/sync/pull', methods=['GET'])
+def sync_pull():
+    user_id = request.args.get('user_id')
+    since = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', 500, type=int), 1000)
+    
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    
+    conn = get_user_db(user_id)
+    entries = conn.execute('''
+        SELECT rev, table_name, row_id, op FROM sync_log
+        WHERE user_id = ? AND rev > ?
+        ORDER BY rev ASC
+        LIMIT ?
+    ''', (user_id, since, limit)).fetchall()
+    
+    # Fetch the current rows in one query per table
+    rows = {}
+    for table in SYNC_FIELD_RULES:
+        ids = [entry['row_id'] for entry in entries if entry['table_name'] == table and entry['op'] == 'upsert']
+        if ids:
+            found = conn.execute(
+                f'SELECT * FROM {table}_view WHERE id IN ({",".join("?" * len(ids))})', ids
+            ).fetchall()
+            rows.update({(table, row['id']): dict(row) for row in found})
+    conn.close()
+    
+    changes = []
+    for entry in entries:
+        row = rows.get((entry['table_name'], entry['row_id']))
+        changes.append({
+            'rev': entry['rev'],
+            'table': entry['table_name'],
+            'op': entry['op'] if entry['op'] == 'delete' or row else 'delete',
+            'id': entry['row_id'],
+            'row': row,
+        })
+    
+    return jsonify({
+        'changes': changes,
+        'next': entries[-1]['rev'] if entries else since,
+        'more': len(entries) == limit,
+    })
+
+@app.route('/admin/profile', methods=['GET', 'DELETE'])
+def continuous_profile():
+    """Hottest stacks seen by the continuous sampler; DELETE starts a new window."""
+    if request_profiler is None or request_profiler.continuous is None:
+        return jsonify({'error': 'Continuous profiling is off'}), 404
+    token = request.headers.get('X-Profile-Token') or request.args.get('token')
+    if not PROFILE_CONFIG['token'] or token != PROFILE_CONFIG['token']:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    sampler = request_profiler.continuous
+    if request.method == 'DELETE':
+        sampler.reset()
+        return jsonify({'success': True})
+    
+    limit = request.args.get('limit', 30, type=int)
+    samples, stacks = sampler.hot_stacks(limit)
+    if request.args.get('format') == 'folded':
+        return '\n'.join(f"{stack} {count}" for stack, count in stacks) + '\n', 200, {'Content-Type': 'text/plain'}
+    return jsonify({
+        'since': datetime.fromtimestamp(sampler.started).isoformat(timespec='seconds'),
+        'samples': samples,
+        'stacks': [{'stack': stack.split(';'), 'count': count, 'share': count / samples if samples else 0}
+                   for stack, count in stacks],
+    })
+
+@app.route('/admin/cache', methods=['GET', 'DELETE'])
+def response_cache_stats():
+    """Hit/miss counts and size of the response cache, and how many GETs were
+    coalesced; DELETE empties the cache."""
+    if request.method == 'DELETE':
+        response_cache.clear()
+        return jsonify({'success': True})
+    stats = response_cache.stats()
+    stats['enabled'] = RESPONSE_CACHE_CONFIG['enabled']
+    stats['coalescing'] = request_flight.stats()
+    return jsonify(stats)
+
 @app.route('/version', methods=['GET'])
 def get_version():
     return jsonify({'version': APP_VERSION})
@@ -577,6 +2086,7 @@ def get_apk():
         return jsonify({'error': 'APK file not found'}), 404
 
 if __name__ == '__main__':
+    expiry_scheduler.start()
     app.run(host='0.0.0.0', port=5000) 
 
 
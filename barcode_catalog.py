@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Offline barcode -> product lookup for adding pantry items.
+
+An offline product dump (an Open Food Facts CSV/TSV export, or a plain CSV
+with barcode,name,category,shelf_life_days columns; .gz is fine) is compiled
+into one index file:
+
+    header   magic, product count, section offsets
+    keys     sorted barcodes, one uint64 each
+    values   per barcode: name offset (uint32), category (uint16),
+             shelf life in days (uint16), 8 bytes
+    names    length-prefixed UTF-8
+    categories
+
+The file is memory-mapped, not loaded. A lookup is a C bisect over the keys
+section (about 25 probes for tens of millions of products, each touching a
+page the OS caches) and one read of the value and name, a few microseconds.
+The import streams the dump: rows are sorted in bounded runs written to
+temporary files and merged, so memory use doesn't grow with the dump.
+
+Build or query from the command line:
+    python3 barcode_catalog.py build en.openfoodfacts.org.products.csv.gz
+    python3 barcode_catalog.py lookup 3017620422003
+"""
+
+import argparse
+import bisect
+import csv
+import gzip
+import heapq
+import io
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+from config import BARCODE_CONFIG, CHECKOUT_CONFIG
+
+MAGIC = b'PBBARC01'
+HEADER = struct.Struct('<8s5Q')  # magic, count, keys, values, names, categories offsets
+VALUE = struct.Struct('<IHH')
+MAX_SHELF_LIFE = 0xFFFF  # uint16
+
+# Open Food Facts pnns group -> pantry category
+PNNS_CATEGORIES = {
+    'milk and dairy products': 'Dairy',
+    'fish meat eggs': 'Meats',
+    'fruits and vegetables': 'Vegetables',
+    'cereals and potatoes': 'Grains',
+    'sugary snacks': 'Sweets',
+    'salty snacks': 'Sweets',
+    'fat and sauces': 'Oils',
+    'beverages': 'Drinks',
+}
+
+# Otherwise the first category whose keyword appears in the product's categories
+CATEGORY_KEYWORDS = [
+    ('Drinks', ('beverage', 'drink', 'juice', 'water', 'soda', 'coffee', 'tea')),
+    ('Dairy', ('dair', 'milk', 'cheese', 'yogurt', 'yoghurt', 'butter', 'cream')),
+    ('Meats', ('meat', 'fish', 'seafood', 'poultry', 'chicken', 'sausage', 'ham')),
+    ('Fruits', ('fruit',)),
+    ('Vegetables', ('vegetable', 'legume', 'salad')),
+    ('Grains', ('cereal', 'bread', 'pasta', 'rice', 'flour', 'grain')),
+    ('Sweets', ('sweet', 'chocolate', 'candy', 'confectioner', 'biscuit', 'cookie', 'snack', 'dessert')),
+    ('Oils', ('oil', 'fat')),
+]
+
+
+def parse_barcode(text):
+    """EAN/UPC/GTIN digits as an int (leading zeros don't matter), else None."""
+    digits = str(text).strip().replace(' ', '')
+    if not digits.isdigit() or len(digits) > 14:
+        return None
+    return int(digits)
+
+
+def product_category(row):
+    if row.get('category'):
+        return row['category']
+    pnns = PNNS_CATEGORIES.get((row.get('pnns_groups_1') or '').strip().lower())
+    if pnns:
+        return pnns
+    text = ' '.join(row.get(column) or '' for column in ('main_category_en', 'categories_en', 'categories')).lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return 'Other'
+
+
+def shelf_life_days(row, category):
+    """The dump's shelf life, or else the usual one for the category (config.py)."""
+    days = row.get('shelf_life_days')
+    if days and str(days).isdigit():
+        return min(int(days), MAX_SHELF_LIFE)
+    return CHECKOUT_CONFIG['shelf_life_days'].get(category, CHECKOUT_CONFIG['default_shelf_life_days'])
+
+
+def open_dump(path):
+    raw = gzip.open(path, 'rt', encoding='utf-8', errors='replace', newline='') if path.endswith('.gz') \
+        else open(path, encoding='utf-8', errors='replace', newline='')
+    header = raw.readline()
+    delimiter = '\t' if '\t' in header else ','
+    # Field names only; rows are read lazily from the same file
+    fields = next(csv.reader([header], delimiter=delimiter))
+    return raw, csv.DictReader(raw, fieldnames=fields, delimiter=delimiter, quoting=csv.QUOTE_NONE
+                               if delimiter == '\t' else csv.QUOTE_MINIMAL)
+
+
+def read_products(path):
+    """(barcode, name, category, shelf life) per usable row of the dump."""
+    csv.field_size_limit(2 ** 31 - 1)
+    raw, reader = open_dump(path)
+    with raw:
+        for row in reader:
+            code = parse_barcode(row.get('code') or row.get('barcode') or '')
+            name = ' '.join((row.get('product_name') or row.get('name') or '').split())
+            if code is None or not name:
+                continue
+            category = product_category(row)
+            yield code, name, category, shelf_life_days(row, category)
+
+
+def write_run(products, workdir):
+    products.sort(key=lambda product: product[0])
+    run = tempfile.TemporaryFile('w+', dir=workdir, encoding='utf-8', newline='')
+    for code, name, category, days in products:
+        run.write(f"{code}\t{days}\t{category}\t{name}\n")
+    run.seek(0)
+    return run
+
+
+def read_run(run):
+    for line in run:
+        code, days, category, name = line.rstrip('\n').split('\t', 3)
+        yield int(code), name, category, int(days)
+
+
+def build(dump_path, index_path, run_size=200000):
+    """Compile the dump into index_path; returns the number of products."""
+    workdir = os.path.dirname(os.path.abspath(index_path))
+    runs, products = [], []
+    for product in read_products(dump_path):
+        products.append(product)
+        if len(products) >= run_size:
+            runs.append(write_run(products, workdir))
+            products = []
+    runs.append(write_run(products, workdir))
+
+    categories = {}
+    count = names_size = 0
+    sections = [tempfile.TemporaryFile(dir=workdir) for _ in range(3)]
+    keys, values, names = sections
+    previous = None
+    try:
+        for code, name, category, days in heapq.merge(*(read_run(run) for run in runs), key=lambda p: p[0]):
+            if code == previous:
+                continue  # the same barcode twice in the dump: keep the first
+            previous = code
+            category_index = categories.setdefault(category, len(categories))
+            encoded = name.encode('utf-8')[:255].decode('utf-8', 'ignore').encode('utf-8')
+            keys.write(struct.pack('<Q', code))
+            values.write(VALUE.pack(names_size, category_index, days))
+            names.write(bytes([len(encoded)]) + encoded)
+            names_size += 1 + len(encoded)
+            count += 1
+
+        category_blob = io.BytesIO()
+        category_blob.write(struct.pack('<H', len(categories)))
+        for category in categories:
+            encoded = category.encode('utf-8')[:255]
+            category_blob.write(bytes([len(encoded)]) + encoded)
+
+        keys_offset = HEADER.size
+        values_offset = keys_offset + 8 * count
+        names_offset = values_offset + VALUE.size * count
+        categories_offset = names_offset + names_size
+        # Written next to the old index and swapped in, so readers never see half a file
+        partial = index_path + '.partial'
+        with open(partial, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, count, keys_offset, values_offset, names_offset, categories_offset))
+            for section in sections:
+                section.seek(0)
+                shutil.copyfileobj(section, out)
+            out.write(category_blob.getvalue())
+        os.replace(partial, index_path)
+    finally:
+        for handle in sections + runs:
+            handle.close()
+    return count
+
+
+class BarcodeCatalog:
+    """Read-only view of an index file built by build()."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, keys, self.values, self.names, categories = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f'{path} is not a barcode catalog')
+        if sys.byteorder == 'little':
+            self.keys = memoryview(self.map)[keys:keys + 8 * self.count].cast('Q')
+        else:
+            self.keys = [struct.unpack_from('<Q', self.map, keys + 8 * i)[0] for i in range(self.count)]
+        self.categories = []
+        offset = categories + 2
+        for _ in range(struct.unpack_from('<H', self.map, categories)[0]):
+            length = self.map[offset]
+            self.categories.append(self.map[offset + 1:offset + 1 + length].decode('utf-8'))
+            offset += 1 + length
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, barcode):
+        """{'barcode', 'name', 'category', 'shelf_life_days'} or None."""
+        code = parse_barcode(barcode)
+        if code is None:
+            return None
+        index = bisect.bisect_left(self.keys, code)
+        if index == self.count or self.keys[index] != code:
+            return None
+        name_offset, category, days = VALUE.unpack_from(self.map, self.values + VALUE.size * index)
+        start = self.names + name_offset
+        length = self.map[start]
+        return {
+            'barcode': str(barcode).strip(),
+            'name': self.map[start + 1:start + 1 + length].decode('utf-8'),
+            'category': self.categories[category],
+            'shelf_life_days': days,
+        }
+
+    def close(self):
+        if isinstance(self.keys, memoryview):
+            self.keys.release()
+        self.map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='compile a product dump into the index')
+    build_parser.add_argument('dump')
+    build_parser.add_argument('--out', default=BARCODE_CONFIG['catalog_path'])
+    lookup_parser = commands.add_parser('lookup', help='look up barcodes in the index')
+    lookup_parser.add_argument('barcodes', nargs='+')
+    lookup_parser.add_argument('--index', default=BARCODE_CONFIG['catalog_path'])
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        count = build(args.dump, args.out)
+        print(f"{count} products, {os.path.getsize(args.out) / 1024 / 1024:.1f} MB in {args.out} "
+              f"({time.perf_counter() - start:.0f}s)")
+    else:
+        catalog = BarcodeCatalog(args.index)
+        for barcode in args.barcodes:
+            print(f"{barcode}: {catalog.lookup(barcode) or 'not found'}")
+        catalog.close()
+
+
+if __name__ == '__main__':
+    main()
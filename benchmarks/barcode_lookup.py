@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark the barcode catalog: streaming build and memory-mapped lookups.
+
+Writes a synthetic Open Food Facts style TSV dump, compiles it with
+barcode_catalog.build (in small sort runs, as on a Pi), then times lookups
+of known and unknown barcodes and reports how much of the index the
+process actually has resident.
+
+Run from the repository root:
+    python3 -m benchmarks.barcode_lookup
+    python3 -m benchmarks.barcode_lookup --products 3000000 --lookups 200000
+"""
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+import barcode_catalog
+
+GROUPS = ['Milk and dairy products', 'Fish Meat Eggs', 'Fruits and vegetables', 'Cereals and potatoes',
+          'Sugary snacks', 'Beverages', 'Fat and sauces', '']
+WORDS = ['organic', 'classic', 'whole', 'light', 'crunchy', 'fresh', 'dark', 'salted', 'family', 'mini']
+
+
+def write_dump(path, products, seed=42):
+    rng = random.Random(seed)
+    codes = rng.sample(range(10 ** 12, 10 ** 13), products)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('code\tproduct_name\tcategories_en\tpnns_groups_1\tmain_category_en\tingredients_text\n')
+        for code in codes:
+            name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} product {code % 100000}"
+            f.write(f"{code}\t{name}\tFoods\t{rng.choice(GROUPS)}\tFoods\t{'ingredient, ' * rng.randint(3, 20)}\n")
+    return codes
+
+
+def resident_kib():
+    """Resident set size now, from /proc (Linux), else peak RSS."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--run-size', type=int, default=100000, help='rows sorted in memory at a time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        dump, index = os.path.join(workdir, 'dump.tsv'), os.path.join(workdir, 'barcodes.idx')
+        codes = write_dump(dump, args.products)
+        print(f"Dump: {args.products} products, {os.path.getsize(dump) / 1024 / 1024:.0f} MB")
+
+        start = time.perf_counter()
+        count = barcode_catalog.build(dump, index, run_size=args.run_size)
+        print(f"Built {count} products in {time.perf_counter() - start:.1f}s, "
+              f"index {os.path.getsize(index) / 1024 / 1024:.1f} MB ({os.path.getsize(index) / count:.1f} B/product)")
+
+        rng = random.Random(7)
+        hits = [str(rng.choice(codes)) for _ in range(args.lookups)]
+        misses = [str(rng.randrange(10 ** 13, 10 ** 14)) for _ in range(args.lookups)]
+
+        before = resident_kib()
+        start = time.perf_counter()
+        catalog = barcode_catalog.BarcodeCatalog(index)
+        print(f"Opened in {(time.perf_counter() - start) * 1000:.2f} ms, resident +{resident_kib() - before} KiB")
+        for label, barcodes in (('hit', hits), ('miss', misses)):
+            start = time.perf_counter()
+            found = sum(1 for barcode in barcodes if catalog.lookup(barcode) is not None)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<5}{elapsed / len(barcodes) * 1e6:>8.2f} us/lookup  ({found} found)")
+        # Pages of the map count as resident once read, but they are page cache
+        # the kernel can drop under memory pressure, not heap
+        print(f"Resident +{resident_kib() - before} KiB after {args.lookups * 2} lookups (mapped file pages)")
+        catalog.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark the label-id encoding of category, type and metric.
+
+Builds a large synthetic database in the old layout (label text in every
+row), copies it and migrates the copy with api.init_data_schema, then
+compares table and index sizes and times the queries that group or sort on
+those columns, old layout against new.
+
+Run from the repository root:
+    python3 -m benchmarks.label_encoding
+    python3 -m benchmarks.label_encoding --users 2000 --rows 400 --repeat 10
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import api
+from labels import decode_sql
+
+CATEGORIES = ['Vegetables', 'Fruits', 'Dairy', 'Meat & Fish', 'Bakery', 'Pantry Staples',
+              'Frozen Foods', 'Beverages', 'Snacks', 'Household', 'Personal Care', 'Other']
+METRICS = [None, 'Kg', 'g', 'L', 'ml', 'pcs', 'pack']
+NAMES = ['milk', 'eggs', 'bread', 'rice', 'pasta', 'apples', 'bananas', 'carrots', 'onions', 'cheese',
+         'yogurt', 'chicken', 'salmon', 'butter', 'flour', 'sugar', 'coffee', 'tea', 'juice', 'soap']
+
+# The layout before labels.py
+LEGACY_SCHEMA = '''
+CREATE TABLE grocery_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, quantity INTEGER DEFAULT 1,
+    category TEXT DEFAULT 'Vegetables', checked INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, user_id INTEGER, priority INTEGER DEFAULT 0,
+    metric TEXT DEFAULT NULL, amount_per_item TEXT DEFAULT NULL, updated_at TEXT DEFAULT NULL);
+CREATE TABLE items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, type TEXT NOT NULL,
+    quantity INTEGER NOT NULL, entry_date TEXT NOT NULL, expiry_date TEXT NOT NULL, user_id INTEGER,
+    metric TEXT DEFAULT NULL, amount_per_item TEXT DEFAULT NULL, updated_at TEXT DEFAULT NULL);
+CREATE TABLE item_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, category TEXT NOT NULL,
+    last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP, frequency INTEGER DEFAULT 0, user_id INTEGER,
+    metric TEXT DEFAULT NULL, amount_per_item TEXT DEFAULT NULL, UNIQUE(name, category, user_id));
+CREATE INDEX idx_grocery_items_user_created ON grocery_items (user_id, created_at);
+CREATE INDEX idx_items_user_type ON items (user_id, type);
+CREATE INDEX idx_items_user_name ON items (user_id, name);
+'''
+
+QUERIES = {
+    'legacy': {
+        'admin suggestions': '''
+            SELECT name, category, MAX(COALESCE(frequency,0)) as use_count, metric, amount_per_item,
+                   MAX(last_used) as last_used
+            FROM item_history WHERE LOWER(name) LIKE ? GROUP BY name, category, metric, amount_per_item''',
+        'pantry by type': '''
+            SELECT id, name, type, quantity, entry_date, expiry_date, metric, amount_per_item
+            FROM items WHERE user_id = ? ORDER BY type, id''',
+        'grocery list': 'SELECT * FROM grocery_items WHERE user_id = ? ORDER BY created_at DESC, id DESC',
+        'history lookup': 'SELECT id FROM item_history WHERE name = ? AND category = ? AND user_id = ?',
+    },
+    'encoded': {
+        'admin suggestions': f'''
+            SELECT name, {decode_sql('category')} as category, use_count, {decode_sql('metric')} as metric,
+                   amount_per_item, last_used
+            FROM (SELECT name, category_id, MAX(COALESCE(frequency,0)) as use_count, metric_id, amount_per_item,
+                         MAX(last_used) as last_used
+                  FROM item_history WHERE LOWER(name) LIKE ?
+                  GROUP BY name, category_id, metric_id, amount_per_item)''',
+        'pantry by type': '''
+            SELECT id, name, type, quantity, entry_date, expiry_date, metric, amount_per_item
+            FROM items_view WHERE user_id = ? ORDER BY type, id''',
+        'grocery list': 'SELECT * FROM grocery_items_view WHERE user_id = ? ORDER BY created_at DESC, id DESC',
+        'history lookup': ('SELECT id FROM item_history WHERE name = ? '
+                           'AND category_id = (SELECT id FROM labels WHERE value = ?) AND user_id = ?'),
+    },
+}
+
+
+def build_legacy(path, users, rows, seed=42):
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    db.executescript(LEGACY_SCHEMA)
+    for user_id in range(1, users + 1):
+        db.executemany(
+            'INSERT INTO grocery_items (name, quantity, category, checked, created_at, user_id, metric, amount_per_item) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(f"{rng.choice(NAMES)} {i}", rng.randint(1, 5), rng.choice(CATEGORIES), rng.randint(0, 1),
+              f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d} 12:00:00", user_id,
+              rng.choice(METRICS), str(rng.randint(1, 5))) for i in range(rows)])
+        db.executemany(
+            'INSERT INTO items (name, type, quantity, entry_date, expiry_date, user_id, metric, amount_per_item) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(f"{rng.choice(NAMES)} {i}", rng.choice(CATEGORIES), rng.randint(1, 5), '2026-09-01',
+              f"2026-{rng.randint(10, 12):02d}-{rng.randint(1, 28):02d}", user_id,
+              rng.choice(METRICS), str(rng.randint(1, 5))) for i in range(rows)])
+        db.executemany(
+            'INSERT OR IGNORE INTO item_history (name, category, frequency, user_id, metric, amount_per_item) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(rng.choice(NAMES), rng.choice(CATEGORIES), rng.randint(1, 30), user_id,
+              rng.choice(METRICS), str(rng.randint(1, 3))) for _ in range(rows // 4)])
+    db.commit()
+    return db
+
+
+def object_sizes(db):
+    """Bytes per table and index; empty when SQLite was built without dbstat."""
+    try:
+        return dict(db.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+    except sqlite3.OperationalError:
+        return {}
+
+
+def time_query(db, sql, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = db.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=200, help='grocery and pantry rows per user')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_path = os.path.join(workdir, 'legacy.db')
+        encoded_path = os.path.join(workdir, 'encoded.db')
+        start = time.perf_counter()
+        build_legacy(legacy_path, args.users, args.rows).close()
+        shutil.copy(legacy_path, encoded_path)
+        print(f"Built {args.users} users x {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        encoded = sqlite3.connect(encoded_path)
+        start = time.perf_counter()
+        api.init_data_schema(encoded)
+        encoded.commit()
+        print(f"Migrated in {time.perf_counter() - start:.1f}s")
+        # The legacy file only has the indexes it needs for these queries
+        encoded.execute('DROP INDEX IF EXISTS idx_items_user_expiry_date')
+        encoded.execute('DROP INDEX IF EXISTS idx_items_user_entry_date')
+        encoded.execute('DROP INDEX IF EXISTS idx_items_user_quantity')
+
+        dbs = {'legacy': sqlite3.connect(legacy_path), 'encoded': encoded}
+        for db in dbs.values():
+            db.execute('VACUUM')
+            db.execute('ANALYZE')
+
+        sizes = {layout: object_sizes(db) for layout, db in dbs.items()}
+        print(f"\n{'object':<36}{'legacy KiB':>12}{'encoded KiB':>13}")
+        for name in ('grocery_items', 'items', 'item_history', 'sqlite_autoindex_item_history_1',
+                     'idx_grocery_items_user_created', 'idx_items_user_name'):
+            print(f"{name:<36}{sizes['legacy'].get(name, 0) / 1024:>12.0f}{sizes['encoded'].get(name, 0) / 1024:>13.0f}")
+        print(f"{'idx_items_user_type (legacy only)':<36}{sizes['legacy'].get('idx_items_user_type', 0) / 1024:>12.0f}"
+              f"{'-':>13}")
+        print(f"{'file':<36}{os.path.getsize(legacy_path) / 1024:>12.0f}{os.path.getsize(encoded_path) / 1024:>13.0f}")
+
+        user_id = args.users // 2
+        params = {
+            'admin suggestions': ('%a%',),
+            'pantry by type': (user_id,),
+            'grocery list': (user_id,),
+            'history lookup': ('milk', 'Dairy', user_id),
+        }
+        print(f"\n{'query':<20}{'legacy ms':>11}{'rows':>8}{'encoded ms':>12}{'rows':>8}")
+        for query in params:
+            old = time_query(dbs['legacy'], QUERIES['legacy'][query], params[query], args.repeat)
+            new = time_query(dbs['encoded'], QUERIES['encoded'][query], params[query], args.repeat)
+            print(f"{query:<20}{old[0]:>11.2f}{old[1]:>8}{new[0]:>12.2f}{new[1]:>8}")
+        for db in dbs.values():
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
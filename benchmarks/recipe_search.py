@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark kiosk recipe search: old LIKE scan vs the FTS5 index.
+
+Imports a recipe dump (NDJSON, one {"title", "author", "description",
+"prep_time", "cook_time"} object per line) into a scratch database and times
+a set of searches both ways. Without --dump a synthetic 10k-recipe dump is
+generated first.
+
+Run from the repository root:
+    python3 -m benchmarks.recipe_search
+    python3 -m benchmarks.recipe_search --dump recipes.ndjson --repeat 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import pantrybot
+
+WORDS = [
+    'tomato', 'basil', 'garlic', 'onion', 'chicken', 'beef', 'lentil', 'rice',
+    'pasta', 'lemon', 'ginger', 'curry', 'coconut', 'spinach', 'mushroom',
+    'potato', 'carrot', 'pepper', 'chili', 'cheese', 'butter', 'cream', 'honey',
+    'almond', 'oat', 'apple', 'banana', 'chocolate', 'vanilla', 'cinnamon',
+]
+DISHES = ['soup', 'stew', 'salad', 'bake', 'curry', 'pie', 'risotto', 'stir fry', 'cake', 'bowl']
+AUTHORS = ['Ann', 'Bob', 'Chef Mira', 'Grandma', 'Samir', 'Lena', 'Tom', 'Yuki']
+QUERIES = ['tom', 'garlic soup', 'chef', 'coconut curry', 'choc', 'lemon cake', 'grandma pie', 'zzz']
+
+
+def write_synthetic_dump(path, count, seed=42):
+    rng = random.Random(seed)
+    with open(path, 'w') as dump:
+        for _ in range(count):
+            title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(DISHES)}"
+            description = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+            dump.write(json.dumps({
+                'title': title,
+                'author': rng.choice(AUTHORS),
+                'description': description,
+                'prep_time': rng.randint(5, 60),
+                'cook_time': rng.randint(0, 120),
+            }) + '\n')
+
+
+def read_dump(path):
+    with open(path) as dump:
+        for line in dump:
+            if line.strip():
+                recipe = json.loads(line)
+                yield (recipe['title'], recipe.get('author', ''), recipe.get('description'),
+                       recipe.get('prep_time'), recipe.get('cook_time'))
+
+
+def import_dump(db_path, dump_path):
+    pantrybot.ensure_schema(db_path)
+    db = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    db.executemany(
+        'INSERT INTO recipes (title, author, description, prep_time, cook_time) VALUES (?, ?, ?, ?, ?)',
+        read_dump(dump_path))
+    db.commit()
+    elapsed = time.perf_counter() - start
+    count = db.execute('SELECT COUNT(*) FROM recipes').fetchone()[0]
+    return db, count, elapsed
+
+
+def like_search(db_cursor, search_term):
+    # The query search_recipes used before the FTS5 index
+    db_cursor.execute("""
+        SELECT * FROM recipes
+        WHERE title LIKE ? OR author LIKE ?
+        ORDER BY title ASC
+    """, ('%' + search_term + '%', '%' + search_term + '%'))
+    return db_cursor.fetchall()
+
+
+def time_queries(search, db_cursor, repeat, **kwargs):
+    timings = {}
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            rows = search(db_cursor, query, **kwargs)
+        timings[query] = ((time.perf_counter() - start) / repeat * 1000, len(rows))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dump', help='NDJSON recipe dump to import (default: synthetic)')
+    parser.add_argument('--count', type=int, default=10000, help='recipes in the synthetic dump')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per query')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        dump_path = args.dump
+        if not dump_path:
+            dump_path = os.path.join(workdir, 'recipes.ndjson')
+            write_synthetic_dump(dump_path, args.count)
+
+        db, count, import_seconds = import_dump(os.path.join(workdir, 'bench.db'), dump_path)
+        print(f"Imported {count} recipes in {import_seconds:.2f}s (FTS5: {pantrybot.recipe_fts_available})")
+
+        db_cursor = db.cursor()
+        like = time_queries(like_search, db_cursor, args.repeat)
+        fts = time_queries(pantrybot.search_recipe_rows, db_cursor, args.repeat)
+        limit = pantrybot.FridgeManagerApp.RECIPE_SEARCH_LIMIT
+        fts_top = time_queries(pantrybot.search_recipe_rows, db_cursor, args.repeat, limit=limit)
+
+        # FTS5 also searches descriptions, so it finds more rows than LIKE did
+        print(f"{'query':<16}{'LIKE ms':>10}{'rows':>8}{'FTS5 ms':>10}{'rows':>8}{f'top {limit} ms':>12}")
+        for query in QUERIES:
+            print(f"{query:<16}{like[query][0]:>10.2f}{like[query][1]:>8}"
+                  f"{fts[query][0]:>10.2f}{fts[query][1]:>8}{fts_top[query][0]:>12.2f}")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Time restock_job.py on a synthetic database.
+
+Each user gets a few items bought at a roughly regular interval with some
+jitter, written straight into grocery_events. The job then predicts every
+user's next restock dates and the run time is reported per stage.
+
+Run from the repository root:
+    python3 -m benchmarks.restock_job
+    python3 -m benchmarks.restock_job --users 100000 --items 8 --adds 12
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import api
+import restock_job
+
+NAMES = ['milk', 'eggs', 'bread', 'rice', 'pasta', 'apples', 'bananas', 'carrots', 'onions', 'cheese',
+         'yogurt', 'chicken', 'coffee', 'tea', 'butter', 'flour']
+
+
+def build(path, users, items, adds, today, seed=42):
+    rng = random.Random(seed)
+    db = api.connect_db(path)
+    api.init_data_schema(db)
+    category = db.execute("INSERT INTO labels (value) VALUES ('Other')").lastrowid
+    for user_id in range(1, users + 1):
+        rows = []
+        for name in rng.sample(NAMES, items):
+            interval = rng.uniform(3, 30)
+            day = today - timedelta(days=interval * adds + rng.uniform(-5, 5))
+            for _ in range(adds):
+                day += timedelta(days=max(0.6, rng.gauss(interval, interval / 5)))
+                rows.append((user_id, name, category, day.strftime('%Y-%m-%d %H:%M:%S')))
+        db.executemany('INSERT OR IGNORE INTO grocery_events (user_id, name, category_id, added_at) '
+                       'VALUES (?, ?, ?, ?)', rows)
+    db.commit()
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--items', type=int, default=8, help='items per user')
+    parser.add_argument('--adds', type=int, default=10, help='list adds per item')
+    args = parser.parse_args()
+
+    now = datetime(2026, 10, 19)
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        db = build(os.path.join(workdir, 'bench.db'), args.users, args.items, args.adds, now)
+        events = db.execute('SELECT COUNT(*) FROM grocery_events').fetchone()[0]
+        print(f"Built {args.users} users, {events} list adds in {time.perf_counter() - start:.1f}s")
+
+        today = now.date().toordinal() + restock_job.ORDINAL_JD
+        start = time.perf_counter()
+        users, predictions = restock_job.run_database(db, today)
+        elapsed = time.perf_counter() - start
+        print(f"Predicted {predictions} items for {users} users in {elapsed:.1f}s "
+              f"({users / elapsed:.0f} users/s)")
+
+        due = db.execute("SELECT COUNT(*) FROM restock_predictions WHERE next_date <= date(?, '+7 days')",
+                         (now.strftime('%Y-%m-%d'),)).fetchone()[0]
+        print(f"{due} predictions due within a week of {now:%Y-%m-%d}")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
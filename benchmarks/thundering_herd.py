@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-flight coalescing against a thundering herd.
+
+Serves the API from a threaded werkzeug server on a synthetic database and
+releases a herd of clients at once, all asking for the same user's grocery
+list and expiring pantry items, as a household's phones do after a restart.
+Each herd is run with coalescing off and on; the response cache is off in
+both so every request that isn't coalesced reaches SQLite.
+
+Run from the repository root:
+    python3 -m benchmarks.thundering_herd
+    python3 -m benchmarks.thundering_herd --clients 64 --items 5000 --herds 10
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.request
+
+from werkzeug.serving import make_server
+
+import api
+from config import RESPONSE_CACHE_CONFIG, SINGLEFLIGHT_CONFIG
+
+ROUTES = ['/grocery/items?user_id=1', '/pantry/expiring?user_id=1&days=30']
+
+
+def build(path, items, seed=42):
+    rng = random.Random(seed)
+    api.DB_PATH = path
+    db = api.get_db()
+    category, kind = api.label_id(db, 'Dairy'), api.label_id(db, 'Fridge')
+    db.executemany(
+        'INSERT INTO grocery_items (name, quantity, category_id, user_id, created_at) VALUES (?, ?, ?, 1, ?)',
+        [(f"item {i}", rng.randint(1, 5), category, f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}")
+         for i in range(items)])
+    db.executemany(
+        "INSERT INTO items (name, type_id, quantity, entry_date, expiry_date, user_id) "
+        "VALUES (?, ?, ?, '2026-10-01', date('now', ?), 1)",
+        [(f"item {i}", kind, rng.randint(1, 5), f"+{rng.randint(0, 60)} days") for i in range(items)])
+    db.commit()
+    db.close()
+
+
+def herd(base_url, clients, route):
+    """Latencies in ms of clients identical requests released together."""
+    barrier = threading.Barrier(clients)
+    latencies = [0.0] * clients
+
+    def client(index):
+        barrier.wait()
+        start = time.perf_counter()
+        with urllib.request.urlopen(base_url + route) as response:
+            response.read()
+        latencies[index] = (time.perf_counter() - start) * 1000
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32, help='requests per herd')
+    parser.add_argument('--items', type=int, default=2000, help='grocery and pantry rows of the user')
+    parser.add_argument('--herds', type=int, default=5, help='herds per route and setting')
+    args = parser.parse_args()
+
+    RESPONSE_CACHE_CONFIG['enabled'] = False
+    with tempfile.TemporaryDirectory() as workdir:
+        build(os.path.join(workdir, 'bench.db'), args.items)
+        server = make_server('127.0.0.1', 0, api.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            print(f"{'route':<38}{'coalescing':>11}{'runs':>7}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+            for route in ROUTES:
+                for enabled in (False, True):
+                    SINGLEFLIGHT_CONFIG['enabled'] = enabled
+                    before = api.request_flight.stats()['leaders']
+                    latencies = []
+                    for _ in range(args.herds):
+                        latencies += herd(base_url, args.clients, route)
+                    latencies.sort()
+                    runs = (api.request_flight.stats()['leaders'] - before if enabled
+                            else args.clients * args.herds)
+                    print(f"{route:<38}{'on' if enabled else 'off':>11}{runs:>7}"
+                          f"{latencies[len(latencies) // 2]:>9.1f}"
+                          f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>9.1f}"
+                          f"{latencies[-1]:>9.1f}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
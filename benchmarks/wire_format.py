@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compare response size and encode time of the wire formats for large lists.
+
+Builds pantry-shaped rows like /pantry/items returns and encodes them
+through the API's own JSON provider (jsonify) in each format and layout,
+as a request with that Accept header and ?layout= would get them. Reports
+bytes on the wire, gzipped bytes and the time jsonify takes.
+Formats whose library isn't installed are skipped (pip3 install msgpack cbor2).
+
+Run from the repository root:
+    python3 -m benchmarks.wire_format
+    python3 -m benchmarks.wire_format --rows 500 5000 50000 --repeat 20
+"""
+
+import argparse
+import gzip
+import random
+import time
+
+from flask import jsonify
+
+import api
+from wire_format import MIMETYPES, available_formats
+
+TYPES = ['Dairy', 'Vegetables', 'Fruits', 'Meat & Fish', 'Bakery', 'Pantry Staples', 'Frozen Foods']
+METRICS = [None, 'Kg', 'g', 'Litre', 'ml', 'Piece']
+NAMES = ['milk', 'eggs', 'bread', 'rice', 'pasta', 'apples', 'bananas', 'carrots', 'onions', 'cheese']
+
+
+def pantry_rows(count, seed=42):
+    rng = random.Random(seed)
+    return [{
+        'id': i + 1,
+        'name': f"{rng.choice(NAMES)} {i}",
+        'type': rng.choice(TYPES),
+        'quantity': rng.randint(1, 12),
+        'entry_date': f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}",
+        'expiry_date': f"2026-{rng.randint(10, 12):02d}-{rng.randint(1, 28):02d}",
+        'metric': rng.choice(METRICS),
+        'amount_per_item': str(rng.randint(1, 5)) if rng.random() < 0.5 else None,
+    } for i in range(count)]
+
+
+def encode(rows, fmt, layout, repeat):
+    """(body bytes, ms per jsonify) for rows in fmt and layout."""
+    query = '?layout=columns' if layout == 'columns' else ''
+    with api.app.test_request_context(f'/pantry/items{query}', headers={'Accept': MIMETYPES[fmt]}):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = jsonify(rows).get_data()
+        return body, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=10, help='encodes per measurement')
+    args = parser.parse_args()
+
+    print(f"{'rows':>7}  {'format':<18}{'bytes':>11}{'gzip':>10}{'vs json':>9}{'encode ms':>11}")
+    for count in args.rows:
+        rows = pantry_rows(count)
+        baseline = None
+        for fmt in available_formats():
+            for layout in ('rows', 'columns'):
+                body, ms = encode(rows, fmt, layout, args.repeat)
+                baseline = baseline or len(body)
+                print(f"{count:>7}  {fmt + ' ' + layout:<18}{len(body):>11}{len(gzip.compress(body)):>10}"
+                      f"{len(body) / baseline:>8.0%}{ms:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
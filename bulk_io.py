@@ -0,0 +1,242 @@
+"""
+Streaming bulk import and export of pantry, grocery and history rows.
+
+Everything here is a generator: an import reads the upload one line at a
+time, validates each row and hands batches to executemany, and an export
+turns cursor rows into CSV or NDJSON lines as they are fetched. Memory use
+stays the same whatever the size of the file.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from labels import DEFAULT_GROCERY_CATEGORY, LABEL_COLUMNS, label_id
+from units import to_base
+
+# Per table: its SQL name, then column -> (required, kind, default)
+BULK_TABLES = {
+    'pantry': ('items', {
+        'name': (True, 'text', None),
+        'type': (True, 'text', None),
+        'quantity': (True, 'int', None),
+        'expiry_date': (True, 'date', None),
+        'entry_date': (False, 'date', 'today'),
+        'metric': (False, 'text', None),
+        'amount_per_item': (False, 'text', None),
+    }),
+    'grocery': ('grocery_items', {
+        'name': (True, 'text', None),
+        'quantity': (False, 'int', 1),
+        'category': (False, 'text', DEFAULT_GROCERY_CATEGORY),
+        'checked': (False, 'bool', 0),
+        'priority': (False, 'int', 0),
+        'metric': (False, 'text', None),
+        'amount_per_item': (False, 'text', None),
+    }),
+    'history': ('item_history', {
+        'name': (True, 'text', None),
+        'category': (True, 'text', None),
+        'frequency': (False, 'int', 1),
+        'last_used': (False, 'timestamp', 'now'),
+        'metric': (False, 'text', None),
+        'amount_per_item': (False, 'text', None),
+    }),
+}
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+class RowError(ValueError):
+    pass
+
+
+# Parsing: (line number, dict) or (line number, RowError)
+
+def parse_csv(stream):
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, RowError(f'Bad CSV: {e}')
+            continue
+        if None in row:
+            yield reader.line_num, RowError('More fields than the header has')
+            continue
+        yield reader.line_num, row
+
+
+def parse_ndjson(stream):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, RowError(f'Bad JSON: {e}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError('Each line must be a JSON object')
+            continue
+        yield line_number, row
+
+
+PARSERS = {'csv': parse_csv, 'ndjson': parse_ndjson}
+
+
+# Validation
+
+def convert(kind, value, column):
+    if kind == 'text':
+        return str(value).strip()
+    if kind in ('int', 'bool'):
+        try:
+            number = int(str(value).strip())
+        except ValueError:
+            if kind == 'bool' and str(value).strip().lower() in ('true', 'false', 'yes', 'no'):
+                return int(str(value).strip().lower() in ('true', 'yes'))
+            raise RowError(f'{column} must be a whole number')
+        if number < 0:
+            raise RowError(f'{column} must not be negative')
+        return int(bool(number)) if kind == 'bool' else number
+    if kind == 'date':
+        try:
+            return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise RowError(f'{column} must be a YYYY-MM-DD date')
+    if kind == 'timestamp':
+        text = str(value).strip().replace('T', ' ')
+        try:
+            datetime.strptime(text[:19], '%Y-%m-%d %H:%M:%S' if len(text) > 10 else '%Y-%m-%d')
+        except ValueError:
+            raise RowError(f'{column} must be a date or timestamp')
+        return text
+    raise ValueError(kind)
+
+
+def default_value(default):
+    if default == 'today':
+        return datetime.now().strftime('%Y-%m-%d')
+    if default == 'now':
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return default
+
+
+def validate_rows(table, parsed, user_id):
+    """(line, values tuple) for good rows, (line, RowError) for bad ones.
+    Values are in column order, followed by user_id."""
+    columns = BULK_TABLES[table][1]
+    for line_number, row in parsed:
+        if isinstance(row, RowError):
+            yield line_number, row
+            continue
+        try:
+            values = []
+            for column, (required, kind, default) in columns.items():
+                value = row.get(column)
+                if value is None or (isinstance(value, str) and not value.strip()):
+                    if required:
+                        raise RowError(f'{column} is required')
+                    values.append(default_value(default))
+                else:
+                    values.append(convert(kind, value, column))
+            values.append(user_id)
+            yield line_number, tuple(values)
+        except RowError as e:
+            yield line_number, e
+
+
+def stored_columns(table):
+    """Column names as stored: label columns hold label ids."""
+    sql_table, columns = BULK_TABLES[table]
+    return [f'{column}_id' if column in LABEL_COLUMNS[sql_table] else column for column in columns]
+
+
+def insert_sql(table):
+    names = stored_columns(table) + ['user_id', 'base_amount', 'base_unit']
+    sql = f"INSERT INTO {BULK_TABLES[table][0]} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+    if table == 'history':
+        # Same item again: add up the uses instead of failing on the unique key
+        sql += (' ON CONFLICT(name, category_id, user_id) DO UPDATE SET'
+                ' frequency = frequency + excluded.frequency,'
+                ' last_used = MAX(last_used, excluded.last_used),'
+                + ','.join(
+                    # metric and amount are kept or replaced together, so the
+                    # base amount computed from the new row stays right
+                    f' {column} = CASE WHEN excluded.metric_id IS NULL AND excluded.amount_per_item IS NULL'
+                    f' THEN {column} ELSE excluded.{column} END'
+                    for column in ('metric_id', 'amount_per_item', 'base_amount', 'base_unit')))
+    return sql
+
+
+def import_rows(conn, table, fmt, stream, user_id, batch_size=500, max_errors=100):
+    """Import a text stream. Each batch is its own transaction, so a failure
+    half way keeps the batches before it. Returns a summary dict."""
+    sql = insert_sql(table)
+    sql_table, columns = BULK_TABLES[table]
+    label_positions = [i for i, column in enumerate(columns) if column in LABEL_COLUMNS[sql_table]]
+    metric_position = list(columns).index('metric')
+    amount_position = list(columns).index('amount_per_item')
+    label_ids = {}
+    imported = 0
+    error_count = 0
+    errors = []
+    batch = []
+
+    def flush():
+        conn.executemany(sql, batch)
+        conn.commit()
+        batch.clear()
+
+    for line_number, result in validate_rows(table, PARSERS[fmt](stream), user_id):
+        if isinstance(result, RowError):
+            error_count += 1
+            if len(errors) < max_errors:
+                errors.append({'line': line_number, 'error': str(result)})
+            continue
+        # Base units come from the text, before metric becomes a label id
+        result = list(result) + list(to_base(result[metric_position], result[amount_position]))
+        for i in label_positions:
+            if result[i] is not None and result[i] not in label_ids:
+                label_ids[result[i]] = label_id(conn, result[i])
+            result[i] = label_ids.get(result[i])
+        batch.append(result)
+        if len(batch) >= batch_size:
+            imported += len(batch)
+            flush()
+    if batch:
+        imported += len(batch)
+        flush()
+    return {'imported': imported, 'error_count': error_count, 'errors': errors}
+
+
+# Export
+
+def export_columns(table):
+    return ['id'] + list(BULK_TABLES[table][1])
+
+
+def export_lines(cursor, columns, fmt, fetch_size=500):
+    """CSV or NDJSON text, a chunk per fetchmany() of the cursor."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        if fmt == 'csv':
+            writer.writerows(tuple(row) for row in rows)
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            chunk = ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+        yield chunk
+    if fmt == 'csv' and buffer.getvalue():
+        yield buffer.getvalue()
@@ -14,5 +14,149 @@ SERVER_CONFIG = {
 # Security configuration
 SECURITY_CONFIG = {
     'password_salt_rounds': 100000,
-    'token_expiry_days': 30
-} 
\ No newline at end of file
+    'token_expiry_days': 30,
+    # /auth/login admission, per client IP and per username
+    'login_ip_per_minute': 30,
+    'login_ip_burst': 10,
+    'login_user_per_minute': 6,
+    'login_user_burst': 5,
+    # PBKDF2 worker processes and how many logins may wait for one
+    'hash_workers': 2,
+    'hash_queue_size': 8
+}
+
+# Kiosk <-> server replication (pantrybot.py). Off until user_id is set to
+# the server account this kiosk belongs to.
+SYNC_CONFIG = {
+    'server_url': 'http://localhost:5000',
+    'user_id': None,
+    'interval_seconds': 30,
+    'max_backoff_seconds': 600,
+    'batch_size': 100,
+    'timeout_seconds': 10,
+    'verify_tls': True
+}
+
+# One SQLite file per household (api.py). When disabled every user's data
+# stays in the catalog database DB_CONFIG['path'].
+SHARD_CONFIG = {
+    'enabled': False,
+    'shard_dir': 'shards',
+    'fan_out_workers': 4
+}
+
+# Server-side expiry notifications (api.py). Thresholds are days before the
+# expiry date; -1 means the day after it expired.
+NOTIFY_CONFIG = {
+    'thresholds_days': [3, 1, 0, -1],
+    'notify_hour': 9,
+    'max_wait_seconds': 55,
+    'keep_days': 30
+}
+
+# Request trace recording for load testing (api.py, see replay_trace.py)
+TRACE_CONFIG = {
+    'enabled': False,
+    'path': 'traces/api.trace',
+    'max_body_bytes': 65536
+}
+
+# Per-request profiling (api.py, request_profiler.py). Set a token to let
+# admins profile a request with the X-Profile and X-Profile-Token headers, or
+# start the API with PANTRYBOT_PROFILE=cprofile|sample to profile every
+# request under 'routes'. 'continuous' runs a low-rate sampler whose hot
+# stacks /admin/profile returns.
+PROFILE_CONFIG = {
+    'token': None,
+    'routes': [],
+    'dir': 'profiles',
+    'keep': 200,
+    'sample_interval_ms': 1,
+    'continuous': False,
+    'continuous_hz': 5,
+    'max_stacks': 5000
+}
+
+# Nightly restock predictions (restock_job.py, /grocery/predicted). Adds of
+# the same item closer together than min_gap_days count as one trip; older
+# intervals weigh recency_weight times less per step back.
+RESTOCK_CONFIG = {
+    'min_intervals': 2,
+    'min_gap_days': 0.5,
+    'max_interval_days': 180,
+    'recency_weight': 0.7,
+    'stale_intervals': 3,
+    'users_per_chunk': 5000,
+    'horizon_days': 7
+}
+
+# Cache of serialized GET responses per user (api.py, response_cache.py).
+# Write handlers invalidate a user's entries; least recently used entries go
+# first once the bodies pass max_bytes.
+RESPONSE_CACHE_CONFIG = {
+    'enabled': True,
+    'max_bytes': 32 * 1024 * 1024,
+    'max_entry_bytes': 1024 * 1024,
+    # Touched by retention.py after it deletes rows; the API then drops all entries
+    'epoch_path': 'cache.epoch'
+}
+
+# Identical GETs of one user that arrive together share one run of the route
+# (api.py, singleflight.py). A finished result is also reused by identical
+# requests arriving within window_ms; waiters give up after max_wait_seconds.
+SINGLEFLIGHT_CONFIG = {
+    'enabled': True,
+    'window_ms': 20,
+    'max_wait_seconds': 10
+}
+
+# POST /grocery/checkout (api.py): days from putting an item away to its
+# expiry date, per pantry type (the grocery category it was bought under)
+CHECKOUT_CONFIG = {
+    'shelf_life_days': {
+        'Vegetables': 7,
+        'Fruits': 7,
+        'Dairy': 10,
+        'Meats': 3,
+        'Meat': 3,  # the kiosk's spelling
+        'Grains': 365,
+        'Sweets': 90,
+        'Oils': 365,
+        'Drinks': 180,
+        'Medicine': 730,
+        'Cleaning': 730,
+        'Electronics': 3650,
+        'Other': 30
+    },
+    'default_shelf_life_days': 30
+}
+
+# Nightly retention (retention.py). Old checked grocery items and old events
+# move to <database>.archive.db; item_history names are dropped once their use
+# count, halved every history_half_life_days, is below history_min_score.
+RETENTION_CONFIG = {
+    'archive_suffix': '.archive.db',
+    'checked_grocery_days': 30,
+    'grocery_event_days': 730,
+    'pantry_event_days': 400,
+    'history_half_life_days': 90,
+    'history_min_score': 0.25,
+    'batch_rows': 5000,
+    'vacuum_pages_per_step': 256,
+    'vacuum_pause_seconds': 0.05
+}
+
+# Offline barcode lookup (barcode_catalog.py, /barcode/<code>, kiosk item
+# form). Build the index with: python3 barcode_catalog.py build <dump>
+BARCODE_CONFIG = {
+    'catalog_path': 'barcodes.idx'
+}
+
+# Name search (/search and the kiosk's item and grocery search). Hits must
+# share min_similarity of the query's trigrams; see fuzzy_search.py
+SEARCH_CONFIG = {
+    'min_similarity': 0.5,
+    'candidates': 200,
+    'default_limit': 20,
+    'max_limit': 100
+}
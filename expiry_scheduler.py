@@ -0,0 +1,183 @@
+"""
+Server-side expiry notifications for the API.
+
+Each pantry item has a few thresholds (days before expiry, e.g. 3, 1, 0 and
+-1 for "expired yesterday"). ExpiryScheduler keeps a min-heap of upcoming
+thresholds per user, plus a heap of each user's next due time, and sleeps
+until the earliest one. When a threshold comes due it hands an event to the
+deliver callback (the push outbox in api.py). A pantry write only rebuilds
+the heap of the user it belongs to.
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime, time as clock_time, timedelta
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+class ExpiryScheduler:
+    """load_user(user_id) -> [(item_id, name, type, expiry_date)] and
+    load_all() -> {user_id: [...]} read pantry items; deliver(user_id, events)
+    stores fired events. Both are called from the scheduler thread."""
+
+    MAX_SLEEP_SECONDS = 3600  # re-check the clock at least hourly
+    RETRY_SECONDS = 30  # after a failed load, e.g. the database was locked
+
+    def __init__(self, load_user, load_all, deliver, thresholds=(3, 1, 0, -1), notify_hour=9):
+        self.load_user = load_user
+        self.load_all = load_all
+        self.deliver = deliver
+        self.thresholds = sorted(set(thresholds), reverse=True)
+        self.notify_hour = notify_hour
+        self.user_heaps = {}       # user_id -> heap of (when, item_id, threshold, expiry, name, type)
+        self.user_versions = {}    # user_id -> bumped on every rebuild
+        self.due = []              # heap of (when, user_id, version), stale entries skipped
+        self.dirty_users = set()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        """Start the scheduler thread once; later calls do nothing."""
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='expiry-scheduler', daemon=True)
+            self.thread.start()
+
+    def user_changed(self, user_id):
+        """Note a pantry write; the user's thresholds are rebuilt on the scheduler thread."""
+        if self.thread is None or user_id is None:
+            return
+        with self.condition:
+            self.dirty_users.add(int(user_id))
+            self.condition.notify()
+
+    def remove_user(self, user_id):
+        """Drop a deleted user's thresholds without reading their items again."""
+        with self.condition:
+            self.dirty_users.discard(int(user_id))
+            self.user_heaps.pop(int(user_id), None)
+            self.user_versions[int(user_id)] = self.user_versions.get(int(user_id), 0) + 1
+
+    # Scheduling
+
+    def thresholds_for(self, item_id, name, item_type, expiry_date, now):
+        """(when, item_id, threshold, expiry, name, type) entries for one item.
+
+        Thresholds fire at notify_hour on their day. Of the ones already
+        reached only the latest counts, and it fires now if its hour has passed
+        (e.g. an item added two days before expiry gets the 3-day notice at once).
+        """
+        expiry = _parse_date(expiry_date)
+        if expiry is None:
+            return []
+        days_left = (expiry - now.date()).days
+        if days_left < self.thresholds[-1]:
+            return []
+        entries = []
+        reached = [threshold for threshold in self.thresholds if threshold >= days_left]
+        for threshold in self.thresholds:
+            if threshold < days_left or threshold == min(reached, default=None):
+                day = expiry - timedelta(days=threshold)
+                when = max(now, datetime.combine(day, clock_time(self.notify_hour)))
+                entries.append((when, item_id, threshold, expiry_date, name, item_type))
+        return entries
+
+    def rebuild_user(self, user_id, items, now):
+        heap = []
+        for item in items:
+            heap.extend(self.thresholds_for(*item, now))
+        heapq.heapify(heap)
+        version = self.user_versions.get(user_id, 0) + 1
+        self.user_versions[user_id] = version
+        if heap:
+            self.user_heaps[user_id] = heap
+            heapq.heappush(self.due, (heap[0][0], user_id, version))
+        else:
+            self.user_heaps.pop(user_id, None)
+
+    def pop_due(self, now):
+        """Fired events per user, removed from the heaps."""
+        fired = {}
+        while self.due and self.due[0][0] <= now:
+            _, user_id, version = heapq.heappop(self.due)
+            if self.user_versions.get(user_id) != version:
+                continue  # superseded by a rebuild
+            heap = self.user_heaps.get(user_id, [])
+            while heap and heap[0][0] <= now:
+                when, item_id, threshold, expiry_date, name, item_type = heapq.heappop(heap)
+                expiry = _parse_date(expiry_date)
+                fired.setdefault(user_id, []).append({
+                    'item_id': item_id,
+                    'name': name,
+                    'type': item_type,
+                    'expiry_date': expiry_date,
+                    'threshold': threshold,
+                    'days_until_expiry': (expiry - now.date()).days,
+                })
+            if heap:
+                heapq.heappush(self.due, (heap[0][0], user_id, version))
+            else:
+                self.user_heaps.pop(user_id, None)
+        return fired
+
+    def load_all_retrying(self):
+        while True:
+            try:
+                return self.load_all()
+            except Exception as e:
+                print(f"Loading pantry expiries failed ({e}), retrying in {self.RETRY_SECONDS}s")
+                time.sleep(self.RETRY_SECONDS)
+
+    def run(self):
+        loaded = self.load_all_retrying()
+        now = datetime.now()
+        with self.condition:
+            for user_id, items in loaded.items():
+                self.rebuild_user(user_id, items, now)
+
+        retry_users, retry_at = set(), 0
+        while True:
+            with self.condition:
+                timeout = self.MAX_SLEEP_SECONDS
+                if self.due:
+                    timeout = min(timeout, max(0, (self.due[0][0] - datetime.now()).total_seconds()))
+                if retry_users:
+                    timeout = min(timeout, max(0, retry_at - time.monotonic()))
+                if not self.dirty_users and timeout > 0:
+                    self.condition.wait(timeout)
+                dirty, self.dirty_users = self.dirty_users, set()
+            if retry_users and time.monotonic() >= retry_at:
+                dirty |= retry_users
+                retry_users = set()
+
+            # A user whose items can't be read keeps their old thresholds and is
+            # tried again later; one failure must not stop the thread
+            now = datetime.now()
+            loaded = {}
+            for user_id in dirty:
+                try:
+                    loaded[user_id] = self.load_user(user_id)
+                except Exception as e:
+                    print(f"Loading expiries of user {user_id} failed ({e}), retrying in {self.RETRY_SECONDS}s")
+                    if not retry_users:
+                        retry_at = time.monotonic() + self.RETRY_SECONDS
+                    retry_users.add(user_id)
+            with self.condition:
+                for user_id, items in loaded.items():
+                    self.rebuild_user(user_id, items, now)
+
+            with self.condition:
+                fired = self.pop_due(now)
+            for user_id, events in fired.items():
+                try:
+                    self.deliver(user_id, events)
+                except Exception as e:
+                    print(f"Expiry notification delivery failed for user {user_id}: {e}")
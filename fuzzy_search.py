@@ -0,0 +1,42 @@
+"""
+Typo-tolerant name search on SQLite FTS5 trigram indexes.
+
+A trigram index finds any text that contains a three-letter piece of the
+query. Asking it for names sharing *any* trigram with the query
+('tomatoe' -> "tom" OR "oma" OR "mat" OR "ato" OR "toe") brings back
+misspellings and partial words as well as exact hits. Candidates are then
+scored by the share of the query's trigrams they contain, so 'tomato'
+scores 0.8 for 'tomatoe' while an unrelated 'toenail' (one trigram) falls
+under the cut-off. Queries shorter than three letters have no trigram and
+are matched as plain substrings.
+"""
+
+from config import SEARCH_CONFIG
+
+
+def normalize(text):
+    return ' '.join(str(text or '').lower().split())
+
+
+def trigrams(text):
+    """Distinct three-character pieces of the normalized text, in order."""
+    text = normalize(text)
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def match_query(text):
+    """FTS5 expression matching any trigram of text; '' if it has none."""
+    return ' OR '.join('"{}"'.format(gram.replace('"', '""')) for gram in trigrams(text))
+
+
+def similarity(query, text):
+    """Share of the query's trigrams found in text, 0.0 to 1.0."""
+    grams = trigrams(query)
+    text = normalize(text)
+    if not grams:
+        return 1.0 if normalize(query) in text else 0.0
+    return sum(1 for gram in grams if gram in text) / len(grams)
+
+
+def is_match(query, text, config=SEARCH_CONFIG):
+    return similarity(query, text) >= config['min_similarity']
@@ -0,0 +1,299 @@
+"""
+Offline-first replication between the kiosk database and the API server.
+
+The kiosk UI only ever writes to its local SQLite file. Triggers record every
+write to items and grocery_items in sync_outbox, and a background SyncWorker
+pushes the outbox to /sync/push in batches, then pulls server-side changes
+from /sync/pull by revision. Conflicts are settled on the server using
+SYNC_FIELD_RULES in api.py. When the network is down the outbox simply grows
+and the worker backs off; nothing in the UI waits for it.
+"""
+
+import json
+import ssl
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+import uuid
+
+# Local columns that are replicated, per table
+SYNCED_TABLES = {
+    'items': ('name', 'type', 'quantity', 'entry_date', 'expiry_date'),
+    'grocery_items': ('name', 'quantity', 'category', 'checked', 'created_at'),
+}
+
+SYNC_TIMESTAMP_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+# Outbox triggers stay quiet while the worker applies pulled changes
+NOT_APPLYING_SQL = "(SELECT value FROM sync_state WHERE key = 'applying') IS NOT '1'"
+
+
+def ensure_sync_schema(db):
+    """Add sync columns, the outbox and its triggers to the kiosk database."""
+    for table in SYNCED_TABLES:
+        for column in ('remote_id INTEGER', 'updated_at TEXT'):
+            try:
+                db.execute(f'ALTER TABLE {table} ADD COLUMN {column} DEFAULT NULL')
+            except sqlite3.OperationalError:
+                pass
+        db.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_remote_id ON {table} (remote_id)')
+
+    db.executescript('''
+    CREATE TABLE IF NOT EXISTS sync_outbox (
+        op_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        local_id INTEGER NOT NULL,
+        remote_id INTEGER,
+        op TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sync_outbox_row ON sync_outbox (table_name, local_id);
+
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    INSERT OR IGNORE INTO sync_state (key, value) VALUES ('applying', '0');
+    INSERT OR IGNORE INTO sync_state (key, value) VALUES ('last_rev', '0');
+    ''')
+
+    for table in SYNCED_TABLES:
+        db.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_outbox_insert AFTER INSERT ON {table}
+        WHEN {NOT_APPLYING_SQL} BEGIN
+            UPDATE {table} SET updated_at = {SYNC_TIMESTAMP_SQL} WHERE id = new.id;
+            INSERT INTO sync_outbox (table_name, local_id, op) VALUES ('{table}', new.id, 'upsert');
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_outbox_update AFTER UPDATE ON {table}
+        WHEN {NOT_APPLYING_SQL} AND new.updated_at IS old.updated_at BEGIN
+            UPDATE {table} SET updated_at = {SYNC_TIMESTAMP_SQL} WHERE id = new.id;
+            INSERT INTO sync_outbox (table_name, local_id, op) VALUES ('{table}', new.id, 'upsert');
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_outbox_delete AFTER DELETE ON {table}
+        WHEN {NOT_APPLYING_SQL} BEGIN
+            INSERT INTO sync_outbox (table_name, local_id, remote_id, op)
+            VALUES ('{table}', old.id, old.remote_id, 'delete');
+        END;
+        ''')
+    db.commit()
+
+
+def _get_state(db, key, default=None):
+    row = db.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_state(db, key, value):
+    db.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, str(value)))
+
+
+class SyncWorker(threading.Thread):
+    """Background push/pull loop. All state lives in the database, so a crash
+    or a reboot in the middle of a sync just means the next cycle resends."""
+
+    def __init__(self, db_path, server_url, user_id, interval=30, max_backoff=600,
+                 batch_size=100, timeout=10, verify_tls=True, ready=None):
+        super().__init__(name='kiosk-sync', daemon=True)
+        self.db_path = db_path
+        self.server_url = server_url.rstrip('/')
+        self.user_id = user_id
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.ssl_context = None if verify_tls else ssl._create_unverified_context()
+        self.ready = ready
+        self.wake = threading.Event()
+        self.remote_changes = threading.Event()  # set when a pull changed local rows
+        self.failures = 0
+        self.stopping = False
+
+    def request_sync(self):
+        """Ask for a sync soon, e.g. right after a local write."""
+        self.wake.set()
+
+    def stop(self):
+        self.stopping = True
+        self.wake.set()
+
+    def run(self):
+        if self.ready is not None:
+            self.ready.wait()
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        client_id = _get_state(db, 'client_id')
+        if not client_id:
+            client_id = uuid.uuid4().hex
+            _set_state(db, 'client_id', client_id)
+        self.client_id = client_id
+
+        while not self.stopping:
+            try:
+                self.push(db)
+                if self.pull(db):
+                    self.remote_changes.set()
+                self.failures = 0
+                delay = self.interval
+            except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+                # Network loss or a bad response: keep the outbox and retry later
+                self.failures += 1
+                delay = min(self.interval * 2 ** self.failures, self.max_backoff)
+                print(f"Sync failed ({e}), retrying in {delay}s")
+            self.wake.wait(delay)
+            self.wake.clear()
+        db.close()
+
+    def call(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.server_url + path, data=body, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout, context=self.ssl_context) as response:
+            return json.loads(response.read())
+
+    # Push
+
+    def collect_changes(self, db, entries):
+        """Collapse outbox entries into one change per row, using its current state."""
+        latest = {}
+        for op_id, table, local_id, remote_id, op in entries:
+            previous = latest.get((table, local_id))
+            latest[(table, local_id)] = (op_id, remote_id or (previous[1] if previous else None))
+
+        changes = []
+        for (table, local_id), (op_id, logged_remote_id) in latest.items():
+            columns = SYNCED_TABLES[table]
+            row = db.execute(
+                f'SELECT remote_id, updated_at, {", ".join(columns)} FROM {table} WHERE id = ?', (local_id,)
+            ).fetchone()
+            if row is None:
+                if logged_remote_id:
+                    changes.append({'op_id': op_id, 'table': table, 'local_id': local_id,
+                                    'op': 'delete', 'id': logged_remote_id})
+                else:
+                    # Never reached the server: the delete still has to reach any
+                    # insert whose response was lost, so send it by local id
+                    changes.append({'op_id': op_id, 'table': table, 'local_id': local_id,
+                                    'op': 'delete', 'id': None})
+                continue
+            changes.append({
+                'op_id': op_id,
+                'table': table,
+                'local_id': local_id,
+                'op': 'update' if row[0] else 'insert',
+                'id': row[0],
+                'updated_at': row[1],
+                'fields': dict(zip(columns, row[2:])),
+            })
+        return changes
+
+    def push(self, db):
+        while not self.stopping:
+            entries = db.execute(
+                'SELECT op_id, table_name, local_id, remote_id, op FROM sync_outbox ORDER BY op_id LIMIT ?',
+                (self.batch_size,)
+            ).fetchall()
+            if not entries:
+                return
+            changes = self.collect_changes(db, entries)
+            response = self.call('POST', '/sync/push', {
+                'user_id': self.user_id,
+                'client_id': self.client_id,
+                'changes': changes,
+            })
+
+            by_op = {change['op_id']: change for change in changes}
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                _set_state(db, 'applying', 1)
+                for result in response['results']:
+                    change = by_op.get(result['op_id'])
+                    if change is None:
+                        continue
+                    if result['status'] == 'deleted' and change['op'] != 'delete':
+                        # Deleted on the server meanwhile: the delete wins here too
+                        db.execute(f'DELETE FROM {change["table"]} WHERE id = ?', (change['local_id'],))
+                    elif change['op'] == 'insert' and result['id']:
+                        db.execute(f'UPDATE {change["table"]} SET remote_id = ? WHERE id = ?',
+                                   (result['id'], change['local_id']))
+                db.execute('DELETE FROM sync_outbox WHERE op_id <= ?', (entries[-1][0],))
+                _set_state(db, 'applying', 0)
+                db.execute('COMMIT')
+            except sqlite3.Error:
+                db.execute('ROLLBACK')
+                raise
+
+    # Pull
+
+    def pull(self, db):
+        """Apply server changes since the last pulled revision. Returns True if
+        any local row changed."""
+        changed = False
+        while not self.stopping:
+            since = int(_get_state(db, 'last_rev', 0))
+            response = self.call(
+                'GET', f'/sync/pull?user_id={self.user_id}&since={since}&limit={self.batch_size}')
+
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                _set_state(db, 'applying', 1)
+                for change in response['changes']:
+                    changed |= self.apply_remote_change(db, change)
+                _set_state(db, 'last_rev', response['next'])
+                _set_state(db, 'applying', 0)
+                db.execute('COMMIT')
+            except sqlite3.Error:
+                db.execute('ROLLBACK')
+                raise
+
+            if not response['more']:
+                return changed
+        return changed
+
+    def apply_remote_change(self, db, change):
+        table = change['table']
+        if table not in SYNCED_TABLES:
+            return False
+        local = db.execute(f'SELECT id FROM {table} WHERE remote_id = ?', (change['id'],)).fetchone()
+
+        # Local edits that haven't been pushed yet are settled by the next push
+        if local and db.execute('SELECT 1 FROM sync_outbox WHERE table_name = ? AND local_id = ? LIMIT 1',
+                                (table, local[0])).fetchone():
+            return False
+
+        if change['op'] == 'delete':
+            if local:
+                db.execute(f'DELETE FROM {table} WHERE id = ?', (local[0],))
+                return True
+            return False
+
+        row = change['row']
+        columns = SYNCED_TABLES[table]
+        values = [row.get(column) for column in columns] + [row.get('updated_at')]
+        if local:
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            db.execute(f'UPDATE {table} SET {assignments}, updated_at = ? WHERE id = ?', (*values, local[0]))
+        else:
+            db.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}, updated_at, remote_id) '
+                f'VALUES ({", ".join("?" * len(columns))}, ?, ?)',
+                (*values, change['id'])
+            )
+        return True
+
+
+def start_sync_worker(db_path, sync_config, ready=None):
+    """Start replication if the kiosk is linked to a server account, else return None."""
+    if not sync_config.get('user_id') or not sync_config.get('server_url'):
+        return None
+    worker = SyncWorker(
+        db_path,
+        sync_config['server_url'],
+        sync_config['user_id'],
+        interval=sync_config.get('interval_seconds', 30),
+        max_backoff=sync_config.get('max_backoff_seconds', 600),
+        batch_size=sync_config.get('batch_size', 100),
+        timeout=sync_config.get('timeout_seconds', 10),
+        verify_tls=sync_config.get('verify_tls', True),
+        ready=ready,
+    )
+    worker.start()
+    return worker
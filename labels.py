@@ -0,0 +1,172 @@
+"""
+Dictionary encoding for the low-cardinality text columns of the API database.
+
+category, type and metric take a handful of values ('Vegetables', 'Dairy',
+'Kg' ...) but used to be stored as text in every row and in every index
+that contains them. They now live once in the labels table and rows keep an
+integer label id (category_id, type_id, metric_id). Reads go through the
+<table>_view views, which decode the ids back to the old column names, so
+the JSON the API returns is unchanged.
+"""
+
+import sqlite3
+
+# Category of a grocery item added without one (the old column default)
+DEFAULT_GROCERY_CATEGORY = 'Vegetables'
+
+# Encoded columns per table; the stored column is <name>_id
+LABEL_COLUMNS = {
+    'grocery_items': ('category', 'metric'),
+    'items': ('type', 'metric'),
+    'item_history': ('category', 'metric'),
+}
+
+# Column order of each table as the API has always returned it
+TABLE_COLUMNS = {
+    'grocery_items': ('id', 'name', 'quantity', 'category', 'checked', 'created_at', 'user_id',
+                      'priority', 'metric', 'amount_per_item', 'updated_at'),
+    'items': ('id', 'name', 'type', 'quantity', 'entry_date', 'expiry_date', 'user_id',
+              'metric', 'amount_per_item', 'updated_at'),
+    'item_history': ('id', 'name', 'category', 'last_used', 'frequency', 'user_id',
+                     'metric', 'amount_per_item'),
+}
+
+CREATE_TABLES = {
+    'grocery_items': '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        quantity INTEGER DEFAULT 1,
+        category_id INTEGER REFERENCES labels (id),
+        checked INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id INTEGER,
+        priority INTEGER DEFAULT 0,
+        metric_id INTEGER REFERENCES labels (id),
+        amount_per_item TEXT DEFAULT NULL,
+        updated_at TEXT DEFAULT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''',
+    'items': '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        type_id INTEGER NOT NULL REFERENCES labels (id),
+        quantity INTEGER NOT NULL,
+        entry_date TEXT NOT NULL,
+        expiry_date TEXT NOT NULL,
+        user_id INTEGER,
+        metric_id INTEGER REFERENCES labels (id),
+        amount_per_item TEXT DEFAULT NULL,
+        updated_at TEXT DEFAULT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''',
+    'item_history': '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category_id INTEGER NOT NULL REFERENCES labels (id),
+        last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        frequency INTEGER DEFAULT 0,
+        user_id INTEGER,
+        metric_id INTEGER REFERENCES labels (id),
+        amount_per_item TEXT DEFAULT NULL,
+        UNIQUE(name, category_id, user_id)
+    )''',
+}
+
+
+def view(table):
+    return f'{table}_view'
+
+
+def decode_sql(column):
+    return f'(SELECT value FROM labels WHERE id = {column}_id)'
+
+
+def label_id(conn, value):
+    """Id of a label value, adding it on first use. None stays None."""
+    if value is None:
+        return None
+    value = str(value)
+    row = conn.execute('SELECT id FROM labels WHERE value = ?', (value,)).fetchone()
+    if row:
+        return row[0]
+    return conn.execute('INSERT INTO labels (value) VALUES (?)', (value,)).lastrowid
+
+
+def encode_fields(conn, table, fields):
+    """{'category': 'Dairy', 'name': ...} -> {'category_id': 3, 'name': ...}"""
+    encoded = {}
+    for column, value in fields.items():
+        if column in LABEL_COLUMNS[table]:
+            encoded[f'{column}_id'] = label_id(conn, value)
+        else:
+            encoded[column] = value
+    return encoded
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _rebuild_legacy_table(conn, table):
+    """Rewrite a table that still stores label text into the encoded layout."""
+    old_columns = _columns(conn, table)
+    labelled = [column for column in LABEL_COLUMNS[table] if column in old_columns]
+    for column in labelled:
+        conn.execute(f'INSERT OR IGNORE INTO labels (value) SELECT DISTINCT {column} FROM {table} '
+                     f'WHERE {column} IS NOT NULL')
+
+    conn.execute(CREATE_TABLES[table].format(name=f'{table}_encoded'))
+    targets, sources = [], []
+    for column in TABLE_COLUMNS[table]:
+        if column in labelled:
+            targets.append(f'{column}_id')
+            sources.append(f'(SELECT id FROM labels WHERE value = {table}.{column})')
+        elif column in old_columns:
+            targets.append(column)
+            sources.append(column)
+    conn.execute(f"INSERT INTO {table}_encoded ({', '.join(targets)}) SELECT {', '.join(sources)} FROM {table}")
+
+    # Keep AUTOINCREMENT from handing out ids of rows deleted before the rewrite
+    sequence = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_encoded RENAME TO {table}')
+    if sequence:
+        conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (sequence[0], table))
+    print(f"Encoded {', '.join(labelled)} of {table} as label ids")
+
+
+def ensure_label_schema(conn):
+    """Create the label tables and views, migrating text columns if needed.
+
+    Runs after the data tables exist; triggers and indexes on a rewritten
+    table are dropped with it and recreated by the rest of the schema setup.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS labels (
+        id INTEGER PRIMARY KEY,
+        value TEXT NOT NULL UNIQUE
+    )
+    ''')
+    for table in LABEL_COLUMNS:
+        columns = _columns(conn, table)
+        if not columns:
+            conn.execute(CREATE_TABLES[table].format(name=table))
+        elif any(column in columns for column in LABEL_COLUMNS[table]):
+            conn.execute(f'DROP VIEW IF EXISTS {view(table)}')
+            _rebuild_legacy_table(conn, table)
+
+        selected = [decode_sql(column) + f' AS {column}' if column in LABEL_COLUMNS[table] else column
+                    for column in TABLE_COLUMNS[table]]
+        conn.execute(f"CREATE VIEW IF NOT EXISTS {view(table)} AS SELECT {', '.join(selected)} FROM {table}")
+
+
+def is_legacy(db_path):
+    """True if the database at db_path still stores label text (for tools)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return any(column in _columns(conn, table) for table in LABEL_COLUMNS for column in LABEL_COLUMNS[table])
+    finally:
+        conn.close()
@@ -0,0 +1,117 @@
+"""
+Keeps password hashing from eating the whole server.
+
+Every login costs a full PBKDF2 run. Requests are first admitted by token
+buckets per client IP and per username, and the hashing itself runs on a
+small process pool with a bounded queue, so a flood of logins gets 429s
+instead of starving every other endpoint of CPU.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pbkdf2_hex(password, salt, rounds):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), rounds).hex()
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most capacity."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        """Take a token. Returns 0 if one was available, else the seconds until one is."""
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class LoginAdmission:
+    """Per-IP and per-username token buckets for /auth/login."""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self, ip_per_minute, ip_burst, user_per_minute, user_burst):
+        self.limits = {
+            'ip': (ip_per_minute / 60.0, ip_burst),
+            'user': (user_per_minute / 60.0, user_burst),
+        }
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def admit(self, ip, username):
+        """Returns 0 if the attempt may go ahead, else seconds to wait."""
+        now = time.monotonic()
+        with self.lock:
+            if len(self.buckets) > self.MAX_BUCKETS:
+                self.prune(now)
+            waits = []
+            buckets = [self.bucket('ip', ip), self.bucket('user', (username or '').lower())]
+            for bucket in buckets:
+                bucket.refill(now)
+                waits.append(0 if bucket.tokens >= 1 else (1 - bucket.tokens) / bucket.rate)
+            if max(waits) > 0:
+                return max(waits)
+            # Only charge the buckets when both allow it
+            for bucket in buckets:
+                bucket.take(now)
+            return 0
+
+    def bucket(self, kind, key):
+        bucket = self.buckets.get((kind, key))
+        if bucket is None:
+            bucket = self.buckets[(kind, key)] = TokenBucket(*self.limits[kind])
+        return bucket
+
+    def prune(self, now):
+        """Forget buckets that have refilled; they behave like new ones."""
+        for key, bucket in list(self.buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self.buckets[key]
+
+
+class HashPoolBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Password hashing queue is full')
+        self.retry_after = retry_after
+
+
+class HashPool:
+    """Fixed-size process pool for PBKDF2 with at most workers + queue_size
+    jobs admitted at once. Extra jobs raise HashPoolBusy right away."""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.average_seconds = 0.1
+
+    def pbkdf2(self, password, salt, rounds):
+        if not self.slots.acquire(blocking=False):
+            raise HashPoolBusy(max(1, math.ceil(self.average_seconds)))
+        try:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            start = time.monotonic()
+            result = self.executor.submit(pbkdf2_hex, password, salt, rounds).result()
+            self.average_seconds = 0.8 * self.average_seconds + 0.2 * (time.monotonic() - start)
+            return result
+        finally:
+            self.slots.release()
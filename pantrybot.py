@@ -1,54 +1,377 @@
+import time
+_startup_t0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
-import os, platform, subprocess, time, dbus
+import os, sys, threading
 import sqlite3
-from datetime import datetime
-
-# Ensure database connection
-conn = sqlite3.connect('pantrybot.db')
-cursor = conn.cursor()
-
-# Create tables for items and recipes
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS items (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    type TEXT NOT NULL,
-    quantity INTEGER NOT NULL,
-    entry_date TEXT NOT NULL,
-    expiry_date TEXT NOT NULL
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS recipes (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    title TEXT NOT NULL,
-    author TEXT NOT NULL,
-    description TEXT,
-    prep_time INTEGER,
-    cook_time INTEGER
-)
-''')
-
-# Add new table for grocery items
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS grocery_items (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    quantity INTEGER DEFAULT 1,
-    category TEXT DEFAULT 'Vegetables',
-    checked INTEGER DEFAULT 0,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-''')
-
-conn.commit()
+from datetime import datetime, timedelta
+
+# kiosk_sync (ssl, urllib), recipe_matcher and fuzzy_search are imported where
+# they are used, after the main menu is on screen; config is only dicts
+from config import SYNC_CONFIG, BARCODE_CONFIG, SEARCH_CONFIG
+
+DB_PATH = 'pantrybot.db'
+
+# Startup timing trace, enabled with --profile-startup
+PROFILE_STARTUP = '--profile-startup' in sys.argv
+_startup_marks = []
+
+def startup_mark(label):
+    """Record how long after process start a startup step finished."""
+    if PROFILE_STARTUP:
+        _startup_marks.append((label, time.perf_counter() - _startup_t0))
+
+def print_startup_trace():
+    previous = 0.0
+    print("Startup trace (ms since process start):")
+    for label, elapsed in sorted(_startup_marks, key=lambda mark: mark[1]):
+        print(f"  {elapsed * 1000:8.1f}  (+{(elapsed - previous) * 1000:7.1f})  {label}")
+        previous = elapsed
+
+startup_mark("imports done")
+
+# Shared UI connection, opened by open_db() at startup
+conn = None
+cursor = None
+
+# Set once ensure_schema() has finished in the background; schema_error is
+# what it raised, if it failed
+schema_ready = threading.Event()
+schema_error = None
+
+# Item types offered by the kiosk's pantry forms
+ITEM_TYPES = ["Dairy", "Meat", "Vegetables", "Fruits", "Grains", "Sweets", "Oils"]
+
+# Categories of the barcode catalog (and the app) the kiosk spells differently
+ITEM_TYPE_ALIASES = {'Meats': 'Meat'}
+
+def item_type_for(category):
+    """The form's item type for a catalog category, '' if the form has none."""
+    category = ITEM_TYPE_ALIASES.get(category, category)
+    return category if category in ITEM_TYPES else ''
+
+def open_db():
+    global conn, cursor
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+def ensure_schema(db_path=DB_PATH):
+    """Create the kiosk tables if they don't exist yet. Runs off the UI thread."""
+    global schema_error
+    schema_conn = sqlite3.connect(db_path)
+    try:
+        # Create tables for items and recipes
+        schema_conn.execute('''
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            entry_date TEXT NOT NULL,
+            expiry_date TEXT NOT NULL
+        )
+        ''')
+
+        schema_conn.execute('''
+        CREATE TABLE IF NOT EXISTS recipes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            description TEXT,
+            prep_time INTEGER,
+            cook_time INTEGER
+        )
+        ''')
+
+        # Add new table for grocery items
+        schema_conn.execute('''
+        CREATE TABLE IF NOT EXISTS grocery_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            quantity INTEGER DEFAULT 1,
+            category TEXT DEFAULT 'Vegetables',
+            checked INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        ensure_recipe_search_index(schema_conn)
+        ensure_name_search_index(schema_conn)
+        import kiosk_sync, recipe_matcher
+        recipe_matcher.ensure_ingredient_schema(schema_conn)
+        kiosk_sync.ensure_sync_schema(schema_conn)
+
+        schema_conn.commit()
+    except Exception as e:
+        schema_error = e
+        raise
+    finally:
+        schema_conn.close()
+        schema_ready.set()
+        startup_mark("schema ready")
+
+# Full-text recipe search. Falls back to LIKE if SQLite was built without FTS5.
+recipe_fts_available = False
+
+# Column weights for bm25(): a hit in the title counts most
+RECIPE_RANK_WEIGHTS = (10.0, 4.0, 1.0)
+
+def ensure_recipe_search_index(db):
+    """Create the FTS5 index over recipes and the triggers that keep it in sync."""
+    global recipe_fts_available
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'"
+    ).fetchone()
+    try:
+        db.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+            title, author, description,
+            content='recipes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Recipe search index unavailable, using LIKE search: {e}")
+        recipe_fts_available = False
+        return
+
+    db.executescript('''
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts (rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+        INSERT INTO recipes_fts (recipes_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE ON recipes BEGIN
+        INSERT INTO recipes_fts (recipes_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO recipes_fts (rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END;
+    ''')
+
+    # Index recipes that were added before the index existed
+    if not exists:
+        db.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('rebuild')")
+    recipe_fts_available = True
+
+def recipe_match_query(search_term):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    words = [word for word in search_term.replace('"', ' ').split()
+             if any(ch.isalnum() for ch in word)]
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_recipe_rows(db_cursor, search_term, limit=None):
+    """Return recipe rows matching search_term, best match first."""
+    match_query = recipe_match_query(search_term)
+    if not match_query:
+        # Browsing lists every recipe; only ranked matches are cut to limit
+        db_cursor.execute("SELECT * FROM recipes ORDER BY title ASC")
+    elif recipe_fts_available:
+        limit_sql = f" LIMIT {int(limit)}" if limit else ""
+        db_cursor.execute(f"""
+            SELECT recipes.* FROM recipes_fts
+            JOIN recipes ON recipes.id = recipes_fts.rowid
+            WHERE recipes_fts MATCH ?
+            ORDER BY bm25(recipes_fts, ?, ?, ?)
+        """ + limit_sql, (match_query, *RECIPE_RANK_WEIGHTS))
+    else:
+        pattern = '%' + search_term + '%'
+        db_cursor.execute("""
+            SELECT * FROM recipes
+            WHERE title LIKE ? OR author LIKE ? OR description LIKE ?
+            ORDER BY title ASC
+        """, (pattern, pattern, pattern))
+    return db_cursor.fetchall()
+
+# Typo-tolerant name search over the pantry items and the grocery list (see
+# fuzzy_search.py). Falls back to LIKE if SQLite has no FTS5 trigram tokenizer.
+NAME_SEARCH_TABLES = ('items', 'grocery_items')
+name_fts_available = False
+
+def ensure_name_search_index(db):
+    """Create trigram indexes over item and grocery names and their triggers."""
+    global name_fts_available
+    for table in NAME_SEARCH_TABLES:
+        exists = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{table}_fts',)
+        ).fetchone()
+        try:
+            db.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                name, content='{table}', content_rowid='id', tokenize='trigram'
+            )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"Name search index unavailable, using LIKE search: {e}")
+            name_fts_available = False
+            return
+
+        db.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts (rowid, name) VALUES (new.id, new.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF name ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO {table}_fts (rowid, name) VALUES (new.id, new.name);
+        END;
+        ''')
+
+        if not exists:
+            db.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+    name_fts_available = True
+
+def search_name_rows(db_cursor, table, search_term):
+    """Rows of table whose name matches search_term, closest match first."""
+    from fuzzy_search import is_match, match_query, similarity
+    match = match_query(search_term)
+    if name_fts_available and match:
+        db_cursor.execute(f"""
+            SELECT {table}.* FROM {table}_fts
+            JOIN {table} ON {table}.id = {table}_fts.rowid
+            WHERE {table}_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        """, (match, SEARCH_CONFIG['candidates']))
+    else:
+        db_cursor.execute(f"SELECT * FROM {table} WHERE name LIKE ? ORDER BY name ASC",
+                          ('%' + search_term.strip() + '%',))
+    rows = [row for row in db_cursor.fetchall() if is_match(search_term, row[1])]
+    # sort() is stable, so equal scores keep the bm25 order
+    rows.sort(key=lambda row: similarity(search_term, row[1]), reverse=True)
+    return rows
+
+def wait_for_schema():
+    """Block until the background schema check is done (normally long finished).
+
+    Raises what the check raised if it failed, rather than letting the screens
+    query tables that were never created.
+    """
+    schema_ready.wait()
+    if schema_error is not None:
+        raise schema_error
+
+class KineticScroller:
+    """Touch-drag scrolling for one canvas.
+
+    Drag deltas are accumulated and applied at most once per frame with
+    yview_moveto, so a fast drag costs one redraw per frame instead of one
+    per motion event. After release the content keeps gliding and slows down.
+    """
+
+    FRAME_MS = 16        # ~60 fps
+    FRICTION = 0.92      # velocity kept per frame while gliding
+    MIN_VELOCITY = 0.5   # px per frame below which gliding stops
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.pending = 0.0
+        self.velocity = 0.0
+        self.last_y = None
+        self.last_time = None
+        self.dragging = False
+        self.frame_job = None
+
+    def owns(self, widget):
+        """True if widget is the canvas or anything placed inside it."""
+        path = str(widget)
+        canvas_path = str(self.canvas)
+        return path == canvas_path or path.startswith(canvas_path + '.')
+
+    def press(self, event):
+        self.velocity = 0.0
+        self.pending = 0.0
+        self.last_y = event.y_root
+        self.last_time = event.time
+        self.dragging = True
+
+    def drag(self, event):
+        if self.last_y is None:
+            return
+        # Use root coordinates, the widget under the finger moves with the content
+        delta = self.last_y - event.y_root
+        elapsed = max(event.time - self.last_time, 1)
+        self.last_y = event.y_root
+        self.last_time = event.time
+        self.pending += delta
+
+        # Smoothed velocity in px per frame, used for the glide after release
+        self.velocity = 0.8 * (delta * self.FRAME_MS / elapsed) + 0.2 * self.velocity
+        self.schedule()
+
+    def release(self, event):
+        self.dragging = False
+        # A finger that stopped before lifting should not glide
+        if self.last_time is not None and event.time - self.last_time > 3 * self.FRAME_MS:
+            self.velocity = 0.0
+        self.last_y = None
+        if abs(self.velocity) >= self.MIN_VELOCITY:
+            self.schedule()
+        else:
+            self.velocity = 0.0
+
+    def schedule(self):
+        if self.frame_job is None:
+            self.frame_job = self.canvas.after(self.FRAME_MS, self.on_frame)
+
+    def stop(self):
+        if self.frame_job is not None:
+            self.canvas.after_cancel(self.frame_job)
+            self.frame_job = None
+        self.pending = 0.0
+        self.velocity = 0.0
+
+    def on_frame(self):
+        self.frame_job = None
+        if not self.canvas.winfo_exists():
+            return
+
+        if self.pending:
+            self.move_by(self.pending)
+            self.pending = 0.0
+        elif not self.dragging and self.velocity:
+            if not self.move_by(self.velocity):
+                self.velocity = 0.0
+            self.velocity *= self.FRICTION
+            if abs(self.velocity) < self.MIN_VELOCITY:
+                self.velocity = 0.0
+
+        if self.pending or (not self.dragging and self.velocity):
+            self.schedule()
+
+    def move_by(self, pixels):
+        """Scroll by a fractional number of pixels. Returns False at either end."""
+        bbox = self.canvas.bbox("all")
+        if not bbox:
+            return False
+        content_height = bbox[3] - bbox[1]
+        top, bottom = self.canvas.yview()
+        max_top = max(0.0, 1.0 - (bottom - top))
+        if content_height <= 0 or max_top == 0.0:
+            return False
+
+        target = top + pixels / content_height
+        clamped = min(max(target, 0.0), max_top)
+        self.canvas.yview_moveto(clamped)
+        return clamped == target
 
 class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
+    SEARCH_DEBOUNCE_MS = 250
+    RECIPE_SEARCH_LIMIT = 100  # best matches shown as cards
+    SYNC_POLL_MS = 2000
+
     def __init__(self):
         super().__init__()
+        self.recipe_search_job = None
+        self.matcher = None  # created in finish_startup
+        self.sync_worker = None
+        self.barcode_catalog = None  # opened on the first scan
         self.title("Pantry Bot")
         
         # Get screen dimensions
@@ -61,9 +384,56 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         # Container to hold all widgets
         self.container = tk.Frame(self)
         self.container.pack(fill=tk.BOTH, expand=True)
+
+        # One set of touch bindings for the whole app, routed to the scroller
+        # of the canvas currently on screen (see add_scrollbar_to_frame)
+        self.scroller = None
+        self.bind_all("<ButtonPress-1>", self.on_touch_start, add="+")
+        self.bind_all("<B1-Motion>", self.on_touch_scroll, add="+")
+        self.bind_all("<ButtonRelease-1>", self.on_touch_end, add="+")
         
         # Start with main menu
         self.show_main_menu()
+        startup_mark("main menu built")
+
+        # Defer everything else until the first frame is on screen
+        self.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        startup_mark("main menu painted")
+        threading.Thread(target=ensure_schema, name="schema-check", daemon=True).start()
+        import kiosk_sync, recipe_matcher
+        self.matcher = recipe_matcher.RecipeMatcher()
+
+        # Replication runs on its own thread once the schema is ready
+        self.sync_worker = kiosk_sync.start_sync_worker(DB_PATH, SYNC_CONFIG, ready=schema_ready)
+        if self.sync_worker:
+            self.after(self.SYNC_POLL_MS, self.check_remote_changes)
+        if PROFILE_STARTUP:
+            self.after(50, self.report_startup)
+
+    def request_sync(self):
+        """Nudge the sync worker after a local write. Never blocks."""
+        if self.sync_worker:
+            self.sync_worker.request_sync()
+
+    def check_remote_changes(self):
+        """Redraw the list on screen when a pull changed local rows."""
+        if self.sync_worker.remote_changes.is_set():
+            self.sync_worker.remote_changes.clear()
+            items_frame = getattr(self, 'items_display_frame', None)
+            grocery_frame = getattr(self, 'grocery_list', None)
+            if items_frame is not None and items_frame.winfo_exists():
+                self.populate_items()
+            elif grocery_frame is not None and grocery_frame.winfo_exists():
+                self.filter_grocery_items()
+        self.after(self.SYNC_POLL_MS, self.check_remote_changes)
+
+    def report_startup(self):
+        if not schema_ready.is_set():
+            self.after(50, self.report_startup)
+            return
+        print_startup_trace()
 
     def show_main_menu(self):
         # Clear the existing content
@@ -107,6 +477,8 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         self.sleep_button.pack(side=tk.LEFT, padx=5, pady=5)
 
     def show_items(self):
+        wait_for_schema()
+
         # Clear the existing content
         for widget in self.container.winfo_children():
             widget.destroy()
@@ -214,11 +586,10 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         if search_term.strip() == "":
             # No search term provided, prioritize by expiry date
             cursor.execute("SELECT * FROM items ORDER BY expiry_date ASC")
+            items = cursor.fetchall()
         else:
-            # Search for items matching the search term and sort alphabetically
-            cursor.execute("SELECT * FROM items WHERE name LIKE ? ORDER BY name ASC", ('%' + search_term + '%',))
-
-        items = cursor.fetchall()
+            # Search for items matching the search term, closest match first
+            items = search_name_rows(cursor, 'items', search_term)
 
         for item in items:
             item_frame = tk.Frame(self.items_display_frame)
@@ -254,6 +625,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         if confirm:
             cursor.execute("DELETE FROM items WHERE id=?", (item[0],))
             conn.commit()
+            self.request_sync()
             messagebox.showinfo("Success", f"Item '{item[1]}' was deleted successfully!")
             self.show_items()
 
@@ -272,7 +644,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         self.name_entry.grid(row=0, column=1, padx=10, pady=10)
 
         tk.Label(form_frame, text="Type:", font=('Arial', 14)).grid(row=1, column=0, padx=10, pady=10)
-        self.type_entry = ttk.Combobox(form_frame, font=('Arial', 14), values=["Dairy", "Meat", "Vegetables", "Fruits", "Grains", "Sweets", "Oils"])
+        self.type_entry = ttk.Combobox(form_frame, font=('Arial', 14), values=ITEM_TYPES)
         self.type_entry.set(item[2])
         self.type_entry.grid(row=1, column=1, padx=10, pady=10)
 
@@ -299,6 +671,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
 
 
         tk.Label(form_frame, text="Expiry Date:", font=('Arial', 14)).grid(row=3, column=0, padx=10, pady=10)
+        from tkcalendar import DateEntry  # Heavy import, only the item forms need it
         self.expiry_entry = DateEntry(form_frame, font=('Arial', 14), date_pattern='yyyy-mm-dd', state='readonly')
         self.expiry_entry.set_date(item[5])  # Set the DateEntry to the item's current expiry date
         self.expiry_entry.grid(row=3, column=1, padx=10, pady=10)
@@ -335,6 +708,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
             WHERE id = ?
         """, (name, type_, quantity, expiry_date, item_id))
         conn.commit()
+        self.request_sync()
 
         messagebox.showinfo("Success", "Item updated successfully!")
         self.show_items()
@@ -346,23 +720,30 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         form_frame = tk.Frame(self.container)
         form_frame.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 
-        tk.Label(form_frame, text="Name:", font=('Arial', 14)).grid(row=0, column=0, padx=10, pady=10)
+        # A USB scanner types the barcode and Enter into this field
+        tk.Label(form_frame, text="Barcode:", font=('Arial', 14)).grid(row=0, column=0, padx=10, pady=10)
+        self.barcode_entry = tk.Entry(form_frame, font=('Arial', 14))
+        self.barcode_entry.grid(row=0, column=1, padx=10, pady=10)
+        self.barcode_entry.bind('<Return>', self.fill_from_barcode)
+        self.barcode_entry.focus_set()
+
+        tk.Label(form_frame, text="Name:", font=('Arial', 14)).grid(row=1, column=0, padx=10, pady=10)
         self.name_entry = tk.Entry(form_frame, font=('Arial', 14))
-        self.name_entry.grid(row=0, column=1, padx=10, pady=10)
+        self.name_entry.grid(row=1, column=1, padx=10, pady=10)
 
-        tk.Label(form_frame, text="Category:", font=('Arial', 14)).grid(row=1, column=0, padx=10, pady=10)
+        tk.Label(form_frame, text="Category:", font=('Arial', 14)).grid(row=2, column=0, padx=10, pady=10)
         self.type_entry = ttk.Combobox(form_frame, font=('Arial', 14), 
-                            values=["Dairy", "Meat", "Vegetables", "Fruits", "Grains", "Sweets", "Oils"], 
+                            values=ITEM_TYPES, 
                             state='readonly')
 
-        self.type_entry.grid(row=1, column=1, padx=10, pady=10)
+        self.type_entry.grid(row=2, column=1, padx=10, pady=10)
 
         # Quantity Label
-        tk.Label(form_frame, text="Quantity:", font=('Arial', 14)).grid(row=2, column=0, padx=10, pady=10)
+        tk.Label(form_frame, text="Quantity:", font=('Arial', 14)).grid(row=3, column=0, padx=10, pady=10)
 
         # Frame to hold the quantity display and buttons
         quantity_frame = tk.Frame(form_frame)
-        quantity_frame.grid(row=2, column=1, padx=10, pady=10)
+        quantity_frame.grid(row=3, column=1, padx=10, pady=10)
 
         # Decrement Button
         decrement_button = tk.Button(quantity_frame, text="–", font=('Arial', 20), width=3, command=self.decrement_quantity)
@@ -378,12 +759,13 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         increment_button.pack(side=tk.LEFT, padx=5)
 
         # Use DateEntry for the expiry date field
-        tk.Label(form_frame, text="Expiry Date:", font=('Arial', 14)).grid(row=3, column=0, padx=10, pady=10)
+        from tkcalendar import DateEntry  # Heavy import, only the item forms need it
+        tk.Label(form_frame, text="Expiry Date:", font=('Arial', 14)).grid(row=4, column=0, padx=10, pady=10)
         self.expiry_entry = DateEntry(form_frame, font=('Arial', 14), date_pattern='yyyy-mm-dd', state='readonly')  # Date picker
-        self.expiry_entry.grid(row=3, column=1, padx=10, pady=10)
+        self.expiry_entry.grid(row=4, column=1, padx=10, pady=10)
 
         button_frame = tk.Frame(form_frame)
-        button_frame.grid(row=4, column=0, columnspan=2, pady=20)
+        button_frame.grid(row=5, column=0, columnspan=2, pady=20)
 
         add_button = tk.Button(button_frame, text="Add Item", font=('Arial', 14), command=self.add_item)
         add_button.pack(side=tk.LEFT, padx=10)
@@ -391,6 +773,33 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         cancel_button = tk.Button(button_frame, text="Cancel", font=('Arial', 14), command=self.show_items)
         cancel_button.pack(side=tk.LEFT, padx=10)
 
+    def fill_from_barcode(self, event=None):
+        """Fill the add form from the offline barcode catalog."""
+        barcode = self.barcode_entry.get().strip()
+        if not barcode:
+            return
+        if self.barcode_catalog is None:
+            from barcode_catalog import BarcodeCatalog
+            try:
+                self.barcode_catalog = BarcodeCatalog(BARCODE_CONFIG['catalog_path'])
+            except (OSError, ValueError) as e:
+                print(f"Barcode catalog unavailable: {e}")
+                messagebox.showerror("Barcode", "No barcode catalog on this kiosk.")
+                return
+        product = self.barcode_catalog.lookup(barcode)
+        if product is None:
+            messagebox.showinfo("Barcode", f"Barcode {barcode} not found, please fill in the item by hand.")
+            self.name_entry.focus_set()
+            return
+
+        self.name_entry.delete(0, tk.END)
+        self.name_entry.insert(0, product['name'])
+        # Drinks, Other etc. have no kiosk type: leave it for the user to pick
+        self.type_entry.set(item_type_for(product['category']))
+        self.expiry_entry.set_date(datetime.now() + timedelta(days=product['shelf_life_days']))
+        if not self.quantity_var.get():
+            self.quantity_var.set(1)
+
     def increment_quantity(self):
         current_quantity = self.quantity_var.get()
         self.quantity_var.set(current_quantity + 1)
@@ -421,11 +830,14 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
             VALUES (?, ?, ?, ?, ?)
         """, (name, type_, quantity, datetime.now().strftime("%Y-%m-%d"), expiry_date))
         conn.commit()
+        self.request_sync()
 
         messagebox.showinfo("Success", "Item added successfully!")
         self.show_items()
 
     def show_menus(self):
+        wait_for_schema()
+
         # Clear the existing content
         for widget in self.container.winfo_children():
             widget.destroy()
@@ -448,6 +860,10 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
                              command=lambda: self.search_recipes(self.search_entry.get()))
         search_button.pack(side=tk.LEFT, padx=5)
 
+        # Search as you type, debounced; a pending search dies with the screen
+        self.search_entry.bind('<KeyRelease>', self.schedule_recipe_search)
+        self.search_entry.bind('<Destroy>', self.cancel_recipe_search)
+
         # Frame for control buttons
         self.control_frame = tk.Frame(self.container)
         self.control_frame.pack(pady=20)
@@ -456,6 +872,10 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
                           command=lambda: [self.show_recipe_form_for_adding()])
         add_button.pack(side=tk.LEFT, padx=10)
 
+        cook_button = tk.Button(self.control_frame, text="What Can I Cook?", font=('Arial', 16),
+                                command=self.show_cookable_recipes)
+        cook_button.pack(side=tk.LEFT, padx=10)
+
         back_button = tk.Button(self.control_frame, text="Back to Main Menu", font=('Arial', 16),
                            command=self.show_main_menu)
         back_button.pack(side=tk.LEFT, padx=10)
@@ -508,7 +928,25 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
                 col = 0
                 row += 1
 
+    def schedule_recipe_search(self, event=None):
+        """Search once typing pauses instead of on every keystroke."""
+        self.cancel_recipe_search()
+        self.recipe_search_job = self.after(self.SEARCH_DEBOUNCE_MS, self.run_recipe_search)
+
+    def cancel_recipe_search(self, event=None):
+        if self.recipe_search_job is not None:
+            self.after_cancel(self.recipe_search_job)
+            self.recipe_search_job = None
+
+    def run_recipe_search(self):
+        self.recipe_search_job = None
+        # The menu screen may have been left (or rebuilt) since the keystroke
+        if self.menus_display_frame.winfo_exists() and self.search_entry.winfo_exists():
+            self.search_recipes(self.search_entry.get())
+
     def search_recipes(self, search_term):
+        self.cancel_recipe_search()
+
         for widget in self.menus_display_frame.winfo_children():
             widget.destroy()
 
@@ -516,16 +954,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         row = 0
         col = 0
 
-        if search_term.strip() == "":
-            cursor.execute("SELECT * FROM recipes ORDER BY title ASC")
-        else:
-            cursor.execute("""
-                SELECT * FROM recipes
-                WHERE title LIKE ? OR author LIKE ?
-                ORDER BY title ASC
-            """, ('%' + search_term + '%', '%' + search_term + '%'))
-
-        recipes = cursor.fetchall()
+        recipes = search_recipe_rows(cursor, search_term, limit=self.RECIPE_SEARCH_LIMIT)
 
         for recipe in recipes:
             recipe_frame = tk.Frame(self.menus_display_frame)
@@ -562,6 +991,44 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         for i in range(row + 1):
             self.menus_display_frame.grid_rowconfigure(i, weight=1)
 
+    def show_cookable_recipes(self):
+        """Show recipes ranked by how much of them the pantry covers."""
+        for widget in self.menus_display_frame.winfo_children():
+            widget.destroy()
+
+        matches = self.matcher.best_matches(conn, limit=self.RECIPE_SEARCH_LIMIT)
+        if not matches:
+            tk.Label(self.menus_display_frame, text="No recipe uses anything in the pantry yet.",
+                     font=('Arial', 14)).grid(row=0, column=0, padx=20, pady=20)
+            return
+
+        placeholders = ','.join('?' * len(matches))
+        cursor.execute(f"SELECT * FROM recipes WHERE id IN ({placeholders})",
+                       [match['recipe_id'] for match in matches])
+        recipes = {recipe[0]: recipe for recipe in cursor.fetchall()}
+
+        recipes_per_row = 3
+        for index, match in enumerate(matches):
+            recipe = recipes.get(match['recipe_id'])
+            if recipe is None:
+                continue
+            recipe_frame = tk.Frame(self.menus_display_frame)
+            recipe_frame.grid(row=index // recipes_per_row, column=index % recipes_per_row,
+                              padx=20, pady=20, sticky="ew")
+
+            tk.Label(recipe_frame, text=recipe[1], font=('Arial', 14, 'bold')).pack(pady=5)
+            tk.Label(recipe_frame, text=f"Have {match['matched']} of {match['total']} ingredients",
+                     font=('Arial', 12)).pack(pady=5)
+            missing = self.matcher.missing_ingredients(recipe[0])
+            if missing:
+                tk.Label(recipe_frame, text="Missing: " + ", ".join(missing), font=('Arial', 12),
+                         wraplength=200).pack(pady=5)
+            tk.Button(recipe_frame, text="View", font=('Arial', 10),
+                      command=lambda r=recipe: self.view_recipe(r)).pack(pady=5)
+
+        for i in range(recipes_per_row):
+            self.menus_display_frame.grid_columnconfigure(i, weight=1)
+
     def add_recipe(self):
         title = self.title_entry.get()
         author = self.author_entry.get()
@@ -584,7 +1051,12 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
             INSERT INTO recipes (title, author, description, prep_time, cook_time)
             VALUES (?, ?, ?, ?, ?)
         """, (title, author, description, prep_time, cook_time))
+        recipe_id = cursor.lastrowid
+        import recipe_matcher
+        recipe_matcher.set_recipe_ingredients(
+            cursor, recipe_id, recipe_matcher.parse_ingredient_list(self.ingredients_entry.get()))
         conn.commit()
+        self.matcher.recipe_changed(conn, recipe_id)
 
         messagebox.showinfo("Success", "Recipe added successfully!")
         self.show_menus()
@@ -594,6 +1066,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         if confirm:
             cursor.execute("DELETE FROM recipes WHERE id=?", (recipe[0],))
             conn.commit()
+            self.matcher.recipe_changed(conn, recipe[0])
             messagebox.showinfo("Success", f"Recipe '{recipe[1]}' was deleted successfully!")
             self.show_menus()
 
@@ -624,8 +1097,12 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         self.cook_time_entry = tk.Entry(form_frame, font=('Arial', 14))
         self.cook_time_entry.grid(row=4, column=1, padx=10, pady=10)
 
+        tk.Label(form_frame, text="Ingredients (comma separated):", font=('Arial', 14)).grid(row=5, column=0, padx=10, pady=10)
+        self.ingredients_entry = tk.Entry(form_frame, font=('Arial', 14))
+        self.ingredients_entry.grid(row=5, column=1, padx=10, pady=10)
+
         button_frame = tk.Frame(form_frame)
-        button_frame.grid(row=5, column=0, columnspan=2, pady=20)
+        button_frame.grid(row=6, column=0, columnspan=2, pady=20)
 
         add_button = tk.Button(button_frame, text="Add Recipe", font=('Arial', 14), command=self.add_recipe)
         add_button.pack(side=tk.LEFT, padx=10)
@@ -665,8 +1142,14 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         self.cook_time_entry.insert(0, recipe[5])
         self.cook_time_entry.grid(row=4, column=1, padx=10, pady=10)
 
+        tk.Label(form_frame, text="Ingredients (comma separated):", font=('Arial', 14)).grid(row=5, column=0, padx=10, pady=10)
+        self.ingredients_entry = tk.Entry(form_frame, font=('Arial', 14))
+        import recipe_matcher
+        self.ingredients_entry.insert(0, ", ".join(recipe_matcher.get_recipe_ingredients(cursor, recipe[0])))
+        self.ingredients_entry.grid(row=5, column=1, padx=10, pady=10)
+
         button_frame = tk.Frame(form_frame)
-        button_frame.grid(row=5, column=0, columnspan=2, pady=20)
+        button_frame.grid(row=6, column=0, columnspan=2, pady=20)
 
         save_button = tk.Button(button_frame, text="Save Changes", font=('Arial', 14), command=lambda: self.save_recipe_changes(recipe[0]))
         save_button.pack(side=tk.LEFT, padx=10)
@@ -717,7 +1200,11 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
             SET title = ?, author = ?, description = ?, prep_time = ?, cook_time = ?
             WHERE id = ?
         """, (title, author, description, prep_time, cook_time, recipe_id))
+        import recipe_matcher
+        recipe_matcher.set_recipe_ingredients(
+            cursor, recipe_id, recipe_matcher.parse_ingredient_list(self.ingredients_entry.get()))
         conn.commit()
+        self.matcher.recipe_changed(conn, recipe_id)
 
         # Show a success message
         messagebox.showinfo("Success", "Recipe updated successfully!")
@@ -744,32 +1231,37 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         # Update scrollregion when content changes
         content_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
 
-        # Store canvas reference
+        # Store canvas reference and hand touch scrolling over to it
         self.canvas = canvas
-
-        # Bind touch scroll events to the canvas and all child widgets
-        self.bind_scroll_events(content_frame)
+        if self.scroller is not None:
+            self.scroller.stop()
+        self.scroller = KineticScroller(canvas)
 
         return content_frame
 
-    def bind_scroll_events(self, widget):
-        widget.bind("<Button-1>", self.on_touch_start, add="+")
-        widget.bind("<B1-Motion>", self.on_touch_scroll, add="+")
-        for child in widget.winfo_children():
-            self.bind_scroll_events(child)
+    def active_scroller(self, event):
+        if self.scroller is not None and self.scroller.owns(event.widget):
+            return self.scroller
+        return None
 
     def on_touch_start(self, event):
-        print("Touch start")
-        self.last_y = event.y
+        scroller = self.active_scroller(event)
+        if scroller:
+            scroller.press(event)
 
     def on_touch_scroll(self, event):
-        print("Touch scroll")
-        delta_y = self.last_y - event.y
-        self.last_y = event.y
-        scroll_amount = int(delta_y / 5)
-        self.canvas.yview_scroll(scroll_amount, "units")
+        scroller = self.active_scroller(event)
+        if scroller:
+            scroller.drag(event)
+
+    def on_touch_end(self, event):
+        scroller = self.active_scroller(event)
+        if scroller:
+            scroller.release(event)
 
     def show_grocery(self):
+        wait_for_schema()
+
         # Clear existing content
         for widget in self.container.winfo_children():
             widget.destroy()
@@ -861,9 +1353,10 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
 
         items = cursor.fetchall()
 
-        # Filter based on search text
-        if search_text:
-            items = [item for item in items if search_text in item[1].lower()]
+        # Filter based on search text, keeping the chosen order
+        if search_text.strip():
+            matches = {row[0] for row in search_name_rows(cursor, 'grocery_items', search_text)}
+            items = [item for item in items if item[0] in matches]
 
         # Clear existing items
         for widget in self.grocery_list.winfo_children():
@@ -904,6 +1397,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
         cursor.execute("UPDATE grocery_items SET checked = ? WHERE id = ?",
                       (checked, item_id))
         conn.commit()
+        self.request_sync()
 
         # Update label color without rebuilding the list
         label = self.item_labels[item_id]
@@ -912,6 +1406,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
     def delete_grocery_item(self, item_id):
         cursor.execute("DELETE FROM grocery_items WHERE id = ?", (item_id,))
         conn.commit()
+        self.request_sync()
         self.filter_grocery_items()
 
     def add_grocery_item(self):
@@ -922,6 +1417,7 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
                 VALUES (?, 0, ?)
             """, (name, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
             conn.commit()
+            self.request_sync()
             self.grocery_entry.delete(0, tk.END)
             self.populate_grocery_items()
 
@@ -977,6 +1473,12 @@ class FridgeManagerApp(tk.Tk):  # Use tk instead of Tk
             print(f"Failed to wake up display: {e}")
             messagebox.showerror("Error", f"Failed to wake up display: {e}")
 
-if __name__ == "__main__":
+def main():
+    open_db()
+    startup_mark("database opened")
     app = FridgeManagerApp()
+    startup_mark("entering mainloop")
     app.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -45,8 +45,9 @@ enum SortOption {
 void main() async {
   WidgetsFlutterBinding.ensureInitialized();
   
-  // Initialize notifications
+  // Initialize notifications and listen for expiry alerts from the server
   await NotificationService.initialize();
+  NotificationService.subscribe();
   
   final prefs = await SharedPreferences.getInstance();
   final isLoggedIn = prefs.getBool('isLoggedIn') ?? false;
@@ -620,7 +621,7 @@ class _PantryListState extends State<PantryList> {
     try {
       final item = items.firstWhere((item) => item['id'] == id);
       final response = await http.put(
-        Uri.parse('$baseUrl/grocery/items/$id'),
+        Uri.parse('$baseUrl/grocery/items/$id?user_id=${widget.userId}'),
         headers: {'Content-Type': 'application/json'},
         body: jsonEncode({
           'checked': checked ? 1 : 0,
@@ -637,61 +638,39 @@ class _PantryListState extends State<PantryList> {
           item['checked'] = checked ? 1 : 0;
         });
         fetchItems();
-        // Pantry sync logic
-        if (checked) {
-          // Add to pantry
-          await _addToPantryFromGrocery(item);
-        } else {
-          // Remove from pantry
-          await _removeFromPantryByName(item['name']);
-        }
       }
     } catch (e) {
       print('Error toggling item: $e');
     }
   }
 
-  Future<void> _addToPantryFromGrocery(Map<String, dynamic> groceryItem) async {
+  // Checked items go to the pantry together when the groceries are put away
+  Future<void> checkoutItems() async {
+    HapticFeedback.mediumImpact();
     final ioc = HttpClient()
       ..badCertificateCallback = ((X509Certificate cert, String host, int port) => true);
     final http = IOClient(ioc);
     try {
-      final pantryItem = {
-        'name': groceryItem['name'],
-        'type': groceryItem['category'],
-        'quantity': groceryItem['quantity'],
-        'expiry_date': '', // Will be set by user later
-        'user_id': widget.userId,
-        'metric': groceryItem['metric'],
-        'amount_per_item': groceryItem['amount_per_item'],
-      };
-      await http.post(
-        Uri.parse('$baseUrl/pantry/items'),
+      final response = await http.post(
+        Uri.parse('$baseUrl/grocery/checkout'),
         headers: {'Content-Type': 'application/json'},
-        body: jsonEncode(pantryItem),
+        body: jsonEncode({'user_id': widget.userId}),
       );
-    } catch (e) {
-      print('Error adding to pantry: $e');
-    }
-  }
-
-  Future<void> _removeFromPantryByName(String name) async {
-    final ioc = HttpClient()
-      ..badCertificateCallback = ((X509Certificate cert, String host, int port) => true);
-    final http = IOClient(ioc);
-    try {
-      // Fetch all pantry items for this user
-      final response = await http.get(Uri.parse('$baseUrl/pantry/items?user_id=${widget.userId}'));
       if (response.statusCode == 200) {
-        final pantryItems = List<Map<String, dynamic>>.from(jsonDecode(response.body));
-        for (final item in pantryItems) {
-          if (item['name'] == name) {
-            await http.delete(Uri.parse('$baseUrl/pantry/items/${item['id']}'));
-          }
+        final moved = List<Map<String, dynamic>>.from(jsonDecode(response.body)['items']);
+        fetchItems();
+        if (mounted) {
+          ScaffoldMessenger.of(context).showSnackBar(
+            SnackBar(content: Text(moved.isEmpty
+                ? 'No checked items to put away'
+                : 'Moved ${moved.length} item${moved.length == 1 ? '' : 's'} to the pantry')),
+          );
         }
+      } else {
+        print('Error checking out: ${response.body}');
       }
     } catch (e) {
-      print('Error removing from pantry: $e');
+      print('Error checking out: $e');
     }
   }
 
@@ -699,7 +678,7 @@ class _PantryListState extends State<PantryList> {
     HapticFeedback.heavyImpact();
     
     final ioClient = IOClient(client);
-    await ioClient.delete(Uri.parse('$baseUrl/grocery/items/$id'));
+    await ioClient.delete(Uri.parse('$baseUrl/grocery/items/$id?user_id=${widget.userId}'));
     fetchItems();
   }
 
@@ -992,7 +971,7 @@ class _PantryListState extends State<PantryList> {
 
     try {
       final response = await http.put(
-        Uri.parse('$baseUrl/grocery/items/$id'),
+        Uri.parse('$baseUrl/grocery/items/$id?user_id=${widget.userId}'),
         headers: {'Content-Type': 'application/json'},
         body: jsonEncode({
           'name': name,
@@ -1463,7 +1442,7 @@ class _PantryListState extends State<PantryList> {
     final http = IOClient(ioc);
     try {
       await http.put(
-        Uri.parse('$baseUrl/pantry/items/$id'),
+        Uri.parse('$baseUrl/pantry/items/$id?user_id=${widget.userId}'),
         headers: {'Content-Type': 'application/json'},
         body: jsonEncode({'expiry_date': '${expiry.year}-${expiry.month.toString().padLeft(2, '0')}-${expiry.day.toString().padLeft(2, '0')}',}),
       );
@@ -1537,6 +1516,11 @@ class _PantryListState extends State<PantryList> {
               ),
             ],
           ),
+          IconButton(
+            icon: const Icon(Icons.kitchen),
+            onPressed: checkoutItems,
+            tooltip: 'Put Checked Items in Pantry',
+          ),
           IconButton(
             icon: const Icon(Icons.refresh),
             onPressed: () => fetchItems(),
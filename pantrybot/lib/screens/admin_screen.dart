@@ -15,6 +15,7 @@ class _AdminScreenState extends State<AdminScreen> {
   Map<int, List<Map<String, dynamic>>> _userItems = {};
   bool _isLoading = false;
   int? _currentUserId;
+  final int _itemsPerUser = 20;
   final String baseUrl = 'https://pantrybot.anonstorage.org:8443';
 
   @override
@@ -37,18 +38,18 @@ class _AdminScreenState extends State<AdminScreen> {
     final httpClient = IOClient(ioc);
 
     try {
-      final response = await httpClient.get(Uri.parse('$baseUrl/users'));
+      // One aggregated request instead of a grocery fetch per user
+      final response = await httpClient.get(Uri.parse('$baseUrl/admin/overview?items=$_itemsPerUser'));
       
       if (response.statusCode == 200) {
-        final users = jsonDecode(response.body);
+        final users = List<Map<String, dynamic>>.from(jsonDecode(response.body)['users']);
         setState(() {
-          _users = List<Map<String, dynamic>>.from(users);
+          _users = users;
+          _userItems = {
+            for (var user in users)
+              user['id'] as int: List<Map<String, dynamic>>.from(user['items'] ?? [])
+          };
         });
-        
-        // Fetch items for each user
-        for (var user in _users) {
-          _fetchUserItems(user['id']);
-        }
       }
     } catch (e) {
       print('Error fetching users: $e');
@@ -57,27 +58,6 @@ class _AdminScreenState extends State<AdminScreen> {
     }
   }
 
-  Future<void> _fetchUserItems(int userId) async {
-    final ioc = HttpClient()
-      ..badCertificateCallback = ((X509Certificate cert, String host, int port) => true);
-    final httpClient = IOClient(ioc);
-
-    try {
-      final response = await httpClient.get(
-        Uri.parse('$baseUrl/grocery/items?user_id=$userId')
-      );
-      
-      if (response.statusCode == 200) {
-        final items = jsonDecode(response.body);
-        setState(() {
-          _userItems[userId] = List<Map<String, dynamic>>.from(items);
-        });
-      }
-    } catch (e) {
-      print('Error fetching items for user $userId: $e');
-    }
-  }
-
   Future<void> _deleteUser(int userId, String username) async {
     // Don't allow deleting yourself
     if (userId == _currentUserId) {
@@ -177,7 +157,7 @@ class _AdminScreenState extends State<AdminScreen> {
                           ),
                       ],
                     ),
-                                         subtitle: Text('${userItems.length} items • Created: ${user['created_at']}'),
+                                         subtitle: Text('${user['grocery_count'] ?? userItems.length} items • Created: ${user['created_at']}'),
                      trailing: user['id'] != _currentUserId 
                          ? IconButton(
                              icon: Icon(Icons.delete, color: Colors.red),
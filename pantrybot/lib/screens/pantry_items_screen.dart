@@ -77,7 +77,7 @@ class _PantryItemsScreenState extends State<PantryItemsScreen> {
       final httpClient = IOClient(ioc);
 
       final response = await httpClient.delete(
-        Uri.parse('https://pantrybot.anonstorage.org:8443/pantry/items/$itemId'),
+        Uri.parse('https://pantrybot.anonstorage.org:8443/pantry/items/$itemId?user_id=${widget.userId}'),
       );
 
       if (response.statusCode == 200) {
@@ -459,7 +459,7 @@ class _PantryItemsScreenState extends State<PantryItemsScreen> {
       } else {
         // Update existing item
                   response = await httpClient.put(
-        Uri.parse('https://pantrybot.anonstorage.org:8443/pantry/items/$itemId'),
+        Uri.parse('https://pantrybot.anonstorage.org:8443/pantry/items/$itemId?user_id=${widget.userId}'),
           headers: {'Content-Type': 'application/json'},
           body: body,
         );
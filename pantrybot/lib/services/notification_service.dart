@@ -59,7 +59,12 @@ class NotificationService {
     await _notifications.show(id, title, body, notificationDetails);
   }
 
-  static Future<void> checkExpiringItems() async {
+  static bool _subscribed = false;
+
+  // The server announces items as they cross an expiry threshold. With
+  // wait > 0 the request is held open until something arrives, so the
+  // subscription loop costs nothing while nothing is expiring.
+  static Future<bool> checkExpiringItems({int wait = 0}) async {
     try {
       final prefs = await SharedPreferences.getInstance();
       final userId = prefs.getInt('userId') ?? 0;
@@ -68,24 +73,30 @@ class NotificationService {
       // Get notification preferences
       final daysAhead = prefs.getInt('notification_days_ahead') ?? 3;
       final notificationsEnabled = prefs.getBool('notifications_enabled') ?? true;
+      final lastId = prefs.getInt('last_notification_id') ?? 0;
       
-      if (!notificationsEnabled || userId == 0) return;
+      if (!notificationsEnabled || userId == 0) return false;
 
       final ioc = HttpClient()
         ..badCertificateCallback = ((X509Certificate cert, String host, int port) => true);
       final httpClient = IOClient(ioc);
 
       final response = await httpClient.get(
-        Uri.parse('$baseUrl/pantry/expiring?user_id=$userId&days=$daysAhead'),
+        Uri.parse('$baseUrl/notifications?user_id=$userId&after=$lastId&wait=$wait'),
       );
 
       if (response.statusCode == 200) {
-        final List<dynamic> expiringItems = jsonDecode(response.body);
+        final List<dynamic> notifications = jsonDecode(response.body);
+        if (notifications.isEmpty) return true;
+        await prefs.setInt('last_notification_id', notifications.last['id']);
+
+        final expiringItems = notifications
+            .where((item) => item['days_until_expiry'] <= daysAhead)
+            .toList();
         
         for (int i = 0; i < expiringItems.length && i < 3; i++) {
           final item = expiringItems[i];
           final itemName = item['name'];
-          final itemType = item['type'];
           final daysUntilExpiry = item['days_until_expiry'];
           
           String message;
@@ -119,10 +130,28 @@ class NotificationService {
             body: 'You have ${expiringItems.length} items expiring soon. Check your pantry!',
           );
         }
+        return true;
       }
     } catch (e) {
       print('Error checking expiring items: $e');
     }
+    return false;
+  }
+
+  // Long-poll the server for as long as the app runs
+  static Future<void> subscribe() async {
+    if (_subscribed) return;
+    _subscribed = true;
+    var backoff = 5;
+    while (true) {
+      final ok = await checkExpiringItems(wait: 50);
+      if (ok) {
+        backoff = 5;
+      } else {
+        await Future.delayed(Duration(seconds: backoff));
+        backoff = backoff < 300 ? backoff * 2 : 300;
+      }
+    }
   }
 
   static Future<void> testNotification() async {
@@ -0,0 +1,290 @@
+"""
+"What can I cook now?" matching between kiosk recipes and pantry items.
+
+Recipes list their ingredients in recipe_ingredients. RecipeMatcher keeps an
+inverted index from normalized ingredient name to the recipes that use it, so
+scoring only walks the postings of ingredients that are actually in the
+pantry. Pantry writes are picked up through the pantry_changes table, which
+triggers fill on every insert, update and delete of items, and only the
+recipes touched by a changed item are re-scored.
+"""
+
+import re
+from datetime import date, datetime
+
+_NON_WORD = re.compile(r'[^a-z ]+')
+
+
+def singular(word):
+    """Very small English singularizer, good enough for ingredient names."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(name):
+    """'  Cherry Tomatoes ' -> 'cherry tomato'"""
+    words = _NON_WORD.sub(' ', (name or '').lower()).split()
+    return ' '.join(singular(word) for word in words)
+
+
+def ingredient_keys(name):
+    """Index keys for a pantry item: the full name and its head noun.
+
+    'cherry tomatoes' satisfies both a 'cherry tomato' and a plain 'tomato'
+    ingredient.
+    """
+    normalized = normalize_ingredient(name)
+    if not normalized:
+        return set()
+    return {normalized, normalized.rsplit(' ', 1)[-1]}
+
+
+def ensure_ingredient_schema(db):
+    """Create the ingredient table and the pantry change-tracking triggers."""
+    db.executescript('''
+    CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipe_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        norm_name TEXT NOT NULL,
+        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe ON recipe_ingredients (recipe_id);
+    CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_norm ON recipe_ingredients (norm_name);
+
+    CREATE TRIGGER IF NOT EXISTS recipe_ingredients_cleanup AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipe_ingredients WHERE recipe_id = old.id;
+    END;
+
+    -- Pantry item ids written since the matcher last looked
+    CREATE TABLE IF NOT EXISTS pantry_changes (
+        item_id INTEGER PRIMARY KEY
+    );
+    CREATE TRIGGER IF NOT EXISTS pantry_changes_insert AFTER INSERT ON items BEGIN
+        INSERT OR IGNORE INTO pantry_changes (item_id) VALUES (new.id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pantry_changes_update AFTER UPDATE ON items BEGIN
+        INSERT OR IGNORE INTO pantry_changes (item_id) VALUES (old.id);
+        INSERT OR IGNORE INTO pantry_changes (item_id) VALUES (new.id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pantry_changes_delete AFTER DELETE ON items BEGIN
+        INSERT OR IGNORE INTO pantry_changes (item_id) VALUES (old.id);
+    END;
+    ''')
+
+
+def parse_ingredient_list(text):
+    """Split the comma separated ingredient field of the recipe form."""
+    return [part.strip() for part in (text or '').split(',') if part.strip()]
+
+
+def get_recipe_ingredients(db, recipe_id):
+    rows = db.execute(
+        'SELECT name FROM recipe_ingredients WHERE recipe_id = ? ORDER BY id', (recipe_id,)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def set_recipe_ingredients(db, recipe_id, names):
+    """Replace a recipe's ingredient list. The caller commits."""
+    db.execute('DELETE FROM recipe_ingredients WHERE recipe_id = ?', (recipe_id,))
+    db.executemany(
+        'INSERT INTO recipe_ingredients (recipe_id, name, norm_name) VALUES (?, ?, ?)',
+        [(recipe_id, name, normalize_ingredient(name)) for name in names if normalize_ingredient(name)]
+    )
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+class RecipeMatcher:
+    """Scores every recipe by how much of it the pantry covers.
+
+    score = matched / total + EXPIRY_BONUS * (average urgency of the matched
+    pantry items), where urgency goes from 0 (expires in EXPIRY_WINDOW_DAYS or
+    later) to 1 (expires today). Results are cached until the pantry, a recipe
+    or the date changes.
+    """
+
+    EXPIRY_WINDOW_DAYS = 7
+    EXPIRY_BONUS = 0.5
+
+    def __init__(self):
+        self.loaded_on = None
+        self.postings = {}           # norm_name -> set of recipe ids
+        self.recipe_keys = {}        # recipe id -> set of norm_names
+        self.item_keys = {}          # pantry item id -> (keys, expiry)
+        self.pantry = {}             # key -> {item id: expiry date}
+        self.matched = {}            # recipe id -> matched ingredient count
+        self.urgency_sum = {}        # recipe id -> summed urgency of matches
+        self.ranked = None
+
+    def urgency(self, expiry):
+        if expiry is None:
+            return 0.0
+        days_left = (expiry - self.loaded_on).days
+        if days_left < 0:
+            return 0.0
+        return max(0.0, self.EXPIRY_WINDOW_DAYS - days_left) / self.EXPIRY_WINDOW_DAYS
+
+    def key_urgency(self, key):
+        """Urgency of the soonest-expiring pantry item behind key, or None if absent."""
+        items = self.pantry.get(key)
+        if not items:
+            return None
+        return max(self.urgency(expiry) for expiry in items.values())
+
+    # Index maintenance
+
+    def load(self, db):
+        """Build the index and all scores from scratch."""
+        self.loaded_on = date.today()
+        self.postings = {}
+        self.recipe_keys = {}
+        for recipe_id, norm_name in db.execute('SELECT recipe_id, norm_name FROM recipe_ingredients'):
+            self.postings.setdefault(norm_name, set()).add(recipe_id)
+            self.recipe_keys.setdefault(recipe_id, set()).add(norm_name)
+
+        # Everything is rebuilt below, so pending change notes are obsolete
+        db.execute('DELETE FROM pantry_changes')
+        db.commit()
+
+        self.item_keys = {}
+        self.pantry = {}
+        for item_id, name, expiry_date in db.execute('SELECT id, name, expiry_date FROM items'):
+            self._add_item(item_id, name, expiry_date)
+
+        # One pass over the postings of the ingredients in the pantry
+        self.matched = {}
+        self.urgency_sum = {}
+        for key in self.pantry:
+            urgency = self.key_urgency(key)
+            for recipe_id in self.postings.get(key, ()):
+                self.matched[recipe_id] = self.matched.get(recipe_id, 0) + 1
+                self.urgency_sum[recipe_id] = self.urgency_sum.get(recipe_id, 0.0) + urgency
+        self.ranked = None
+
+    def _add_item(self, item_id, name, expiry_date):
+        keys = ingredient_keys(name)
+        expiry = _parse_date(expiry_date)
+        self.item_keys[item_id] = (keys, expiry)
+        for key in keys:
+            self.pantry.setdefault(key, {})[item_id] = expiry
+        return keys
+
+    def _remove_item(self, item_id):
+        keys, _ = self.item_keys.pop(item_id, (set(), None))
+        for key in keys:
+            items = self.pantry.get(key)
+            if items is not None:
+                items.pop(item_id, None)
+                if not items:
+                    del self.pantry[key]
+        return keys
+
+    def _rescore_keys(self, keys, before):
+        """Swap the old contribution of each key for its current one."""
+        for key in keys:
+            old, new = before[key], self.key_urgency(key)
+            if old == new:
+                continue
+            for recipe_id in self.postings.get(key, ()):
+                if old is not None:
+                    self.matched[recipe_id] -= 1
+                    self.urgency_sum[recipe_id] -= old
+                if new is not None:
+                    self.matched[recipe_id] = self.matched.get(recipe_id, 0) + 1
+                    self.urgency_sum[recipe_id] = self.urgency_sum.get(recipe_id, 0.0) + new
+                if self.matched[recipe_id] <= 0:
+                    del self.matched[recipe_id]
+                    del self.urgency_sum[recipe_id]
+            self.ranked = None
+
+    def refresh(self, db):
+        """Apply pantry writes made since the last call."""
+        if self.loaded_on != date.today():
+            self.load(db)
+            return
+
+        changed = [row[0] for row in db.execute('SELECT item_id FROM pantry_changes')]
+        if not changed:
+            return
+        db.execute('DELETE FROM pantry_changes')
+        db.commit()
+
+        placeholders = ','.join('?' * len(changed))
+        rows = {row[0]: row for row in db.execute(
+            f'SELECT id, name, expiry_date FROM items WHERE id IN ({placeholders})', changed)}
+
+        affected = set()
+        for item_id in changed:
+            affected |= self.item_keys.get(item_id, (set(), None))[0]
+            row = rows.get(item_id)
+            if row is not None:
+                affected |= ingredient_keys(row[1])
+        before = {key: self.key_urgency(key) for key in affected}
+
+        for item_id in changed:
+            self._remove_item(item_id)
+            row = rows.get(item_id)
+            if row is not None:
+                self._add_item(*row)
+
+        self._rescore_keys(affected, before)
+
+    def recipe_changed(self, db, recipe_id):
+        """Re-index one recipe after it was added, edited or deleted."""
+        if self.loaded_on is None:
+            return
+        for key in self.recipe_keys.pop(recipe_id, set()):
+            self.postings[key].discard(recipe_id)
+            if not self.postings[key]:
+                del self.postings[key]
+        self.matched.pop(recipe_id, None)
+        self.urgency_sum.pop(recipe_id, None)
+
+        rows = db.execute('SELECT norm_name FROM recipe_ingredients WHERE recipe_id = ?', (recipe_id,))
+        for (key,) in rows:
+            self.postings.setdefault(key, set()).add(recipe_id)
+            self.recipe_keys.setdefault(recipe_id, set()).add(key)
+            urgency = self.key_urgency(key)
+            if urgency is not None:
+                self.matched[recipe_id] = self.matched.get(recipe_id, 0) + 1
+                self.urgency_sum[recipe_id] = self.urgency_sum.get(recipe_id, 0.0) + urgency
+        self.ranked = None
+
+    # Queries
+
+    def best_matches(self, db, limit=20):
+        """Return [{'recipe_id', 'score', 'matched', 'total'}], best first."""
+        if self.loaded_on is None:
+            self.load(db)
+        else:
+            self.refresh(db)
+
+        if self.ranked is None:
+            ranked = []
+            for recipe_id, matched in self.matched.items():
+                total = len(self.recipe_keys[recipe_id])
+                score = matched / total + self.EXPIRY_BONUS * self.urgency_sum[recipe_id] / matched
+                ranked.append((score, matched, total, recipe_id))
+            ranked.sort(key=lambda entry: (-entry[0], -entry[1], entry[3]))
+            self.ranked = ranked
+
+        return [
+            {'recipe_id': recipe_id, 'score': score, 'matched': matched, 'total': total}
+            for score, matched, total, recipe_id in self.ranked[:limit]
+        ]
+
+    def missing_ingredients(self, recipe_id):
+        """Ingredients of a recipe that the pantry doesn't cover."""
+        return sorted(key for key in self.recipe_keys.get(recipe_id, ()) if key not in self.pantry)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Replay a request trace recorded by request_trace.py against a server.
+
+Requests are sent at their recorded offsets divided by --speed, from a pool
+of --workers threads, and a latency/error summary per route is printed at
+the end. Point it at a local copy of the API, never at production: the
+trace contains writes.
+
+The trace is written as responses finish, so it is sorted by start offset
+first (the whole trace is read into memory). Recorded passwords are
+placeholders, so POST /auth/login requests are skipped: they would all
+fail and then trip the login rate limits. With --login USERNAME:PASSWORD
+they are sent as that account instead.
+
+Usage:
+    python3 replay_trace.py traces/api.trace --url http://localhost:5000 --speed 10 --workers 32
+    python3 replay_trace.py traces/api.trace --login whitehouse:secret
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+LOGIN_ROUTE = '/auth/login'
+
+
+def read_trace(path):
+    """Entries in the order the requests started."""
+    with open(path) as trace:
+        entries = [json.loads(line) for line in trace if line.strip()]
+    entries.sort(key=lambda entry: entry['t'])
+    return entries
+
+
+def parse_login(value):
+    username, _, password = value.partition(':')
+    if not username or not password:
+        raise SystemExit(f"Bad --login {value!r}, expected USERNAME:PASSWORD")
+    return {'username': username, 'password': password}
+
+
+def send(base_url, entry, timeout):
+    """Returns (status, seconds); status 0 means the request never got an answer."""
+    url = base_url + urllib.parse.quote(entry['p'])
+    if entry.get('q'):
+        url += '?' + urllib.parse.urlencode(entry['q'])
+    body = None
+    headers = {}
+    if entry.get('b') is not None:
+        body = json.dumps(entry['b']).encode()
+        headers['Content-Type'] = 'application/json'
+    request = urllib.request.Request(url, data=body, method=entry['m'], headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}   # route -> {'latencies': [], 'statuses': {}, 'recorded': []}
+
+    def add(self, entry, status, seconds):
+        route = f"{entry['m']} {entry.get('r') or entry['p']}"
+        with self.lock:
+            stats = self.routes.setdefault(route, {'latencies': [], 'statuses': {}, 'recorded': []})
+            stats['latencies'].append(seconds * 1000)
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['recorded'].append(entry.get('d', 0))
+
+    def report(self, elapsed):
+        total = sum(len(stats['latencies']) for stats in self.routes.values())
+        print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} req/s)\n")
+        print(f"{'route':<52}{'n':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'rec p50':>9}{'4xx':>7}{'5xx':>7}{'fail':>7}")
+        for route, stats in sorted(self.routes.items(), key=lambda item: -len(item[1]['latencies'])):
+            latencies = sorted(stats['latencies'])
+            recorded = sorted(stats['recorded'])
+            statuses = stats['statuses']
+            count = len(latencies)
+            client_errors = sum(n for code, n in statuses.items() if 400 <= code < 500)
+            server_errors = sum(n for code, n in statuses.items() if code >= 500)
+            failures = statuses.get(0, 0)
+            print(f"{route[:51]:<52}{count:>7}"
+                  f"{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.9):>9.1f}"
+                  f"{percentile(latencies, 0.99):>9.1f}{latencies[-1]:>9.1f}{percentile(recorded, 0.5):>9.1f}"
+                  f"{client_errors / count:>7.1%}{server_errors / count:>7.1%}{failures / count:>7.1%}")
+        print("\nLatencies in ms; 'rec p50' is the median recorded in production.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace', help='trace file written by request_trace.py')
+    parser.add_argument('--url', default='http://localhost:5000', help='server to replay against')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed, e.g. 1, 10 or 100')
+    parser.add_argument('--workers', type=int, default=16, help='concurrent requests')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--route', action='append', help='only replay these route rules (repeatable)')
+    parser.add_argument('--login', metavar='USERNAME:PASSWORD',
+                        help='send recorded logins as this account instead of skipping them')
+    args = parser.parse_args()
+    login = parse_login(args.login) if args.login else None
+
+    base_url = args.url.rstrip('/')
+    results = Results()
+    start = time.monotonic()
+    first_offset = None
+    skipped_logins = 0
+
+    def run(entry):
+        status, seconds = send(base_url, entry, args.timeout)
+        results.add(entry, status, seconds)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for entry in read_trace(args.trace):
+            if args.route and entry.get('r') not in args.route:
+                continue
+            if entry['m'] == 'POST' and entry.get('r') == LOGIN_ROUTE:
+                if login is None:
+                    skipped_logins += 1
+                    continue
+                entry = dict(entry, b=dict(entry.get('b') or {}, **login))
+            if first_offset is None:
+                first_offset = entry['t']
+            # Keep the recorded spacing, compressed by --speed
+            delay = (entry['t'] - first_offset) / args.speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, entry)
+
+    results.report(time.monotonic() - start)
+    if skipped_logins:
+        print(f"Skipped {skipped_logins} logins (recorded passwords are placeholders; see --login)")
+
+
+if __name__ == '__main__':
+    main()
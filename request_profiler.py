@@ -0,0 +1,262 @@
+"""
+On-demand profiling for api.py.
+
+RequestProfiler is WSGI middleware that profiles single requests when asked:
+
+- an admin sends X-Profile: cprofile (or sample) together with
+  X-Profile-Token matching PROFILE_CONFIG['token'], or
+- the server was started with PANTRYBOT_PROFILE=cprofile (or sample), in
+  which case requests to PROFILE_CONFIG['routes'] are profiled.
+
+cprofile writes a .prof file (open with snakeviz or python -m pstats) and a
+.txt call tree; sample writes a .folded file for flamegraph.pl / speedscope
+and a .txt call tree. Files go to PROFILE_CONFIG['dir'], keeping the newest
+PROFILE_CONFIG['keep']. The name is returned in X-Profile-File.
+
+With PROFILE_CONFIG['continuous'] a background sampler also looks at the
+request threads a few times a second and counts their stacks; /admin/profile
+returns the hottest ones. When nothing is switched on the middleware is not
+installed at all.
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def folded_stack(frame):
+    """'outer;inner;leaf' for one thread's current stack."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def call_tree(folded_counts, min_share=0.005):
+    """Indented text tree with sample counts from folded stacks."""
+    tree = {}
+    total = sum(folded_counts.values())
+    for stack, count in folded_counts.items():
+        node = tree
+        for label in stack.split(';'):
+            entry = node.setdefault(label, [0, {}])
+            entry[0] += count
+            node = entry[1]
+
+    lines = [f"{total} samples"]
+
+    def walk(node, depth):
+        for label, (count, children) in sorted(node.items(), key=lambda item: -item[1][0]):
+            if total and count / total < min_share:
+                continue
+            lines.append(f"{'  ' * depth}{count:>6} {count / total:6.1%}  {label}")
+            walk(children, depth + 1)
+
+    walk(tree, 0)
+    return '\n'.join(lines) + '\n'
+
+
+class ThreadSampler:
+    """Samples one thread's stack every interval seconds until stopped."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='request-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+        return self.counts
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[folded_stack(frame)] += 1
+
+
+class ContinuousSampler:
+    """Low-rate sampler over all in-flight requests, aggregated by route and stack."""
+
+    def __init__(self, hz, max_stacks):
+        self.interval = 1.0 / hz
+        self.max_stacks = max_stacks
+        self.active = {}            # thread id -> route of the request it is serving
+        self.counts = Counter()
+        self.samples = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name='continuous-sampler', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            active = dict(self.active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, route in active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    key = f"{route};{folded_stack(frame)}"
+                    if key in self.counts or len(self.counts) < self.max_stacks:
+                        self.counts[key] += 1
+                    else:
+                        self.counts[f"{route};(other stacks)"] += 1
+                    self.samples += 1
+
+    def hot_stacks(self, limit):
+        with self.lock:
+            return self.samples, self.counts.most_common(limit)
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.samples = 0
+            self.started = time.time()
+
+
+class RequestProfiler:
+    """WSGI middleware; see the module docstring."""
+
+    MODES = ('cprofile', 'sample')
+
+    def __init__(self, app, profile_config, env_mode=None):
+        self.app = app
+        self.token = profile_config.get('token')
+        self.env_mode = env_mode if env_mode in self.MODES else None
+        self.routes = tuple(profile_config.get('routes') or ())
+        self.directory = profile_config['dir']
+        self.keep = profile_config['keep']
+        self.sample_interval = profile_config['sample_interval_ms'] / 1000.0
+        self.continuous = None
+        if profile_config.get('continuous'):
+            self.continuous = ContinuousSampler(profile_config['continuous_hz'], profile_config['max_stacks'])
+        self.file_lock = threading.Lock()
+        self.sequence = itertools.count(1)  # tells apart profiles of the same millisecond
+
+    def requested_mode(self, environ):
+        mode = environ.get('HTTP_X_PROFILE')
+        if mode:
+            if self.token and environ.get('HTTP_X_PROFILE_TOKEN') == self.token and mode in self.MODES:
+                return mode
+            return None
+        if self.env_mode and (not self.routes or environ.get('PATH_INFO', '').startswith(self.routes)):
+            return self.env_mode
+        return None
+
+    def __call__(self, environ, start_response):
+        thread_id = threading.get_ident()
+        if self.continuous is not None:
+            self.continuous.active[thread_id] = environ.get('PATH_INFO', '')
+        try:
+            mode = self.requested_mode(environ)
+            if mode is None:
+                # Streamed bodies finish after this returns; the continuous
+                # sampler only sees the view function itself
+                return self.app(environ, start_response)
+            return self.profile(mode, environ, start_response, thread_id)
+        finally:
+            if self.continuous is not None:
+                self.continuous.active.pop(thread_id, None)
+
+    def profile(self, mode, environ, start_response, thread_id):
+        name = self.file_name(environ)
+        response = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            response['start'] = (status, headers + [('X-Profile-File', name)], exc_info)
+            return lambda data: None  # the body is returned from the iterable below
+
+        start = time.perf_counter()
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                body = self.run_app(environ, capture_start_response)
+            finally:
+                profiler.disable()
+        else:
+            sampler = ThreadSampler(thread_id, self.sample_interval)
+            sampler.start()
+            try:
+                body = self.run_app(environ, capture_start_response)
+            finally:
+                counts = sampler.stop()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        header = f"{environ['REQUEST_METHOD']} {environ.get('PATH_INFO', '')}?{environ.get('QUERY_STRING', '')} {elapsed_ms:.1f} ms\n"
+        if mode == 'cprofile':
+            self.write_cprofile(name, profiler, header)
+        else:
+            self.write_samples(name, counts, header)
+
+        start_response(*response['start'])
+        return body
+
+    def run_app(self, environ, start_response):
+        result = self.app(environ, start_response)
+        try:
+            return [b''.join(result)]
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    def file_name(self, environ):
+        route = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+        return (f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{next(self.sequence):06d}"
+                f"-{environ['REQUEST_METHOD']}-{route[:60]}")
+
+    def write_cprofile(self, name, profiler, header):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, name)
+        profiler.dump_stats(base + '.prof')
+        text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=text)
+        stats.sort_stats('cumulative').print_stats(60)
+        stats.print_callees(20)
+        with open(base + '.txt', 'w') as out:
+            out.write(header + text.getvalue())
+        self.rotate()
+
+    def write_samples(self, name, counts, header):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, name)
+        with open(base + '.folded', 'w') as out:
+            for stack, count in counts.most_common():
+                out.write(f"{stack} {count}\n")
+        with open(base + '.txt', 'w') as out:
+            out.write(header + call_tree(counts))
+        self.rotate()
+
+    def rotate(self):
+        """Keep the newest self.keep profiles (all files of a request count as one)."""
+        with self.file_lock:
+            names = sorted({os.path.splitext(f)[0] for f in os.listdir(self.directory)})
+            for stale in names[:-self.keep] if len(names) > self.keep else []:
+                for extension in ('.prof', '.txt', '.folded'):
+                    path = os.path.join(self.directory, stale + extension)
+                    if os.path.exists(path):
+                        os.remove(path)
@@ -0,0 +1,151 @@
+"""
+Record API traffic so it can be replayed locally (see replay_trace.py).
+
+TraceRecorder is WSGI middleware around api.py's app. For each request it
+appends one JSON line to the trace file:
+
+    {"t": 12.503, "m": "GET", "r": "/pantry/items", "p": "/pantry/items",
+     "q": {"user_id": "3", "sort": "name"}, "b": null, "s": 200, "d": 4.1}
+
+t is seconds since recording started, r the matched route rule, d the time
+to the last byte in milliseconds. Strings in the query and body that could
+identify someone (item names, usernames, passwords) are replaced by
+pseudonyms of the same length. A value maps to the same pseudonym for the
+whole trace, so replayed traffic repeats and collides like the real thing
+without carrying real data. Ids, dates, sort options and categories are kept.
+Passwords all become 'xxxxxxxx', so recorded logins can't succeed on replay;
+replay_trace.py skips them unless given an account to log in with.
+
+A line is written when its response finishes, so the file is in completion
+order, not in t order; replay_trace.py sorts it before replaying.
+"""
+
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import parse_qsl
+
+from werkzeug.wsgi import ClosingIterator
+
+# Values kept verbatim: they drive routing, sorting and query shape
+KEEP_FIELDS = {
+    'user_id', 'source_user_id', 'target_user_id', 'client_id', 'sort', 'days', 'limit', 'after',
+    'admin', 'since', 'wait', 'items', 'format', 'category', 'type', 'metric', 'checked',
+    'quantity', 'priority', 'expiry_date', 'entry_date', 'is_admin', 'op', 'table', 'op_id',
+}
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}([T ][\d:.]+)?$')
+
+
+def pseudonym(value, salt):
+    """Same input -> same output within one trace, same length, lower case."""
+    digest = hashlib.blake2b((salt + value).encode(), digest_size=16).hexdigest()
+    return (digest * (len(value) // len(digest) + 1))[:len(value)]
+
+
+def anonymize(value, salt, key=None):
+    if isinstance(value, dict):
+        return {k: anonymize(v, salt, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [anonymize(v, salt, key) for v in value]
+    if isinstance(value, str):
+        if key in KEEP_FIELDS or DATE_RE.match(value):
+            return value
+        if key == 'password':
+            return 'x' * 8
+        return pseudonym(value, salt)
+    return value
+
+
+class TraceRecorder:
+    """Wrap a WSGI app and append one line per request to path.
+
+    Writes happen on a background thread; a full queue drops records rather
+    than slowing requests down.
+    """
+
+    def __init__(self, app, flask_app, path, max_body_bytes=65536, queue_size=10000):
+        self.app = app
+        self.url_map = flask_app.url_map
+        self.max_body_bytes = max_body_bytes
+        self.salt = os.urandom(8).hex()
+        self.started = time.monotonic()
+        self.records = queue.Queue(queue_size)
+        self.dropped = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'a', buffering=1 << 16)
+        self.writer = threading.Thread(target=self.write_loop, name='trace-writer', daemon=True)
+        self.writer.start()
+
+    def __call__(self, environ, start_response):
+        start = time.monotonic()
+        body = self.capture_body(environ)
+        status = []
+
+        def capture_start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+            return start_response(status_line, headers, exc_info)
+
+        result = self.app(environ, capture_start_response)
+        # Recorded when the server closes the response, i.e. after the last byte
+        return ClosingIterator(result, lambda: self.record(environ, body, status[0] if status else 0, start))
+
+    def capture_body(self, environ):
+        """Read a small request body and put it back for the app."""
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return None
+        if not length or length > self.max_body_bytes:
+            return None
+        raw = environ['wsgi.input'].read(length)
+        environ['wsgi.input'] = io.BytesIO(raw)
+        if 'json' not in environ.get('CONTENT_TYPE', ''):
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def route(self, environ):
+        try:
+            rule, _ = self.url_map.bind_to_environ(environ).match(return_rule=True)
+            return rule.rule
+        except Exception:
+            return None
+
+    def record(self, environ, body, status, start):
+        query = dict(parse_qsl(environ.get('QUERY_STRING', ''), keep_blank_values=True))
+        entry = {
+            't': round(start - self.started, 4),
+            'm': environ['REQUEST_METHOD'],
+            'r': self.route(environ),
+            'p': anonymize_path(environ.get('PATH_INFO', ''), self.salt),
+            'q': anonymize(query, self.salt),
+            'b': anonymize(body, self.salt) if body is not None else None,
+            's': status,
+            'd': round((time.monotonic() - start) * 1000, 2),
+        }
+        try:
+            self.records.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self):
+        while True:
+            entry = self.records.get()
+            self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            if self.records.empty():
+                self.file.flush()
+
+
+def anonymize_path(path, salt):
+    """/grocery/suggestions/<name>/<category>/3 carries names in the path."""
+    if not path.startswith('/grocery/suggestions/'):
+        return path
+    parts = path.split('/')
+    return '/'.join(parts[:3] + [pseudonym(part, salt) if not part.isdigit() else part for part in parts[3:]])
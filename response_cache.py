@@ -0,0 +1,138 @@
+"""
+In-process cache of serialized GET responses.
+
+Every phone and kiosk in a household polls the same few lists, and the lists
+change far less often than they are read. Responses are kept as the bytes
+that went out, keyed by route, user and query string, so a hit costs a dict
+lookup: no SQLite and no JSON encoding.
+
+Each user has a generation counter that the write handlers bump. An entry
+remembers the generation it was computed under and is only served while
+that is still the user's generation, so a write is never followed by a stale
+read. The generation is read before the response is computed, which also
+keeps a write that lands mid-computation from being hidden. Entries are
+evicted least recently used first once their bytes pass max_bytes.
+
+The counters live in this process, which is how api.py runs (one threaded
+Flask process). A job that writes the database behind the API's back, such
+as retention.py, touches the epoch file (touch_epoch) after each commit; the
+API checks its mtime on cached reads and drops every user's entries when it
+changes. split_shards.py still needs an API restart.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Rough bytes per entry besides the body (key tuple, headers, dict slot)
+ENTRY_OVERHEAD = 256
+
+
+class ResponseCache:
+    """LRU of (status, headers, body) per (route, user, params)."""
+
+    def __init__(self, max_bytes, max_entry_bytes):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.epoch = 0
+        self.size = 0
+        self.hits = self.misses = self.stale = self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(route, user_id, params):
+        """params is a list of (name, value) pairs; their order doesn't matter."""
+        return route, str(user_id), tuple(sorted(params))
+
+    def generation(self, user_id):
+        with self.lock:
+            return self.epoch, self.generations.get(str(user_id), 0)
+
+    def _current(self, user_id):
+        return self.epoch, self.generations.get(user_id, 0)
+
+    def bump(self, user_id):
+        """Call after writing user_id's data; their cached responses go stale."""
+        if user_id is None:
+            return
+        with self.lock:
+            user_id = str(user_id)
+            self.generations[user_id] = self.generations.get(user_id, 0) + 1
+
+    def bump_all(self):
+        """Every user's cached responses go stale, e.g. after an outside write."""
+        with self.lock:
+            self.epoch += 1
+            self.entries.clear()
+            self.size = 0
+
+    def get(self, key):
+        """(status, headers, body) if cached for the user's current generation."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != self._current(key[1]):
+                self.drop(key)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def put(self, key, generation, status, headers, body):
+        """Store a response computed while the user was at generation."""
+        if len(body) > self.max_entry_bytes:
+            return
+        with self.lock:
+            if generation != self._current(key[1]):
+                return  # written to since; the next read recomputes anyway
+            if key in self.entries:
+                self.drop(key)
+            self.entries[key] = (generation, status, headers, body)
+            self.size += len(body) + ENTRY_OVERHEAD
+            while self.size > self.max_bytes and self.entries:
+                self.drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def drop(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry[3]) + ENTRY_OVERHEAD
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0,
+            }
+
+
+def touch_epoch(path):
+    """Tell running APIs that the database changed behind their back."""
+    with open(path, 'w') as f:
+        f.write(str(time.time_ns()))
+
+
+def read_epoch(path):
+    """Modification time of the epoch file, or None if there is none."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Nightly restock predictions for /grocery/predicted.
+
+For every user and item, the dates it went on the grocery list (the
+grocery_events log plus item_history.last_used) give the purchase intervals.
+The next restock date is the last add plus a recency-weighted mean of those
+intervals. Users are read a chunk at a time into flat NumPy arrays, sorted
+by SQLite, and every prediction in the chunk comes out of one set of array
+operations, not a Python loop per item.
+
+Run it from cron once a night (needs numpy):
+    python3 restock_job.py
+    python3 restock_job.py --db pantrybot.db --now 2026-10-19
+"""
+
+import argparse
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+import api
+from config import RESTOCK_CONFIG, SHARD_CONFIG
+
+# Julian day number (SQLite's julianday()) of midnight before date ordinal 0
+ORDINAL_JD = 1721424.5
+
+# One row per list add, sorted per user and item; the item key is its rank
+ADDS_SQL = '''
+    WITH adds AS (
+        SELECT user_id, name, julianday(added_at) as day FROM grocery_events
+        WHERE user_id BETWEEN ? AND ?
+        UNION ALL
+        SELECT user_id, name, julianday(last_used) FROM item_history
+        WHERE user_id BETWEEN ? AND ? AND last_used IS NOT NULL
+    )
+    SELECT DENSE_RANK() OVER (ORDER BY user_id, name COLLATE NOCASE) - 1, day
+    FROM adds WHERE day IS NOT NULL
+    ORDER BY user_id, name COLLATE NOCASE, day
+'''
+
+# The items in the same order, with the spelling and category of the latest add
+ITEMS_SQL = '''
+    WITH adds AS (
+        SELECT user_id, name, category_id, julianday(added_at) as day FROM grocery_events
+        WHERE user_id BETWEEN ? AND ?
+        UNION ALL
+        SELECT user_id, name, category_id, julianday(last_used) FROM item_history
+        WHERE user_id BETWEEN ? AND ? AND last_used IS NOT NULL
+    )
+    SELECT user_id, name, category_id, MAX(day)
+    FROM adds WHERE day IS NOT NULL
+    GROUP BY user_id, name COLLATE NOCASE
+    ORDER BY user_id, name COLLATE NOCASE
+'''
+
+
+def load_adds(conn, first_user, last_user):
+    """(item key array, julian day array) for the users in the range."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(ADDS_SQL, (first_user, last_user, first_user, last_user))
+    adds = np.fromiter(cursor, dtype=[('item', np.int64), ('day', np.float64)])
+    return adds['item'], adds['day']
+
+
+def predict(items, days, today, config=RESTOCK_CONFIG):
+    """Predictions for sorted (item, day) arrays.
+
+    Returns (item keys, last add, interval, next date, interval count) arrays
+    for the items with enough history whose prediction isn't long stale.
+    """
+    if len(items) < 2:
+        empty = np.array([], dtype=np.int64)
+        return empty, np.array([]), np.array([]), np.array([]), empty
+    item_count = int(items[-1]) + 1
+
+    # Adds of the same item on the same trip (the grocery route also stamps
+    # item_history) collapse into the first of them
+    gaps = np.diff(days)
+    same_item = items[1:] == items[:-1]
+    interval_mask = same_item & (gaps >= config['min_gap_days'])
+    interval_items = items[1:][interval_mask]
+    intervals = np.minimum(gaps[interval_mask], config['max_interval_days'])
+
+    # Weight each interval by how many intervals of its item come after it
+    counts = np.bincount(interval_items, minlength=item_count)
+    ends = np.cumsum(counts)
+    steps_back = ends[interval_items] - 1 - np.arange(len(interval_items))
+    weights = config['recency_weight'] ** steps_back
+    weighted = np.bincount(interval_items, weights=weights * intervals, minlength=item_count)
+    weight_sums = np.bincount(interval_items, weights=weights, minlength=item_count)
+
+    last_index = np.flatnonzero(np.append(items[1:] != items[:-1], True))
+    last_day = np.full(item_count, np.nan)
+    last_day[items[last_index]] = days[last_index]
+
+    keep = counts >= config['min_intervals']
+    interval = np.divide(weighted, weight_sums, out=np.zeros(item_count), where=weight_sums > 0)
+    next_day = last_day + interval
+    # Nothing bought for several intervals: the household stopped buying it
+    keep &= next_day + interval * (config['stale_intervals'] - 1) >= today
+    keys = np.flatnonzero(keep)
+    return keys, last_day[keys], interval[keys], next_day[keys], counts[keys]
+
+
+def run_database(conn, today, config=RESTOCK_CONFIG):
+    """Recompute restock_predictions in one database; returns (users, predictions)."""
+    bounds = conn.execute('''
+        SELECT MIN(user_id), MAX(user_id) FROM (
+            SELECT user_id FROM grocery_events UNION ALL SELECT user_id FROM item_history)
+    ''').fetchone()
+    if bounds[0] is None:
+        conn.execute('DELETE FROM restock_predictions')
+        conn.commit()
+        return 0, 0
+
+    users = predictions = 0
+    step = config['users_per_chunk']
+    for first_user in range(bounds[0], bounds[1] + 1, step):
+        last_user = first_user + step - 1
+        items, days = load_adds(conn, first_user, last_user)
+        keys, last_day, interval, next_day, counts = predict(items, days, today, config)
+        item_rows = conn.execute(ITEMS_SQL, (first_user, last_user, first_user, last_user)).fetchall()
+
+        rows = [(*item_rows[key][:3], last, round(days_between, 2), next_, count)
+                for key, last, days_between, next_, count in zip(keys.tolist(), last_day.tolist(),
+                                                                 interval.tolist(), next_day.tolist(),
+                                                                 counts.tolist())]
+        with conn:
+            conn.execute('DELETE FROM restock_predictions WHERE user_id BETWEEN ? AND ?', (first_user, last_user))
+            conn.executemany('''
+                INSERT OR REPLACE INTO restock_predictions
+                    (user_id, name, category_id, last_added, interval_days, next_date, intervals)
+                VALUES (?, ?, ?, date(?), ?, date(?), ?)
+            ''', rows)
+        users += len({row[0] for row in item_rows})
+        predictions += len(rows)
+    return users, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=api.DB_PATH, help='catalog database')
+    parser.add_argument('--now', help='predict as of this date (YYYY-MM-DD), default today')
+    args = parser.parse_args()
+
+    api.DB_PATH = args.db
+    day = datetime.strptime(args.now, '%Y-%m-%d').date() if args.now else date.today()
+    today = day.toordinal() + ORDINAL_JD
+
+    start = time.perf_counter()
+    # One database at a time keeps memory to one chunk on a Pi
+    if SHARD_CONFIG['enabled']:
+        connections = (api.open_shard(path) for path in api.all_shard_paths())
+    else:
+        connections = iter([api.get_db()])
+    for conn in connections:
+        try:
+            users, predictions = run_database(conn, today)
+        finally:
+            conn.close()
+        print(f"{users} users, {predictions} predictions")
+    print(f"Restock predictions done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
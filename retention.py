@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Nightly retention: archive old rows, prune stale history, give space back.
+
+- Checked grocery items untouched for checked_grocery_days, and grocery and
+  pantry events older than their limits, are moved to a cold archive file
+  next to each database (pantrybot.db -> pantrybot.archive.db). Label ids
+  are stored decoded there, so the archive reads on its own. Analytics keep
+  working after pantry events are archived, since /analytics reads the
+  rollups.
+- item_history entries are scored by frequency halved every
+  history_half_life_days since last use. Names scoring below
+  history_min_score are deleted: a name typed once goes after two half
+  lives, one used every week for a year lasts years.
+- Databases use auto_vacuum=INCREMENTAL (converted with one VACUUM the first
+  time). Freed pages are returned to the file system a few at a time with a
+  pause between steps, so the API's writers get in between.
+
+Rows are moved in batches, one short transaction each. A run that stops
+half way is finished by the next one. After every batch the response cache
+epoch file is touched, so a running API stops serving the removed rows.
+
+Run it from cron once a night:
+    python3 retention.py
+    python3 retention.py --db pantrybot.db --dry-run
+"""
+
+import argparse
+import math
+import os
+import time
+
+import api
+from config import RESPONSE_CACHE_CONFIG, RETENTION_CONFIG, SHARD_CONFIG
+from response_cache import touch_epoch
+
+# (table, config key of the age limit, rows that may go once older than it)
+ARCHIVE_POLICIES = [
+    ('grocery_items', 'checked_grocery_days', 'checked = 1 AND julianday(COALESCE(updated_at, created_at)) < ?'),
+    ('grocery_events', 'grocery_event_days', 'julianday(added_at) < ?'),
+    ('pantry_events', 'pantry_event_days', 'julianday(created_at) < ?'),
+]
+
+
+def archive_path(db_path, config=RETENTION_CONFIG):
+    return os.path.splitext(db_path)[0] + config['archive_suffix']
+
+
+def decoded_columns(conn, table):
+    """Select list of table with its label ids turned back into text."""
+    labelled = {row['from'] for row in conn.execute(f'PRAGMA foreign_key_list({table})') if row['table'] == 'labels'}
+    return [f'(SELECT value FROM labels WHERE id = {column}) AS {column[:-3]}' if column in labelled else column
+            for column in (row['name'] for row in conn.execute(f'PRAGMA table_info({table})'))]
+
+
+def archive_table(conn, table, where, params, config=RETENTION_CONFIG, dry_run=False):
+    """Move the rows of table matching where into archive.<table>; returns the count."""
+    columns = decoded_columns(conn, table)
+    if dry_run:
+        return conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {where}', params).fetchone()[0]
+
+    conn.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS "
+                 f"SELECT {', '.join(columns)}, CURRENT_TIMESTAMP AS archived_at FROM main.{table} WHERE 0")
+    conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS archive.{table}_id ON {table} (id)')
+    conn.commit()
+
+    moved = 0
+    while True:
+        ids = [row[0] for row in conn.execute(f'SELECT id FROM main.{table} WHERE {where} LIMIT ?',
+                                              (*params, config['batch_rows']))]
+        if not ids:
+            return moved
+        placeholders = ','.join('?' * len(ids))
+        # INSERT OR IGNORE: rows archived by a run that died before the delete
+        conn.execute(f"INSERT OR IGNORE INTO archive.{table} SELECT {', '.join(columns)}, CURRENT_TIMESTAMP "
+                     f"FROM main.{table} WHERE id IN ({placeholders})", ids)
+        conn.execute(f'DELETE FROM main.{table} WHERE id IN ({placeholders})', ids)
+        conn.commit()
+        touch_epoch(RESPONSE_CACHE_CONFIG['epoch_path'])
+        moved += len(ids)
+
+
+def prune_history(conn, config=RETENTION_CONFIG, dry_run=False):
+    """Delete item_history names whose decayed use count fell below the minimum."""
+    # frequency * 0.5 ** (age / half_life) < min_score  <=>  age > half_life * log2(frequency / min_score)
+    half_life, min_score = config['history_half_life_days'], config['history_min_score']
+    conn.create_function('history_keep_days', 1,
+                         lambda frequency: half_life * math.log2(max(frequency or 1, 1) / min_score),
+                         deterministic=True)
+    where = "julianday('now') - julianday(last_used) > history_keep_days(frequency)"
+    if dry_run:
+        return conn.execute(f'SELECT COUNT(*) FROM item_history WHERE {where}').fetchone()[0]
+    pruned = conn.execute(f'DELETE FROM item_history WHERE {where}').rowcount
+    conn.commit()
+    if pruned:
+        touch_epoch(RESPONSE_CACHE_CONFIG['epoch_path'])
+    return pruned
+
+
+def ensure_incremental_vacuum(conn):
+    """Switch a database to auto_vacuum=INCREMENTAL; needs one full VACUUM."""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    conn.commit()
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+
+def reclaim_space(conn, config=RETENTION_CONFIG):
+    """Give free pages back in small steps; returns the pages freed."""
+    freed = 0
+    while True:
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free_pages:
+            return freed
+        step = min(free_pages, config['vacuum_pages_per_step'])
+        # The pragma frees one page per step of the statement, so read it all
+        conn.execute(f'PRAGMA incremental_vacuum({step})').fetchall()
+        conn.commit()
+        freed += step
+        time.sleep(config['vacuum_pause_seconds'])
+
+
+def run_database(conn, path, config=RETENTION_CONFIG, dry_run=False):
+    """Apply every policy to one database; returns {policy: rows}."""
+    results = {}
+    if not dry_run and ensure_incremental_vacuum(conn):
+        print(f"{path}: switched to auto_vacuum=INCREMENTAL")
+
+    data_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'item_history' in data_tables:
+        conn.execute('ATTACH DATABASE ? AS archive', (archive_path(path, config),))
+        try:
+            for table, key, where in ARCHIVE_POLICIES:
+                cutoff = conn.execute("SELECT julianday('now', ?)", (f"-{config[key]} days",)).fetchone()[0]
+                results[f'archived {table}'] = archive_table(conn, table, where, (cutoff,), config, dry_run)
+        finally:
+            conn.commit()
+            conn.execute('DETACH DATABASE archive')
+        results['pruned item_history'] = prune_history(conn, config, dry_run)
+
+    if dry_run:
+        results['free pages'] = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    else:
+        results['pages freed'] = reclaim_space(conn, config)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=api.DB_PATH, help='catalog database')
+    parser.add_argument('--dry-run', action='store_true', help='count what would go, change nothing')
+    args = parser.parse_args()
+
+    api.DB_PATH = args.db
+    start = time.perf_counter()
+    # The catalog holds the users (and all data when not sharded)
+    paths = [args.db] + (api.all_shard_paths() if SHARD_CONFIG['enabled'] else [])
+    for path in paths:
+        conn = api.get_db() if path == args.db else api.open_shard(path)
+        try:
+            results = run_database(conn, path, dry_run=args.dry_run)
+        finally:
+            conn.close()
+        print(f"{path}: " + ', '.join(f"{count} {name}" for name, count in results.items()))
+    print(f"Retention done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Coalescing of identical concurrent reads.
+
+When a household's phones all come back at once they send the same GETs
+within a few milliseconds. SingleFlight lets the first request with a given
+key (the leader) do the work while the identical requests that arrive
+meanwhile wait for it and take its result. A finished result is also handed
+to identical requests for window seconds afterwards, which catches
+stragglers that arrive just after the leader finished.
+
+The key decides what counts as identical; api.py uses route, user, query
+string and the user's write generation, so a read never joins work that
+started before the user's last write.
+"""
+
+import threading
+import time
+
+
+class Call:
+    """One computation that several callers may be waiting on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.finished = None
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Finished calls kept for the window are swept once there are this many
+    MAX_CALLS = 1000
+
+    def __init__(self, window=0.0, max_wait=10.0):
+        self.window = window
+        self.max_wait = max_wait
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.leaders = self.joined = self.timeouts = 0
+
+    def do(self, key, fn):
+        """fn() once for all concurrent callers with the same key.
+
+        Returns (result, shared); shared is True when the result came from
+        another caller's run. An exception raised by the leader is raised in
+        every caller that shared the run. A caller that waits longer than
+        max_wait gives up and runs fn() itself.
+        """
+        now = time.monotonic()
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None and call.finished is not None and now - call.finished > self.window:
+                del self.calls[key]
+                call = None
+            if call is None:
+                call = self.calls[key] = Call()
+                self.leaders += 1
+                leader = True
+            else:
+                self.joined += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(self.max_wait):
+                with self.lock:
+                    self.timeouts += 1
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                call.finished = time.monotonic()
+                # Errors are not kept for the window; the next caller retries
+                if (call.error is not None or self.window <= 0) and self.calls.get(key) is call:
+                    del self.calls[key]
+                elif len(self.calls) > self.MAX_CALLS:
+                    self.prune(call.finished)
+            call.done.set()
+        return call.result, False
+
+    def prune(self, now):
+        for key in [key for key, call in self.calls.items()
+                    if call.finished is not None and now - call.finished > self.window]:
+            del self.calls[key]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': sum(1 for call in self.calls.values() if call.finished is None),
+                'leaders': self.leaders,
+                'joined': self.joined,
+                'timeouts': self.timeouts,
+            }
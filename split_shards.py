@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Split a monolithic pantrybot.db into one database per household.
+
+The source file becomes the catalog: it keeps the users table and gets a
+shard_map saying which household file each user's data lives in. Rows keep
+their ids and the sync log keeps its revisions, so kiosks carry on pulling
+from where they were.
+
+Usage:
+    python3 split_shards.py pantrybot.db --household 2=smith --household 3=smith
+    python3 split_shards.py pantrybot.db --purge
+
+Users not named with --household get a household of their own. Afterwards set
+SHARD_CONFIG['enabled'] = True in config.py and restart the API.
+"""
+
+import argparse
+import os
+import sqlite3
+
+import api
+from config import SHARD_CONFIG
+
+DATA_TABLES = ('grocery_items', 'items', 'item_history', 'grocery_events', 'restock_predictions',
+               'pantry_events', 'pantry_rollups', 'push_outbox')
+
+# Filled by triggers while the tables above are copied; the source rows replace them
+LOG_TABLES = ('grocery_events', 'pantry_events', 'pantry_rollups')
+
+
+def parse_households(values):
+    households = {}
+    for value in values:
+        user_id, _, household = value.partition('=')
+        if not user_id.isdigit() or not household:
+            raise SystemExit(f"Bad --household {value!r}, expected USER_ID=NAME")
+        households[int(user_id)] = household
+    return households
+
+
+def table_columns(db, table, schema='main'):
+    return [row[1] for row in db.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def copy_household(source_path, path, user_ids):
+    """Copy the data of user_ids from the monolith into the shard at path."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    shard = api.connect_db(path)
+    api.init_data_schema(shard)
+    shard.commit()
+
+    shard.execute('ATTACH DATABASE ? AS src', (source_path,))
+    placeholders = ','.join('?' * len(user_ids))
+    copied = {}
+    with shard:
+        # Label ids differ between databases; copy the values and translate
+        shard.execute('INSERT OR IGNORE INTO labels (value) SELECT value FROM src.labels')
+        for table in DATA_TABLES:
+            columns = table_columns(shard, table)
+            labelled = {row['from'] for row in shard.execute(f'PRAGMA foreign_key_list({table})')
+                        if row['table'] == 'labels'}
+            if table in LOG_TABLES:
+                shard.execute(f'DELETE FROM {table} WHERE user_id IN ({placeholders})', user_ids)
+            sources = [f'(SELECT l.id FROM labels l JOIN src.labels s ON s.value = l.value WHERE s.id = t.{column})'
+                       if column in labelled else f't.{column}' for column in columns]
+            cursor = shard.execute(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                f"SELECT {', '.join(sources)} FROM src.{table} t WHERE user_id IN ({placeholders})", user_ids)
+            copied[table] = cursor.rowcount
+
+        # Notification ids carry on from the monolith's, so the app's
+        # /notifications?after= cursor from before the split still sees new ones
+        source_seq = shard.execute("SELECT MAX(seq) FROM src.sqlite_sequence WHERE name = 'push_outbox'").fetchone()[0]
+        if source_seq:
+            shard.execute("DELETE FROM sqlite_sequence WHERE name = 'push_outbox' AND seq < ?", (source_seq,))
+            shard.execute('''
+                INSERT INTO sqlite_sequence (name, seq) SELECT 'push_outbox', ?
+                WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'push_outbox')
+            ''', (source_seq,))
+
+        # The copies above fired the sync triggers; replace those entries with
+        # the original log so revisions match what kiosks have already seen
+        shard.execute('DELETE FROM sync_log')
+        shard.execute(f'''
+            INSERT INTO sync_log (rev, user_id, table_name, row_id, op)
+            SELECT rev, user_id, table_name, row_id, op FROM src.sync_log
+            WHERE user_id IN ({placeholders})
+        ''', user_ids)
+        shard.execute('''
+            INSERT OR REPLACE INTO sync_origins (client_id, table_name, local_id, row_id)
+            SELECT o.client_id, o.table_name, o.local_id, o.row_id FROM src.sync_origins o
+            WHERE EXISTS (SELECT 1 FROM sync_log l WHERE l.table_name = o.table_name AND l.row_id = o.row_id)
+        ''')
+    shard.execute('DETACH DATABASE src')
+    shard.close()
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', default=api.DB_PATH, help='monolithic database (becomes the catalog)')
+    parser.add_argument('--household', action='append', default=[], metavar='USER_ID=NAME',
+                        help='put USER_ID in household NAME (repeatable)')
+    parser.add_argument('--shard-dir', default=SHARD_CONFIG['shard_dir'])
+    parser.add_argument('--purge', action='store_true',
+                        help='delete the copied data from the catalog and VACUUM it')
+    args = parser.parse_args()
+
+    SHARD_CONFIG['shard_dir'] = args.shard_dir
+    households = parse_households(args.household)
+
+    catalog = api.connect_db(args.source)
+    # Bring an old monolith up to the current schema before copying columns
+    api.init_catalog_schema(catalog)
+    api.init_data_schema(catalog)
+    catalog.commit()
+
+    user_ids = set()
+    for table in ('users',) + DATA_TABLES:
+        column = 'id' if table == 'users' else 'user_id'
+        user_ids |= {row[0] for row in catalog.execute(f'SELECT DISTINCT {column} FROM {table}')
+                     if row[0] is not None}
+
+    members = {}
+    for user_id in sorted(user_ids):
+        household = households.get(user_id, str(user_id))
+        members.setdefault(household, []).append(user_id)
+        catalog.execute('INSERT OR REPLACE INTO shard_map (user_id, household) VALUES (?, ?)',
+                        (user_id, household))
+    catalog.commit()
+
+    for household, ids in sorted(members.items()):
+        path = api.shard_path(household)
+        copied = copy_household(args.source, path, ids)
+        print(f"{path}: users {ids}, " + ', '.join(f"{count} {table}" for table, count in copied.items()))
+
+    if args.purge:
+        for table in DATA_TABLES + ('sync_log', 'sync_origins'):
+            catalog.execute(f'DELETE FROM {table}')
+        catalog.commit()
+        catalog.execute('VACUUM')
+        print(f"Purged data tables from {args.source}")
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Fixtures for testing api.py without a server or a database file.
+
+Going through get_db() on a new database creates the whole schema and hashes
+the passwords of the seeded admin and whitehouse accounts at full PBKDF2
+strength, which takes far longer than any test. Here that is done once per
+session, with TEST_HASH_ROUNDS, into a template database kept in memory.
+Every test gets its own copy of the template, made with the SQLite backup
+API into a named in-memory database (the memdb VFS, so the API's own
+connections see it too) and pointed to by api.DB_PATH. Copies are private to
+the test and to the worker process, so tests can run in parallel (pytest -n).
+
+Per-route fixtures below create what a route needs to have something to
+return: grocery and pantry items, history, predictions, notifications, a
+barcode catalog.
+"""
+
+import itertools
+from datetime import date, timedelta
+
+import pytest
+
+import api
+import barcode_catalog
+from config import (BARCODE_CONFIG, RESPONSE_CACHE_CONFIG, SECURITY_CONFIG, SHARD_CONFIG, SINGLEFLIGHT_CONFIG,
+                    NOTIFY_CONFIG)
+from expiry_scheduler import ExpiryScheduler
+from login_guard import LoginAdmission
+from response_cache import ResponseCache
+from singleflight import SingleFlight
+
+# PBKDF2 rounds for every password hashed during the tests
+TEST_HASH_ROUNDS = 1
+
+ADMIN = {'username': 'admin', 'password': 'TheReal360'}
+USER = {'username': 'whitehouse', 'password': 'Adnoc2003'}
+
+TEMPLATE_URI = 'file:/pantrybot-template?vfs=memdb'
+
+_copies = itertools.count(1)
+
+
+def days_from_now(days):
+    return (date.today() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+@pytest.fixture(scope='session')
+def template_db():
+    """Connection holding the seeded template database open for the session."""
+    with pytest.MonkeyPatch.context() as patch:
+        # Kept low for the whole session, or every login would rehash at full strength
+        patch.setitem(SECURITY_CONFIG, 'password_salt_rounds', TEST_HASH_ROUNDS)
+        patch.setitem(SHARD_CONFIG, 'enabled', False)
+        patch.setattr(api, 'DB_PATH', TEMPLATE_URI)
+        # An in-memory database lives as long as a connection to it is open
+        conn = api.connect_db(TEMPLATE_URI)
+        api.get_db().close()
+        yield conn
+        conn.close()
+
+
+@pytest.fixture
+def db(template_db, monkeypatch, tmp_path):
+    """This test's own copy of the template; api.DB_PATH points at it."""
+    uri = f'file:/pantrybot-test-{next(_copies)}?vfs=memdb'
+    conn = api.connect_db(uri)
+    template_db.backup(conn)
+    monkeypatch.setattr(api, 'DB_PATH', uri)
+    api._schema_checked.add(uri)
+
+    # Process-wide state of the API that would carry over from test to test
+    monkeypatch.setattr(api, 'response_cache', ResponseCache(RESPONSE_CACHE_CONFIG['max_bytes'],
+                                                             RESPONSE_CACHE_CONFIG['max_entry_bytes']))
+    monkeypatch.setattr(api, 'request_flight', SingleFlight(SINGLEFLIGHT_CONFIG['window_ms'] / 1000.0,
+                                                            SINGLEFLIGHT_CONFIG['max_wait_seconds']))
+    monkeypatch.setattr(api, 'login_admission', LoginAdmission(
+        SECURITY_CONFIG['login_ip_per_minute'], SECURITY_CONFIG['login_ip_burst'],
+        SECURITY_CONFIG['login_user_per_minute'], SECURITY_CONFIG['login_user_burst']))
+    monkeypatch.setitem(RESPONSE_CACHE_CONFIG, 'epoch_path', str(tmp_path / 'cache.epoch'))
+    monkeypatch.setattr(api, '_seen_cache_epoch', None)
+    monkeypatch.setattr(api, '_overview_cache', {})
+    monkeypatch.setattr(api, '_barcode_catalog', None)
+    # The scheduler thread would outlive this database; notification tests
+    # deliver through api.deliver_notifications instead
+    scheduler = ExpiryScheduler(api.load_user_expiries, api.load_all_expiries, api.deliver_notifications,
+                                thresholds=NOTIFY_CONFIG['thresholds_days'], notify_hour=NOTIFY_CONFIG['notify_hour'])
+    monkeypatch.setattr(scheduler, 'start', lambda: None)
+    monkeypatch.setattr(api, 'expiry_scheduler', scheduler)
+
+    yield conn
+    api._schema_checked.discard(uri)
+    conn.close()
+
+
+@pytest.fixture
+def client(db):
+    return api.app.test_client()
+
+
+# Accounts
+
+@pytest.fixture
+def admin_id(db):
+    return db.execute('SELECT id FROM users WHERE username = ?', (ADMIN['username'],)).fetchone()[0]
+
+
+@pytest.fixture
+def user_id(db):
+    return db.execute('SELECT id FROM users WHERE username = ?', (USER['username'],)).fetchone()[0]
+
+
+@pytest.fixture
+def other_user_id(client):
+    response = client.post('/users', json={'username': 'neighbour', 'password': 'secret'})
+    assert response.status_code == 200
+    return response.json['id']
+
+
+# Grocery list
+
+@pytest.fixture
+def grocery_item(client, user_id):
+    """An unchecked grocery item (which also puts it in the user's history)."""
+    response = client.post('/grocery/items', json={
+        'user_id': user_id, 'name': 'Milk', 'category': 'Dairy', 'quantity': 2,
+        'metric': 'Litre', 'amount_per_item': '1'})
+    assert response.status_code == 200
+    return response.json['item']
+
+
+@pytest.fixture
+def checked_grocery_item(client, user_id):
+    response = client.post('/grocery/items', json={
+        'user_id': user_id, 'name': 'Carrots', 'category': 'Vegetables', 'quantity': 3})
+    item = response.json['item']
+    client.put(f"/grocery/items/{item['id']}", json={
+        'user_id': user_id, 'name': 'Carrots', 'category': 'Vegetables', 'quantity': 3, 'checked': 1})
+    return item
+
+
+@pytest.fixture
+def prediction(db, user_id):
+    """A restock prediction due tomorrow, as restock_job.py writes them."""
+    db.execute('''
+        INSERT INTO restock_predictions (user_id, name, category_id, last_added, interval_days, next_date, intervals)
+        VALUES (?, 'Eggs', ?, ?, 7, ?, 4)
+    ''', (user_id, api.label_id(db, 'Dairy'), days_from_now(-6), days_from_now(1)))
+    db.commit()
+    return 'Eggs'
+
+
+# Pantry
+
+@pytest.fixture
+def pantry_item(client, user_id):
+    response = client.post('/pantry/items', json={
+        'user_id': user_id, 'name': 'Rice', 'type': 'Grains', 'quantity': 2,
+        'expiry_date': days_from_now(300), 'metric': 'Kg', 'amount_per_item': '1'})
+    assert response.status_code == 201
+    return response.json['id']
+
+
+@pytest.fixture
+def expiring_item(client, user_id):
+    response = client.post('/pantry/items', json={
+        'user_id': user_id, 'name': 'Yogurt', 'type': 'Dairy', 'quantity': 1, 'expiry_date': days_from_now(1)})
+    assert response.status_code == 201
+    return response.json['id']
+
+
+@pytest.fixture
+def notification(user_id, expiring_item):
+    """An expiry notice in the user's outbox, as the scheduler delivers it."""
+    api.deliver_notifications(user_id, [{
+        'item_id': expiring_item, 'name': 'Yogurt', 'type': 'Dairy', 'expiry_date': days_from_now(1),
+        'threshold': 1, 'days_until_expiry': 1}])
+    return expiring_item
+
+
+# Barcode catalog
+
+@pytest.fixture
+def barcode_index(tmp_path, monkeypatch):
+    dump = tmp_path / 'products.csv'
+    dump.write_text('barcode,name,category,shelf_life_days\n'
+                    '3017620422003,Hazelnut spread,Sweets,365\n'
+                    '0076808280463,Spaghetti,Grains,\n')
+    index = tmp_path / 'barcodes.idx'
+    barcode_catalog.build(str(dump), str(index))
+    monkeypatch.setitem(BARCODE_CONFIG, 'catalog_path', str(index))
+    return str(index)
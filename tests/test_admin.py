@@ -0,0 +1,47 @@
+import api
+
+
+def test_overview(client, user_id, grocery_item, checked_grocery_item, expiring_item):
+    response = client.get('/admin/overview?items=5')
+    user = next(user for user in response.json['users'] if user['id'] == user_id)
+    assert (user['grocery_count'], user['checked_count'], user['pantry_count'], user['expiring_count']) == (2, 1, 1, 1)
+    assert sorted(item['name'] for item in user['items']) == ['Carrots', 'Milk']
+    assert response.headers['ETag']
+
+
+def test_overview_not_modified(client):
+    etag = client.get('/admin/overview').headers['ETag']
+    assert client.get('/admin/overview', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_cache_stats_and_clear(client, user_id, grocery_item):
+    client.get(f'/grocery/items?user_id={user_id}')
+    client.get(f'/grocery/items?user_id={user_id}')
+    stats = client.get('/admin/cache').json
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert client.delete('/admin/cache').json == {'success': True}
+    assert client.get(f'/grocery/items?user_id={user_id}').headers['X-Cache'] == 'MISS'
+
+
+def test_profile_off(client):
+    if api.request_profiler is None:
+        assert client.get('/admin/profile').status_code == 404
+    else:
+        assert client.get('/admin/profile').status_code in (403, 404)
+
+
+def test_version(client):
+    assert client.get('/version').json == {'version': api.APP_VERSION}
+    assert client.get('/api/version').json == {'version': api.APP_VERSION}
+
+
+def test_apk_missing(client):
+    assert client.get('/api/apk').status_code == 404
+
+
+def test_wire_formats(client, user_id, grocery_item):
+    columns = client.get(f'/grocery/items?user_id={user_id}&layout=columns').json
+    assert columns['count'] == 1
+    assert columns['values'][columns['columns'].index('name')] == ['Milk']
+    response = client.get(f'/grocery/items?user_id={user_id}', headers={'Accept': 'application/msgpack'})
+    assert response.headers['Vary'] == 'Accept'
@@ -0,0 +1,68 @@
+from conftest import ADMIN, USER
+
+
+def test_login(client, user_id):
+    response = client.post('/auth/login', json=USER)
+    assert response.status_code == 200
+    assert response.json == {'success': True, 'user_id': user_id, 'username': 'whitehouse', 'is_admin': False}
+
+
+def test_login_admin(client, admin_id):
+    response = client.post('/auth/login', json=ADMIN)
+    assert response.json['is_admin'] is True
+    assert response.json['user_id'] == admin_id
+
+
+def test_login_wrong_password(client):
+    response = client.post('/auth/login', json={'username': 'whitehouse', 'password': 'wrong'})
+    assert response.status_code == 401
+
+
+def test_login_missing_credentials(client):
+    assert client.post('/auth/login', json={'username': 'whitehouse'}).status_code == 400
+
+
+def test_login_throttled_per_user(client):
+    statuses = [client.post('/auth/login', json={'username': 'whitehouse', 'password': 'wrong'}).status_code
+                for _ in range(10)]
+    assert statuses[-1] == 429
+
+
+def test_list_users(client):
+    response = client.get('/users')
+    assert [user['username'] for user in response.json] == ['admin', 'whitehouse']
+    assert response.headers['X-Total-Count'] == '2'
+
+
+def test_create_user_can_log_in(client, other_user_id):
+    response = client.post('/auth/login', json={'username': 'neighbour', 'password': 'secret'})
+    assert response.json['user_id'] == other_user_id
+
+
+def test_create_user_duplicate(client):
+    response = client.post('/users', json={'username': 'whitehouse', 'password': 'x'})
+    assert response.status_code == 409
+
+
+def test_delete_user_removes_data(client, db, user_id, grocery_item, pantry_item):
+    assert client.delete(f'/users/{user_id}').json['success'] is True
+    assert db.execute('SELECT COUNT(*) FROM users WHERE id = ?', (user_id,)).fetchone()[0] == 0
+    assert db.execute('SELECT COUNT(*) FROM grocery_items WHERE user_id = ?', (user_id,)).fetchone()[0] == 0
+    assert db.execute('SELECT COUNT(*) FROM items WHERE user_id = ?', (user_id,)).fetchone()[0] == 0
+
+
+def test_delete_unknown_user(client):
+    assert client.delete('/users/999').status_code == 404
+
+
+def test_migrate_user_data(client, user_id, other_user_id, grocery_item):
+    response = client.post('/users/migrate', json={'source_user_id': user_id, 'target_user_id': other_user_id})
+    assert response.json == {'success': True}
+    items = client.get(f'/grocery/items?user_id={other_user_id}').json
+    assert [item['name'] for item in items] == ['Milk']
+    suggestions = client.get(f'/grocery/suggestions?user_id={other_user_id}&query=mil').json
+    assert [suggestion['name'] for suggestion in suggestions] == ['Milk']
+
+
+def test_migrate_requires_both_users(client, user_id):
+    assert client.post('/users/migrate', json={'source_user_id': user_id}).status_code == 400
@@ -0,0 +1,45 @@
+import json
+
+from conftest import days_from_now
+
+
+def test_import_csv(client, user_id):
+    body = f"name,type,quantity,expiry_date\nFlour,Grains,2,{days_from_now(90)}\nSugar,Sweets,1,{days_from_now(90)}\n"
+    response = client.post(f'/import?user_id={user_id}&table=pantry', data=body, content_type='text/csv')
+    assert response.json['imported'] == 2
+    assert response.json['success'] is True
+    assert [item['name'] for item in client.get(f'/pantry/items?user_id={user_id}&sort=name').json] == \
+        ['Flour', 'Sugar']
+
+
+def test_import_reports_bad_rows(client, user_id):
+    body = '{"name": "Tea", "category": "Drinks"}\n{"quantity": 2}\n'
+    response = client.post(f'/import?user_id={user_id}&table=grocery&format=ndjson', data=body)
+    assert response.json['imported'] == 1
+    assert response.json['error_count'] == 1
+    assert response.json['success'] is False
+
+
+def test_import_default_category_matches_api(client, user_id):
+    client.post('/grocery/items', json={'user_id': user_id, 'name': 'Leeks'})
+    client.post(f'/import?user_id={user_id}&table=grocery&format=ndjson', data='{"name": "Onions"}\n')
+    items = client.get(f'/grocery/items?user_id={user_id}').json
+    assert {item['name']: item['category'] for item in items} == {'Leeks': 'Vegetables', 'Onions': 'Vegetables'}
+
+
+def test_import_bad_table(client, user_id):
+    assert client.post(f'/import?user_id={user_id}&table=fridge', data='').status_code == 400
+
+
+def test_export_ndjson(client, user_id, grocery_item):
+    response = client.get(f'/export?user_id={user_id}&table=grocery&format=ndjson')
+    assert response.headers['Content-Disposition'] == f'attachment; filename="pantrybot-grocery-{user_id}.ndjson"'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['name'], row['category'], row['quantity']) for row in rows] == [('Milk', 'Dairy', 2)]
+
+
+def test_export_csv_round_trip(client, user_id, other_user_id, pantry_item):
+    exported = client.get(f'/export?user_id={user_id}&table=pantry').get_data(as_text=True)
+    response = client.post(f'/import?user_id={other_user_id}&table=pantry', data=exported, content_type='text/csv')
+    assert response.json['imported'] == 1
+    assert client.get(f'/pantry/items?user_id={other_user_id}').json[0]['name'] == 'Rice'
@@ -0,0 +1,102 @@
+from conftest import days_from_now
+
+
+def test_list_requires_user_id(client):
+    assert client.get('/grocery/items').status_code == 400
+
+
+def test_add_and_list(client, user_id, grocery_item):
+    assert grocery_item['name'] == 'Milk'
+    assert grocery_item['category'] == 'Dairy'
+    response = client.get(f'/grocery/items?user_id={user_id}')
+    assert [item['id'] for item in response.json] == [grocery_item['id']]
+    assert response.headers['X-Cache'] == 'MISS'
+
+
+def test_add_requires_name(client, user_id):
+    assert client.post('/grocery/items', json={'user_id': user_id}).status_code == 400
+
+
+def test_list_is_cached_until_a_write(client, user_id, grocery_item):
+    url = f'/grocery/items?user_id={user_id}'
+    client.get(url)
+    assert client.get(url).headers['X-Cache'] == 'HIT'
+    client.post('/grocery/items', json={'user_id': user_id, 'name': 'Bread', 'category': 'Grains'})
+    response = client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(response.json) == 2
+
+
+def test_list_pages(client, user_id):
+    for name in ('Apples', 'Pears', 'Plums'):
+        client.post('/grocery/items', json={'user_id': user_id, 'name': name, 'category': 'Fruits'})
+    first = client.get(f'/grocery/items?user_id={user_id}&limit=2')
+    assert len(first.json) == 2
+    assert first.headers['X-Total-Count'] == '3'
+    rest = client.get(f"/grocery/items?user_id={user_id}&limit=2&after={first.headers['X-Next-Cursor']}")
+    assert len(rest.json) == 1
+    assert 'X-Next-Cursor' not in rest.headers
+
+
+def test_update(client, user_id, grocery_item):
+    response = client.put(f"/grocery/items/{grocery_item['id']}", json={
+        'user_id': user_id, 'name': 'Oat milk', 'quantity': 1, 'category': 'Drinks', 'checked': 1})
+    assert response.json == {'success': True}
+    item = client.get(f'/grocery/items?user_id={user_id}').json[0]
+    assert (item['name'], item['category'], item['checked']) == ('Oat milk', 'Drinks', 1)
+
+
+def test_delete(client, user_id, grocery_item):
+    assert client.delete(f"/grocery/items/{grocery_item['id']}").json == {'success': True}
+    assert client.get(f'/grocery/items?user_id={user_id}').json == []
+
+
+def test_checkout_moves_checked_items(client, user_id, grocery_item, checked_grocery_item):
+    response = client.post('/grocery/checkout', json={'user_id': user_id})
+    assert [item['name'] for item in response.json['items']] == ['Carrots']
+    carrots = response.json['items'][0]
+    assert carrots['type'] == 'Vegetables'
+    assert carrots['expiry_date'] == days_from_now(7)
+    assert [item['name'] for item in client.get(f'/grocery/items?user_id={user_id}').json] == ['Milk']
+    assert [item['name'] for item in client.get(f'/pantry/items?user_id={user_id}').json] == ['Carrots']
+
+
+def test_checkout_returns_only_moved_rows(client, user_id, pantry_item, checked_grocery_item):
+    apples = client.post('/grocery/items', json={'user_id': user_id, 'name': 'Apples', 'category': 'Fruits'}).json['item']
+    client.put(f"/grocery/items/{apples['id']}", json={
+        'user_id': user_id, 'name': 'Apples', 'category': 'Fruits', 'quantity': 1, 'checked': 1})
+    items = client.post('/grocery/checkout', json={'user_id': user_id}).json['items']
+    assert [item['name'] for item in items] == ['Carrots', 'Apples']
+    assert pantry_item not in [item['id'] for item in items]
+
+
+def test_checkout_requires_user_id(client):
+    assert client.post('/grocery/checkout', json={}).status_code == 400
+
+
+def test_suggestions(client, user_id, grocery_item):
+    response = client.get(f'/grocery/suggestions?user_id={user_id}&query=mi')
+    assert response.json == [{'name': 'Milk', 'category': 'Dairy', 'use_count': 1, 'metric': 'Litre',
+                              'amount_per_item': '1'}]
+
+
+def test_admin_suggestions(client, grocery_item):
+    response = client.get('/grocery/suggestions?admin=true')
+    assert [suggestion['name'] for suggestion in response.json] == ['Milk']
+
+
+def test_delete_suggestion(client, user_id, grocery_item):
+    assert client.delete(f'/grocery/suggestions/Milk/Dairy/{user_id}').json['success'] is True
+    assert client.get(f'/grocery/suggestions?user_id={user_id}&query=mi').json == []
+    assert client.delete(f'/grocery/suggestions/Milk/Dairy/{user_id}').status_code == 404
+
+
+def test_predicted(client, user_id, prediction):
+    response = client.get(f'/grocery/predicted?user_id={user_id}&days=3')
+    assert [item['name'] for item in response.json] == [prediction]
+    assert response.json[0]['category'] == 'Dairy'
+
+
+def test_predicted_leaves_out_listed_items(client, user_id, prediction):
+    client.post('/grocery/items', json={'user_id': user_id, 'name': prediction, 'category': 'Dairy'})
+    assert client.get(f'/grocery/predicted?user_id={user_id}&days=3').json == []
@@ -0,0 +1,13 @@
+import barcode_catalog
+import pantrybot
+
+
+def test_catalog_categories_map_to_kiosk_types():
+    assert pantrybot.item_type_for('Meats') == 'Meat'
+    assert pantrybot.item_type_for('Dairy') == 'Dairy'
+    assert pantrybot.item_type_for('Drinks') == ''
+    assert pantrybot.item_type_for('Other') == ''
+    # Every type the form offers can come from a scan
+    categories = set(barcode_catalog.PNNS_CATEGORIES.values()) | \
+        {category for category, _ in barcode_catalog.CATEGORY_KEYWORDS}
+    assert {pantrybot.item_type_for(category) for category in categories} == set(pantrybot.ITEM_TYPES) | {''}
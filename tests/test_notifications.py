@@ -0,0 +1,44 @@
+import sqlite3
+import threading
+
+import api
+from conftest import days_from_now
+from expiry_scheduler import ExpiryScheduler
+
+
+def test_notifications(client, user_id, notification):
+    response = client.get(f'/notifications?user_id={user_id}')
+    assert [(n['item_id'], n['threshold'], n['days_until_expiry']) for n in response.json] == [(notification, 1, 1)]
+    last = response.json[-1]['id']
+    assert client.get(f'/notifications?user_id={user_id}&after={last}').json == []
+
+
+def test_notifications_not_repeated(client, user_id, notification):
+    api.deliver_notifications(user_id, [{
+        'item_id': notification, 'name': 'Yogurt', 'type': 'Dairy', 'expiry_date': days_from_now(1),
+        'threshold': 1, 'days_until_expiry': 1}])
+    assert len(client.get(f'/notifications?user_id={user_id}').json) == 1
+
+
+def test_notifications_require_user_id(client):
+    assert client.get('/notifications').status_code == 400
+
+
+def test_scheduler_survives_failed_loads(monkeypatch):
+    failures = {'all': 1, 'user': 1}
+    delivered = threading.Event()
+
+    def flaky(key, result):
+        if failures[key]:
+            failures[key] -= 1
+            raise sqlite3.OperationalError('database is locked')
+        return result
+
+    item = (7, 'Yogurt', 'Dairy', days_from_now(1))
+    scheduler = ExpiryScheduler(lambda user_id: flaky('user', [item]), lambda: flaky('all', {}),
+                                lambda user_id, events: delivered.set(), notify_hour=0)
+    monkeypatch.setattr(scheduler, 'RETRY_SECONDS', 0.01)
+    scheduler.start()
+    scheduler.user_changed(1)
+    assert delivered.wait(5)
+    assert scheduler.thread.is_alive()
@@ -0,0 +1,67 @@
+from conftest import days_from_now
+
+
+def test_add_and_list(client, user_id, pantry_item):
+    items = client.get(f'/pantry/items?user_id={user_id}').json
+    assert [(item['id'], item['name'], item['type'], item['quantity']) for item in items] == \
+        [(pantry_item, 'Rice', 'Grains', 2)]
+
+
+def test_add_missing_fields(client, user_id):
+    assert client.post('/pantry/items', json={'user_id': user_id, 'name': 'Rice'}).status_code == 400
+
+
+def test_list_sorted(client, user_id, pantry_item, expiring_item):
+    by_expiry = client.get(f'/pantry/items?user_id={user_id}').json
+    assert [item['id'] for item in by_expiry] == [expiring_item, pantry_item]
+    by_name = client.get(f'/pantry/items?user_id={user_id}&sort=name').json
+    assert [item['name'] for item in by_name] == ['Rice', 'Yogurt']
+
+
+def test_update(client, user_id, pantry_item):
+    response = client.put(f'/pantry/items/{pantry_item}', json={
+        'user_id': user_id, 'name': 'Brown rice', 'type': 'Grains', 'quantity': 1,
+        'expiry_date': days_from_now(200)})
+    assert response.status_code == 200
+    item = client.get(f'/pantry/items?user_id={user_id}').json[0]
+    assert (item['name'], item['quantity']) == ('Brown rice', 1)
+
+
+def test_delete(client, user_id, pantry_item):
+    assert client.delete(f'/pantry/items/{pantry_item}?reason=discard').status_code == 200
+    assert client.get(f'/pantry/items?user_id={user_id}').json == []
+
+
+def test_delete_bad_reason(client, pantry_item):
+    assert client.delete(f'/pantry/items/{pantry_item}?reason=lost').status_code == 400
+
+
+def test_expiring(client, user_id, pantry_item, expiring_item):
+    response = client.get(f'/pantry/expiring?user_id={user_id}&days=3')
+    assert [item['name'] for item in response.json] == ['Yogurt']
+
+
+def test_item_totals(client, user_id, pantry_item, grocery_item):
+    rice = client.get(f'/totals/items?user_id={user_id}&name=rice').json
+    assert rice == [{'name': 'Rice', 'unit': 'g', 'pantry': 2000.0, 'grocery': 0.0,
+                     'pantry_count': 1, 'grocery_count': 0}]
+    milk = client.get(f'/totals/items?user_id={user_id}&name=milk').json
+    assert (milk[0]['unit'], milk[0]['grocery']) == ('ml', 2000.0)
+
+
+def test_type_totals(client, user_id, pantry_item, grocery_item):
+    totals = client.get(f'/totals/types?user_id={user_id}').json
+    assert [(row['type'], row['unit']) for row in totals] == [('Dairy', 'ml'), ('Grains', 'g')]
+
+
+def test_analytics(client, user_id, pantry_item):
+    client.delete(f'/pantry/items/{pantry_item}?reason=consume')
+    response = client.get(f'/analytics?user_id={user_id}&period=month')
+    totals = response.json['totals']
+    assert totals['add'] == {'events': 1, 'quantity': 2, 'amounts': {'g': 2000.0}}
+    assert totals['consume']['quantity'] == 2
+    assert totals['discard']['events'] == 0
+
+
+def test_analytics_bad_period(client, user_id):
+    assert client.get(f'/analytics?user_id={user_id}&period=decade').status_code == 400
@@ -0,0 +1,28 @@
+import retention
+from config import RETENTION_CONFIG
+
+
+def test_archived_rows_leave_cached_lists(client, db, user_id, grocery_item, checked_grocery_item, tmp_path):
+    url = f'/grocery/items?user_id={user_id}'
+    client.get(url)
+    assert client.get(url).headers['X-Cache'] == 'HIT'
+
+    db.execute("UPDATE grocery_items SET created_at = '2000-01-01', updated_at = '2000-01-01' WHERE id = ?",
+               (checked_grocery_item['id'],))
+    db.commit()
+    results = retention.run_database(db, str(tmp_path / 'pantrybot.db'), dict(RETENTION_CONFIG, vacuum_pause_seconds=0))
+    assert results['archived grocery_items'] == 1
+
+    response = client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert [item['name'] for item in response.json] == ['Milk']
+
+
+def test_pruned_history_leaves_cached_suggestions(client, db, user_id, grocery_item, tmp_path):
+    url = f'/grocery/suggestions?user_id={user_id}&query=mi'
+    assert [suggestion['name'] for suggestion in client.get(url).json] == ['Milk']
+
+    db.execute("UPDATE item_history SET last_used = '2000-01-01' WHERE user_id = ?", (user_id,))
+    db.commit()
+    assert retention.prune_history(db) == 1
+    assert client.get(url).json == []
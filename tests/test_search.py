@@ -0,0 +1,57 @@
+from config import BARCODE_CONFIG
+from conftest import days_from_now
+
+
+def test_search_across_sources(client, user_id, grocery_item, pantry_item):
+    hits = client.get(f'/search?user_id={user_id}&q=milk').json
+    assert sorted(hit['source'] for hit in hits) == ['grocery', 'history']
+    assert all(hit['name'] == 'Milk' and hit['score'] == 1.0 for hit in hits)
+
+
+def test_search_tolerates_typos(client, user_id, pantry_item):
+    hits = client.get(f'/search?user_id={user_id}&q=ricee').json
+    assert [(hit['source'], hit['id']) for hit in hits] == [('pantry', pantry_item)]
+
+
+def test_search_sources_filter(client, user_id, grocery_item):
+    hits = client.get(f'/search?user_id={user_id}&q=milk&sources=history').json
+    assert [hit['source'] for hit in hits] == ['history']
+
+
+def test_search_follows_writes(client, user_id, grocery_item):
+    client.put(f"/grocery/items/{grocery_item['id']}", json={'user_id': user_id, 'name': 'Butter', 'category': 'Dairy'})
+    hits = client.get(f'/search?user_id={user_id}&q=butter&sources=grocery').json
+    assert [hit['id'] for hit in hits] == [grocery_item['id']]
+    client.delete(f"/grocery/items/{grocery_item['id']}")
+    assert client.get(f'/search?user_id={user_id}&q=butter&sources=grocery').json == []
+
+
+def test_search_is_per_user(client, other_user_id, grocery_item):
+    assert client.get(f'/search?user_id={other_user_id}&q=milk').json == []
+
+
+def test_search_bad_requests(client, user_id):
+    assert client.get(f'/search?user_id={user_id}').status_code == 400
+    assert client.get(f'/search?user_id={user_id}&q=milk&sources=fridge').status_code == 400
+
+
+def test_barcode(client, barcode_index):
+    response = client.get('/barcode/3017620422003')
+    assert response.json == {'barcode': '3017620422003', 'name': 'Hazelnut spread', 'category': 'Sweets',
+                             'shelf_life_days': 365, 'expiry_date': days_from_now(365)}
+
+
+def test_barcode_default_shelf_life(client, barcode_index):
+    # UPC-A written without its leading zero; shelf life from CHECKOUT_CONFIG
+    response = client.get('/barcode/76808280463')
+    assert (response.json['name'], response.json['shelf_life_days']) == ('Spaghetti', 365)
+
+
+def test_barcode_unknown(client, barcode_index):
+    assert client.get('/barcode/4000000000000').status_code == 404
+    assert client.get('/barcode/not-a-code').status_code == 400
+
+
+def test_barcode_without_catalog(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(BARCODE_CONFIG, 'catalog_path', str(tmp_path / 'missing.idx'))
+    assert client.get('/barcode/3017620422003').status_code == 503
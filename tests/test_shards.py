@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+import api
+from config import SHARD_CONFIG
+
+
+@pytest.fixture
+def sharded(db, monkeypatch, tmp_path):
+    """Sharding switched on, with household databases under tmp_path."""
+    monkeypatch.setitem(SHARD_CONFIG, 'enabled', True)
+    monkeypatch.setitem(SHARD_CONFIG, 'shard_dir', str(tmp_path / 'shards'))
+    monkeypatch.setattr(api, '_shard_paths', {})
+    monkeypatch.setattr(api, '_fan_out_pool', None)
+    yield
+    if api._fan_out_pool is not None:
+        api._fan_out_pool.shutdown()
+
+
+@pytest.fixture
+def households(sharded, db, user_id, other_user_id):
+    """whitehouse lives in household 'smith', neighbour in 'jones'."""
+    db.executemany('INSERT OR REPLACE INTO shard_map (user_id, household) VALUES (?, ?)',
+                   [(user_id, 'smith'), (other_user_id, 'jones')])
+    db.commit()
+    return {user_id: api.shard_path('smith'), other_user_id: api.shard_path('jones')}
+
+
+def add_grocery(client, user_id, name):
+    response = client.post('/grocery/items', json={'user_id': user_id, 'name': name, 'category': 'Dairy'})
+    assert response.status_code == 200
+    return response.json['item']
+
+
+def test_user_data_lives_in_household_shard(client, db, user_id, other_user_id, households):
+    milk = add_grocery(client, user_id, 'Milk')
+    add_grocery(client, other_user_id, 'Cheese')
+
+    assert all(os.path.exists(path) for path in households.values())
+    assert db.execute('SELECT COUNT(*) FROM grocery_items').fetchone()[0] == 0
+    shard = api.connect_db(households[user_id])
+    assert [row['name'] for row in shard.execute('SELECT name FROM grocery_items_view')] == ['Milk']
+    shard.close()
+
+    assert [item['name'] for item in client.get(f'/grocery/items?user_id={user_id}').json] == ['Milk']
+    assert [item['name'] for item in client.get(f'/grocery/items?user_id={other_user_id}').json] == ['Cheese']
+
+    # Rows addressed by id need the owner to find the shard
+    assert client.put(f"/grocery/items/{milk['id']}", json={'name': 'Oat milk', 'quantity': 1}).status_code == 400
+    client.put(f"/grocery/items/{milk['id']}", json={'user_id': user_id, 'name': 'Oat milk', 'category': 'Dairy',
+                                                     'quantity': 1})
+    assert [item['name'] for item in client.get(f'/grocery/items?user_id={user_id}').json] == ['Oat milk']
+    client.delete(f"/grocery/items/{milk['id']}?user_id={user_id}")
+    assert client.get(f'/grocery/items?user_id={user_id}').json == []
+    assert [item['name'] for item in client.get(f'/grocery/items?user_id={other_user_id}').json] == ['Cheese']
+
+
+def test_overview_fans_out_over_households(client, user_id, other_user_id, households):
+    add_grocery(client, user_id, 'Milk')
+    add_grocery(client, other_user_id, 'Cheese')
+    add_grocery(client, other_user_id, 'Butter')
+
+    first = client.get('/admin/overview?items=5')
+    users = {user['id']: user for user in first.json['users']}
+    assert users[user_id]['grocery_count'] == 1
+    assert users[other_user_id]['grocery_count'] == 2
+    assert sorted(item['name'] for item in users[other_user_id]['items']) == ['Butter', 'Cheese']
+
+    # A write to either shard changes the generation
+    add_grocery(client, user_id, 'Eggs')
+    second = client.get('/admin/overview?items=5')
+    assert second.json['generation'] != first.json['generation']
+    assert next(user for user in second.json['users'] if user['id'] == user_id)['grocery_count'] == 2
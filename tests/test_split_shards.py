@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+import api
+import split_shards
+
+
+@pytest.fixture
+def monolith(db, tmp_path):
+    """The test's database as a file, the way split_shards.py reads it."""
+    def save():
+        path = tmp_path / 'pantrybot.db'
+        disk = sqlite3.connect(path)
+        db.backup(disk)
+        disk.close()
+        return str(path)
+    return save
+
+
+def test_split_keeps_notification_ids(db, user_id, notification, other_user_id, monolith, tmp_path):
+    # Another household's later notices push the monolith's ids past this user's
+    for item_id in (101, 102):
+        api.deliver_notifications(other_user_id, [{
+            'item_id': item_id, 'name': 'Bread', 'type': 'Grains', 'expiry_date': '2026-01-01',
+            'threshold': 0, 'days_until_expiry': 0}])
+    source_ids = [row[0] for row in db.execute('SELECT id FROM push_outbox WHERE user_id = ?', (user_id,))]
+
+    shard_path = str(tmp_path / 'shards' / 'household_a.db')
+    copied = split_shards.copy_household(monolith(), shard_path, [user_id])
+    assert copied['push_outbox'] == 1
+
+    shard = api.connect_db(shard_path)
+    assert [row[0] for row in shard.execute('SELECT id FROM push_outbox')] == source_ids
+    new_id = shard.execute('''
+        INSERT INTO push_outbox (user_id, item_id, name, type, expiry_date, threshold, days_until_expiry)
+        VALUES (?, 5, 'Eggs', 'Dairy', '2026-02-01', 3, 3)
+    ''', (user_id,)).lastrowid
+    shard.close()
+    assert new_id > db.execute('SELECT MAX(id) FROM push_outbox').fetchone()[0]
+
+
+def test_split_keeps_sync_revisions_and_translates_labels(client, db, user_id, other_user_id, monolith, tmp_path):
+    client.post('/grocery/items', json={'user_id': other_user_id, 'name': 'Salt', 'category': 'Seasoning'})
+    client.post('/grocery/items', json={'user_id': user_id, 'name': 'Basil', 'category': 'Herbs'})
+    source_log = db.execute('SELECT rev, table_name, row_id, op FROM sync_log WHERE user_id = ?',
+                            (user_id,)).fetchall()
+    source_label = db.execute('SELECT category_id FROM grocery_items WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+    # A shard that already has a label the monolith lacks numbers 'Herbs' differently
+    shard_path = str(tmp_path / 'household_a.db')
+    shard = api.connect_db(shard_path)
+    api.init_data_schema(shard)
+    api.label_id(shard, 'Spices')
+    shard.commit()
+    shard.close()
+
+    split_shards.copy_household(monolith(), shard_path, [user_id])
+
+    shard = api.connect_db(shard_path)
+    assert shard.execute('SELECT rev, table_name, row_id, op FROM sync_log').fetchall() == source_log
+    category_id = shard.execute('SELECT category_id FROM grocery_items').fetchone()[0]
+    category = shard.execute('SELECT category FROM grocery_items_view').fetchone()[0]
+    shard.close()
+    assert category_id != source_label
+    assert category == 'Herbs'
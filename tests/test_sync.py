@@ -0,0 +1,47 @@
+def test_push_insert_then_pull(client, user_id):
+    response = client.post('/sync/push', json={'user_id': user_id, 'client_id': 'kiosk-1', 'changes': [
+        {'op_id': 1, 'table': 'grocery_items', 'op': 'upsert', 'local_id': 7,
+         'fields': {'name': 'Lemons', 'quantity': 4}, 'updated_at': '2026-01-01T10:00:00.000'}]})
+    result = response.json['results'][0]
+    assert result['status'] == 'applied'
+
+    pull = client.get(f'/sync/pull?user_id={user_id}').json
+    assert [(change['table'], change['id'], change['row']['name']) for change in pull['changes']] == \
+        [('grocery_items', result['id'], 'Lemons')]
+    assert pull['more'] is False
+    assert client.get(f"/sync/pull?user_id={user_id}&since={pull['next']}").json['changes'] == []
+
+
+def test_push_retried_insert_is_not_duplicated(client, user_id):
+    change = {'op_id': 1, 'table': 'items', 'op': 'upsert', 'local_id': 3, 'updated_at': '2026-01-01T10:00:00.000',
+              'fields': {'name': 'Beans', 'type': 'Grains', 'quantity': 1, 'entry_date': '2026-01-01',
+                         'expiry_date': '2027-01-01'}}
+    first = client.post('/sync/push', json={'user_id': user_id, 'client_id': 'kiosk-1', 'changes': [change]})
+    second = client.post('/sync/push', json={'user_id': user_id, 'client_id': 'kiosk-1', 'changes': [change]})
+    assert first.json['results'][0]['id'] == second.json['results'][0]['id']
+    assert len(client.get(f'/pantry/items?user_id={user_id}').json) == 1
+
+
+def test_push_older_edit_loses(client, user_id, grocery_item):
+    response = client.post('/sync/push', json={'user_id': user_id, 'client_id': 'kiosk-1', 'changes': [
+        {'op_id': 1, 'table': 'grocery_items', 'op': 'upsert', 'id': grocery_item['id'],
+         'fields': {'name': 'Old name'}, 'updated_at': '2000-01-01T00:00:00.000'}]})
+    assert response.json['results'][0]['status'] == 'rejected'
+
+
+def test_push_delete(client, user_id, grocery_item):
+    client.post('/sync/push', json={'user_id': user_id, 'client_id': 'kiosk-1', 'changes': [
+        {'op_id': 1, 'table': 'grocery_items', 'op': 'delete', 'id': grocery_item['id']}]})
+    assert client.get(f'/grocery/items?user_id={user_id}').json == []
+    change = client.get(f'/sync/pull?user_id={user_id}').json['changes'][-1]
+    assert (change['op'], change['id']) == ('delete', grocery_item['id'])
+
+
+def test_push_unknown_table(client, user_id):
+    response = client.post('/sync/push', json={'user_id': user_id, 'client_id': 'kiosk-1', 'changes': [
+        {'op_id': 1, 'table': 'users', 'op': 'upsert', 'fields': {}}]})
+    assert response.status_code == 400
+
+
+def test_push_requires_client_id(client, user_id):
+    assert client.post('/sync/push', json={'user_id': user_id}).status_code == 400
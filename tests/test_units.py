@@ -0,0 +1,19 @@
+import units
+
+
+def test_parse_amount():
+    assert units.to_base('Kg', '2 x 250g') == (500.0, 'g')
+    assert units.to_base('Litre', '1,5') == (1500.0, 'ml')
+    assert units.to_base('Kg', '1 1/2') == (1500.0, 'g')
+
+
+def test_malformed_fraction_is_unparsed():
+    assert units.parse_number('1 1/0') is None
+    assert units.parse_number('1/2/3') is None
+    assert units.to_base('Kg', '1 1/0') == (None, None)
+
+
+def test_malformed_fraction_through_api(client, user_id):
+    response = client.post('/grocery/items', json={
+        'user_id': user_id, 'name': 'Flour', 'quantity': 1, 'metric': 'Kg', 'amount_per_item': '1 1/0'})
+    assert response.status_code == 200
@@ -0,0 +1,106 @@
+"""
+Amounts in canonical base units, so totals can be summed in SQL.
+
+Rows carry metric ('Kg', 'Litre', 'Piece' ...) and amount_per_item as free
+text ('500', '1,5', '2 x 250g'). to_base() turns the pair into the amount of
+one item in grams, millilitres or a count, which is stored next to the text
+in base_amount / base_unit whenever a row is written. A row's total is then
+quantity * base_amount. Amounts that can't be read are stored as NULL and
+reported as unparsed rather than guessed.
+"""
+
+import re
+
+# Unit name (lower case, without a trailing '.' or 's') -> (base unit, factor)
+UNITS = {
+    'mg': ('g', 0.001), 'g': ('g', 1), 'gr': ('g', 1), 'gram': ('g', 1),
+    'kg': ('g', 1000), 'kilo': ('g', 1000), 'kilogram': ('g', 1000),
+    'oz': ('g', 28.3495), 'lb': ('g', 453.592),
+    'ml': ('ml', 1), 'millilitre': ('ml', 1), 'milliliter': ('ml', 1),
+    'cl': ('ml', 10), 'dl': ('ml', 100),
+    'l': ('ml', 1000), 'litre': ('ml', 1000), 'liter': ('ml', 1000), 'ltr': ('ml', 1000),
+    'tsp': ('ml', 5), 'tbsp': ('ml', 15), 'cup': ('ml', 240),
+    'piece': ('count', 1), 'pc': ('count', 1), 'pcs': ('count', 1), 'each': ('count', 1),
+    'unit': ('count', 1), 'count': ('count', 1), 'pack': ('count', 1), 'bunch': ('count', 1),
+    'bag': ('count', 1), 'bottle': ('count', 1), 'can': ('count', 1), 'dozen': ('count', 12),
+}
+
+BASE_UNITS = ('g', 'ml', 'count')
+
+# [count x] number [unit]; the number may be 1.5, 1,5, 1/2 or 1 1/2
+AMOUNT_RE = re.compile(r'''^\s*
+    (?:(?P<times>\d+)\s*[x×*]\s*)?
+    (?P<number>\d+\s+\d+/\d+|\d+/\d+|\d*[.,]?\d+)?
+    \s*(?P<unit>[^\d\s][^\d]*?)?
+    \s*$''', re.VERBOSE)
+
+
+def unit_factor(name):
+    """(base unit, factor) for a unit name, or None if it isn't one we know."""
+    if not name:
+        return None
+    key = name.strip().lower().rstrip('.')
+    if key in UNITS:
+        return UNITS[key]
+    if key.endswith('es') and key[:-2] in UNITS:
+        return UNITS[key[:-2]]
+    if key.endswith('s') and key[:-1] in UNITS:
+        return UNITS[key[:-1]]
+    return None
+
+
+def parse_number(text):
+    """'1,5' -> 1.5, '1 1/2' -> 1.5; None if unreadable (or divided by zero)."""
+    text = text.strip().replace(',', '.')
+    try:
+        if ' ' in text:
+            whole, fraction = text.split(None, 1)
+            rest = parse_number(fraction)
+            return None if rest is None else float(whole) + rest
+        if '/' in text:
+            numerator, denominator = text.split('/')
+            return float(numerator) / float(denominator) if float(denominator) else None
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_amount(text):
+    """'2 x 250g' -> (500.0, 'g'); '1,5' -> (1.5, None). None if unreadable."""
+    match = AMOUNT_RE.match(str(text))
+    if not match or not (match.group('number') or match.group('unit')):
+        return None
+    number = 1.0
+    if match.group('number'):
+        number = parse_number(match.group('number'))
+        if number is None:
+            return None
+    if match.group('times'):
+        number *= int(match.group('times'))
+    return number, match.group('unit')
+
+
+def to_base(metric, amount_per_item):
+    """(base_amount, base_unit) of one item, or (None, None) if unknown.
+
+    A unit written in the amount wins over metric. Without an amount an item
+    is one metric unit, and without either it counts as one piece.
+    """
+    amount, unit = 1.0, None
+    if amount_per_item is not None and str(amount_per_item).strip():
+        parsed = parse_amount(amount_per_item)
+        if parsed is None:
+            return None, None
+        amount, unit = parsed
+    unit = unit or metric
+    if not unit:
+        return amount, 'count'
+    factor = unit_factor(unit)
+    if factor is None:
+        return None, None
+    return round(amount * factor[1], 6), factor[0]
+
+
+def base_fields(metric, amount_per_item):
+    base_amount, base_unit = to_base(metric, amount_per_item)
+    return {'base_amount': base_amount, 'base_unit': base_unit}
@@ -0,0 +1,111 @@
+"""
+Response encodings picked by content negotiation.
+
+JSON stays the default. A client that sends Accept: application/msgpack or
+application/cbor gets the same data in that encoding, if the library for it
+is installed (pip3 install msgpack cbor2); otherwise it gets JSON. Adding
+?layout=columns to a list endpoint sends the rows as an array per column,
+with each key once instead of once per row:
+
+    [{"id": 1, "name": "milk"}, {"id": 2, "name": "eggs"}]
+    -> {"columns": ["id", "name"], "values": [[1, 2], ["milk", "eggs"]], "count": 2}
+
+WireJSONProvider does this for everything that goes through jsonify, so
+routes don't change.
+"""
+
+from operator import itemgetter
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+MIMETYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'cbor': 'application/cbor',
+}
+
+# Other names clients use for the same encodings
+ALIASES = {
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+}
+
+
+def available_formats():
+    formats = ['json']
+    if msgpack is not None:
+        formats.append('msgpack')
+    if cbor2 is not None:
+        formats.append('cbor')
+    return formats
+
+
+def negotiate(accept):
+    """Format for a werkzeug MIMEAccept; JSON when nothing else is preferred."""
+    formats = available_formats()
+    offers = [MIMETYPES[fmt] for fmt in formats]
+    offers += [mimetype for mimetype, fmt in ALIASES.items() if fmt in formats]
+    best = accept.best_match(offers, default=MIMETYPES['json'])
+    return ALIASES.get(best) or next(fmt for fmt, mimetype in MIMETYPES.items() if mimetype == best)
+
+
+def to_columns(rows):
+    """A list of dicts as {'columns', 'values', 'count'}; other data as is.
+    Keys missing from some rows come out as None there."""
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return rows
+    columns = list(rows[0]) if rows else []
+    try:
+        if len(columns) < 2 or any(len(row) != len(columns) for row in rows):
+            raise KeyError
+        # Rows from one query share their keys: transpose in C
+        values = list(map(list, zip(*map(itemgetter(*columns), rows))))
+    except KeyError:
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        values = [[row.get(column) for row in rows] for column in columns]
+    return {'columns': columns, 'values': values, 'count': len(rows)}
+
+
+def encode(data, fmt):
+    if fmt == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True, default=str)
+    if fmt == 'cbor':
+        return cbor2.dumps(data)
+    raise ValueError(f'Unknown format {fmt}')
+
+
+def request_format():
+    """(format, columnar) asked for by the current request."""
+    if not has_request_context():
+        return 'json', False
+    return negotiate(request.accept_mimetypes), request.args.get('layout') == 'columns'
+
+
+class WireJSONProvider(DefaultJSONProvider):
+    """jsonify() that answers in the negotiated format and layout."""
+
+    def response(self, *args, **kwargs):
+        fmt, columnar = request_format()
+        if fmt == 'json' and not columnar:
+            response = super().response(*args, **kwargs)
+        else:
+            data = self._prepare_response_obj(args, kwargs)
+            if columnar:
+                data = to_columns(data)
+            if fmt == 'json':
+                response = super().response(data)
+            else:
+                response = self._app.response_class(encode(data, fmt), mimetype=MIMETYPES[fmt])
+        response.vary.add('Accept')
+        return response